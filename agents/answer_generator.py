@@ -6,6 +6,7 @@ Composes grounded answers using KB documents and user messages
 from typing import Dict, List
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
 from services.agent_schemas import KBDocument
+from services.context_packer import pack_context
 from services.logger_setup import setup_logger
 logger = setup_logger()
 
@@ -61,7 +62,9 @@ class AnswerGeneratorAgent:
     
     def _format_kb_context(self, kb_docs: List[KBDocument]) -> str:
         """
-        Format KB documents into context string for the LLM
+        Format KB documents into context string for the LLM.
+        Overlapping neighbouring chunks are merged and the context is kept within
+        chat.context_token_budget (see services/context_packer.py).
         
         Args:
             kb_docs: List of KBDocument objects
@@ -72,6 +75,7 @@ class AnswerGeneratorAgent:
         if not kb_docs:
             return "No relevant documents found in knowledge base."
         
+        kb_docs = pack_context(kb_docs)
         context_parts = ["=== Knowledge Base Documents ===\n"]
         
         for i, doc in enumerate(kb_docs, 1):
@@ -3,11 +3,12 @@ Claim Verifier Agent
 Verifies claims and makes resolution decisions for BFSI workflows
 """
 import json
-import uuid
 from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
 from services.agent_schemas import VerificationDecision, ActionPlan, Report
+from services.idempotency import make_idempotency_key, run_once
+from services.incident_writer import get_incident_writer
 from services.logger_setup import setup_logger
 
 from services.config_loader import get_config
@@ -15,6 +16,42 @@ from services.config_loader import get_config
 logger = setup_logger()
 config = get_config()
 
+# Decision rules shared by the structured decision prompt and the single-call prompt
+DECISION_GUIDELINES = """**Decision Process:**
+1. Verify if the issue is valid according to company policies and supporting documents
+2. Calculate confidence score (0.0 to 1.0) based on:
+   - Policy clarity and completeness
+   - Information sufficiency
+   - Alignment between user demand and policy
+3. Determine appropriate resolution and action plan
+
+**CRITICAL - Exact Field Values (Pydantic Schema):**
+
+1. **is_valid** - MUST be EXACTLY one of these strings:
+   - "Yes" - Issue is valid according to policies
+   - "Low Confidence" - Uncertain, needs human review
+   - "No" - Issue is not valid according to policies
+
+2. **action_plan.ticket_type** - If creating ticket, MUST be EXACTLY one of:
+   - "complaint" - For complaints
+   - "service_request" - For service requests
+   - "feature_request" - For feature requests
+   DO NOT use descriptive strings like "Complaint - Insurance" or "PaymentDiscrepancy"
+   Use the intent from the report to pick the right literal value
+
+**Action Planning:**
+- If confidence < 0.7: MUST set create_ticket=true, is_valid="Low Confidence"
+- If valid AND confident: is_valid="Yes", provide clear resolution with policy citations
+- If valid but no direct resolution available: is_valid="Yes", explain + create ticket
+- If invalid: is_valid="No", explain reasoning with policy citations
+
+**Important Rules:**
+- Resolution should directly address the user's issue
+- Policy citations should reference specific sections when available
+- If refund is appropriate, specify amount (if determinable)
+- Ticket creation is for escalation/tracking, not data gathering"""
+
+
 class ClaimVerifierAgent:
     """
     Agent responsible for claim verification and resolution decision-making.
@@ -27,7 +64,7 @@ class ClaimVerifierAgent:
     - Low confidence (<0.7) triggers human escalation
     """
     
-    def __init__(self, llm, tools, tenant_id: str, user_role: str):
+    def __init__(self, llm, tools, tenant_id: str, user_role: str, single_call: Optional[bool] = None):
         self.llm_with_tools = llm.bind_tools(tools)
         self.structured_llm = llm.with_structured_output(VerificationDecision)
         self.base_llm = llm
@@ -39,6 +76,12 @@ class ClaimVerifierAgent:
         self.min_confidence = config.get('multi_agent', {}).get('thresholds', {}).get('min_confidence', 0.7)
         self.max_refund_amount = config.get('multi_agent', {}).get('decision', {}).get('max_refund_amount', 50000)
         
+        # Single-call mode: the first response either requests tools or submits the decision as a
+        # VerificationDecision tool call, saving the separate tool-check round-trip
+        self.single_call = config.get('multi_agent.verifier.single_call', False) if single_call is None else single_call
+        if self.single_call:
+            self.single_call_llm = llm.bind_tools(list(tools or []) + [VerificationDecision], tool_choice="any")
+        
     def process(self, state: dict) -> dict:
         """
         Verify claim and make resolution decision
@@ -59,7 +102,7 @@ class ClaimVerifierAgent:
         report_data = state.get('report')
         if not report_data:
             logger.error("No report found in state")
-            return {'verification': self._create_fallback_decision(None, None).dict()}
+            return {'verification': self._create_fallback_decision(None, None, state.get('user_id')).dict()}
         
         report = Report(**report_data) if isinstance(report_data, dict) else report_data
         intent_result = state.get('intent_result')
@@ -70,15 +113,19 @@ class ClaimVerifierAgent:
         # Check if we have tool results in messages (i.e., tools were just executed)
         has_tool_results = any(msg.__class__.__name__ == 'ToolMessage' for msg in messages)
         
+        # Single-call mode only replaces the first round; once tools ran, decide as below
+        if self.single_call and not has_tool_results:
+            return self._process_single_call(report, intent_result, user_id, email, messages)
+        
         if has_tool_results:
             # Tools were executed, now make final decision with all information
             logger.info("Tool results available, making final decision")
-            decision = self._make_final_decision(report, intent_result, messages)
+            decision = self._make_final_decision(report, intent_result, messages, user_id)
             
             logger.info(f"Final Decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
             
             return {
-                'verification': decision.dict()
+                'verification': self._record_incident(decision, report, intent_result, user_id)
             }
         else:
             # First pass: check if we need tools
@@ -92,12 +139,12 @@ class ClaimVerifierAgent:
             
             # No tools needed, make decision directly
             logger.info("No tools needed, making direct decision")
-            decision = self._make_final_decision(report, intent_result, messages)
+            decision = self._make_final_decision(report, intent_result, messages, user_id)
             
             logger.info(f"Decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
             
             return {
-                'verification': decision.dict()
+                'verification': self._record_incident(decision, report, intent_result, user_id)
             }
     
 #     def _execute_tool_calls(self, report: Report, intent_result, user_id: str, messages: List) -> dict:
@@ -193,6 +240,113 @@ class ClaimVerifierAgent:
 #             'final_context': conversation
 #         }
     
+    def _process_single_call(self, report: Report, intent_result, user_id: Optional[str], email: Optional[str], messages: List) -> dict:
+        """
+        Single-call verification: one LLM response either requests tools (returned for
+        execution) or submits the decision through the VerificationDecision tool. Only used
+        before any tool has run; tool results always lead to the structured decision call
+        
+        Returns:
+            State update with tool calls or verification decision
+        """
+        response = self._decide_or_call_tools(report, intent_result, user_id, email, messages)
+        tool_calls = getattr(response, 'tool_calls', None) or []
+        
+        decision_call = next((call for call in tool_calls if call['name'] == VerificationDecision.__name__), None)
+        if decision_call:
+            try:
+                decision = self._finalize_decision(
+                    VerificationDecision(**decision_call['args']), report, intent_result, user_id
+                )
+                logger.info(f"Single-call Decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
+                return {'verification': self._record_incident(decision, report, intent_result, user_id)}
+            except Exception as e:
+                logger.warning(f"Invalid VerificationDecision tool call, using structured decision: {e}")
+        elif tool_calls:
+            logger.info(f"Agent requesting {len(tool_calls)} tool call(s)")
+            return {'messages': [response]}
+        
+        # No usable decision in the response: fall back to the structured decision call
+        decision = self._make_final_decision(report, intent_result, messages, user_id)
+        logger.info(f"Decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
+        return {'verification': self._record_incident(decision, report, intent_result, user_id)}
+    
+    def _decide_or_call_tools(self, report: Report, intent_result, user_id: Optional[str], email: Optional[str], messages: List):
+        """
+        One LLM call with the data tools plus VerificationDecision bound as a tool
+        
+        Returns:
+            AIMessage with tool_calls, or None if the call failed
+        """
+        context = self._format_decision_context(report, intent_result, messages)
+        
+        system_prompt = f"""You are a BFSI claim verification decision maker.
+
+Review the report and any tool results. If you need more information, call the data tools;
+otherwise submit your final decision by calling **VerificationDecision**.
+
+**Available Tools:**
+1. **retriever_tool** - Search organization's knowledge base for policies, procedures, and documents
+2. **get_user_data** - Fetch user account information (requires user_id or email)
+3. **list_user_policies** - Get user's active policies (requires user_id)
+4. **create_jira_ticket** - Create ticket for human review (use only after decision is made)
+5. **VerificationDecision** - Submit the final decision (call it alone, not together with other tools)
+
+**Context Available:**
+- user_id: {user_id or "Not provided"}
+- email: {email or "Not provided"}
+- Report already contains policy information from intent gatherer's retrieval
+
+Only call data tools if the report and tool results so far are truly insufficient.
+
+{DECISION_GUIDELINES}"""
+        
+        user_prompt = f"""Please analyze the following information and either call the tools you need or submit your decision.
+
+REMEMBER: Use exact literal values from the schema above:
+- is_valid: "Yes", "Low Confidence", or "No"
+- ticket_type: "complaint", "service_request", or "feature_request" (match the Intent from context)
+
+{context}"""
+        
+        try:
+            return self.single_call_llm.invoke([
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=user_prompt)
+            ])
+        except Exception as e:
+            logger.error(f"Error in single-call verification: {e}")
+            return None
+    
+    def finalize(self, state: dict, reason: str) -> dict:
+        """
+        Make the final decision from the context gathered so far, without further tool calls.
+        Used by the graph when the run budget is exhausted.
+
+        Args:
+            state: Agent state (see process)
+            reason: Budget that was exhausted
+
+        Returns:
+            Updated state with verification decision
+        """
+        logger.warning(f"ClaimVerifierAgent: run budget exhausted ({reason}), deciding with available context")
+
+        report_data = state.get('report')
+        if not report_data:
+            return {'verification': self._create_fallback_decision(None, None, state.get('user_id')).dict()}
+
+        report = Report(**report_data) if isinstance(report_data, dict) else report_data
+        intent_result = state.get('intent_result')
+        user_id = state.get('user_id')
+        decision = self._make_final_decision(report, intent_result, state.get('messages', []), user_id)
+
+        logger.info(f"Budget-limited Decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
+
+        return {
+            'verification': self._record_incident(decision, report, intent_result, user_id)
+        }
+
     def _check_and_call_tools(self, report: Report, intent_result, user_id: str, email: str, messages: List):
         """
         Check if tools are needed and make tool calls if necessary
@@ -254,50 +408,17 @@ Do you need to call any tools, or do you have sufficient information?"""
             # Return empty response, will proceed to direct decision
             return AIMessage(content="Proceeding with available information")
     
-    def _make_final_decision(self, report: Report, intent_result, messages: List) -> VerificationDecision:
+    def _make_final_decision(self, report: Report, intent_result, messages: List, user_id: Optional[str] = None) -> VerificationDecision:
         logger.info("Making final verification decision")
         
         # Build comprehensive context including tool results
         context = self._format_decision_context(report, intent_result, messages)
-        # TODO: in any case, make a db entry into the incident table for record keeping purposes. Once we have required fields from the response json of verifier agent then we will call this ourselves.
-        system_prompt = """You are a BFSI claim verification decision maker.
+        system_prompt = f"""You are a BFSI claim verification decision maker.
 
 Analyze the issue and all information provided. Make a final verification decision with a structured response.
 
-**Decision Process:**
-1. Verify if the issue is valid according to company policies and supporting documents
-2. Calculate confidence score (0.0 to 1.0) based on:
-   - Policy clarity and completeness
-   - Information sufficiency
-   - Alignment between user demand and policy
-3. Determine appropriate resolution and action plan
-
-**CRITICAL - Exact Field Values (Pydantic Schema):**
-
-1. **is_valid** - MUST be EXACTLY one of these strings:
-   - "Yes" - Issue is valid according to policies
-   - "Low Confidence" - Uncertain, needs human review
-   - "No" - Issue is not valid according to policies
-
-2. **action_plan.ticket_type** - If creating ticket, MUST be EXACTLY one of:
-   - "complaint" - For complaints
-   - "service_request" - For service requests
-   - "feature_request" - For feature requests
-   DO NOT use descriptive strings like "Complaint - Insurance" or "PaymentDiscrepancy"
-   Use the intent from the report to pick the right literal value
-
-**Action Planning:**
-- If confidence < 0.7: MUST set create_ticket=true, is_valid="Low Confidence"
-- If valid AND confident: is_valid="Yes", provide clear resolution with policy citations
-- If valid but no direct resolution available: is_valid="Yes", explain + create ticket
-- If invalid: is_valid="No", explain reasoning with policy citations
-
-**Important Rules:**
+{DECISION_GUIDELINES}
 - NEVER call tools now - all needed information should already be gathered
-- Resolution should directly address the user's issue
-- Policy citations should reference specific sections when available
-- If refund is appropriate, specify amount (if determinable)
-- Ticket creation is for escalation/tracking, not data gathering
 
 Return structured decision with: is_valid, confidence, resolution, policy_citations, and action_plan."""
 
@@ -318,72 +439,147 @@ Make your decision now with the correct literal string values."""
                 HumanMessage(content=user_prompt)
             ])
             
-            # Apply safety checks
-            confidence = min(max(decision_extraction.confidence, 0.0), 1.0)
-            
-            # Validate and fix is_valid if needed
-            is_valid = decision_extraction.is_valid
-            valid_is_valid_values = ['Yes', 'Low Confidence', 'No']
-            
-            if is_valid not in valid_is_valid_values:
-                # Try to map from boolean or other values
-                if isinstance(is_valid, bool):
-                    is_valid = 'Yes' if is_valid else 'No'
-                    logger.warning(f"Fixed boolean is_valid to string: '{is_valid}'")
-                elif str(is_valid).lower() in ['true', 'yes', 'valid']:
-                    is_valid = 'Yes'
-                    logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'Yes'")
-                elif str(is_valid).lower() in ['false', 'no', 'invalid']:
-                    is_valid = 'No'
-                    logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'No'")
-                else:
-                    is_valid = 'Low Confidence'
-                    logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'Low Confidence'")
-            
-            # Create action plan with safety checks
-            action_plan_data = decision_extraction.action_plan.model_dump()
-            
-            # Force ticket creation if confidence too low
-            if confidence < self.min_confidence:
-                action_plan_data['create_ticket'] = True
-                logger.info(f"Confidence {confidence} below threshold {self.min_confidence}, forcing ticket creation")
-            
-            # Validate and fix ticket_type if needed
-            if action_plan_data.get('create_ticket') and action_plan_data.get('ticket_type'):
-                ticket_type = action_plan_data['ticket_type']
-                valid_types = ['complaint', 'service_request', 'feature_request']
-                
-                if ticket_type not in valid_types:
-                    # Try to map from intent or use best guess
-                    intent = intent_result.get('intent') if intent_result else None
-                    if intent in valid_types:
-                        action_plan_data['ticket_type'] = intent
-                        logger.warning(f"Fixed invalid ticket_type '{ticket_type}' to '{intent}' based on intent")
-                    else:
-                        action_plan_data['ticket_type'] = 'service_request'
-                        logger.warning(f"Fixed invalid ticket_type '{ticket_type}' to 'service_request' (default)")
-            
-            # Ensure idempotency key exists
-            # TODO: idempotency_key should be coded and not dependent on LLM
-            if not action_plan_data.get('idempotency_key'):
-                action_plan_data['idempotency_key'] = str(uuid.uuid4())
-            
-            action_plan = ActionPlan(**action_plan_data)
-            
-            decision = VerificationDecision(
-                is_valid=is_valid,  # Use validated is_valid
-                resolution=decision_extraction.resolution,
-                confidence=confidence,
-                policy_citations=decision_extraction.policy_citations,
-                action_plan=action_plan
-            )
+            decision = self._finalize_decision(decision_extraction, report, intent_result, user_id)
             
             logger.info(f"Successfully created decision: valid={decision.is_valid}, confidence={decision.confidence:.2f}")
             return decision
             
         except Exception as e:
             logger.error(f"Error in verification decision: {e}")
-            return self._create_fallback_decision(report, intent_result)
+            return self._create_fallback_decision(report, intent_result, user_id)
+    
+    def _finalize_decision(self, decision_extraction: VerificationDecision, report: Report, intent_result, user_id: Optional[str]) -> VerificationDecision:
+        """
+        Apply safety checks to an LLM decision: clamp confidence, fix is_valid and ticket_type
+        literals, force a ticket below min_confidence and set the coded idempotency key
+        
+        Returns:
+            Checked VerificationDecision
+        """
+        # Apply safety checks
+        confidence = min(max(decision_extraction.confidence, 0.0), 1.0)
+        
+        # Validate and fix is_valid if needed
+        is_valid = decision_extraction.is_valid
+        valid_is_valid_values = ['Yes', 'Low Confidence', 'No']
+        
+        if is_valid not in valid_is_valid_values:
+            # Try to map from boolean or other values
+            if isinstance(is_valid, bool):
+                is_valid = 'Yes' if is_valid else 'No'
+                logger.warning(f"Fixed boolean is_valid to string: '{is_valid}'")
+            elif str(is_valid).lower() in ['true', 'yes', 'valid']:
+                is_valid = 'Yes'
+                logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'Yes'")
+            elif str(is_valid).lower() in ['false', 'no', 'invalid']:
+                is_valid = 'No'
+                logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'No'")
+            else:
+                is_valid = 'Low Confidence'
+                logger.warning(f"Fixed invalid is_valid '{decision_extraction.is_valid}' to 'Low Confidence'")
+        
+        # Create action plan with safety checks
+        action_plan_data = decision_extraction.action_plan.model_dump()
+        
+        # Force ticket creation if confidence too low
+        if confidence < self.min_confidence:
+            action_plan_data['create_ticket'] = True
+            logger.info(f"Confidence {confidence} below threshold {self.min_confidence}, forcing ticket creation")
+        
+        # Validate and fix ticket_type if needed
+        if action_plan_data.get('create_ticket') and action_plan_data.get('ticket_type'):
+            ticket_type = action_plan_data['ticket_type']
+            valid_types = ['complaint', 'service_request', 'feature_request']
+            
+            if ticket_type not in valid_types:
+                # Try to map from intent or use best guess
+                intent = intent_result.get('intent') if intent_result else None
+                if intent in valid_types:
+                    action_plan_data['ticket_type'] = intent
+                    logger.warning(f"Fixed invalid ticket_type '{ticket_type}' to '{intent}' based on intent")
+                else:
+                    action_plan_data['ticket_type'] = 'service_request'
+                    logger.warning(f"Fixed invalid ticket_type '{ticket_type}' to 'service_request' (default)")
+        
+        # Derived from tenant, user and issue so a retried run acts on the same key
+        action_plan_data['idempotency_key'] = self._idempotency_key(report, user_id)
+        
+        action_plan = ActionPlan(**action_plan_data)
+        
+        return VerificationDecision(
+            is_valid=is_valid,  # Use validated is_valid
+            resolution=decision_extraction.resolution,
+            confidence=confidence,
+            policy_citations=decision_extraction.policy_citations,
+            action_plan=action_plan
+        )
+    
+    def ticket_idempotency_key(self, state: dict) -> str:
+        """
+        Idempotency key for a create_jira_ticket call in this run
+        
+        Derived from tenant, user and report issue like the resolution key, not from the
+        LLM-written ticket text, so a retried run asking for the ticket again gets the original.
+        
+        Args:
+            state: Agent state with report and user_id
+            
+        Returns:
+            'jira_ticket' idempotency key
+        """
+        report_data = state.get('report')
+        report = Report(**report_data) if isinstance(report_data, dict) else report_data
+        return self._idempotency_key(report, state.get('user_id'), action="jira_ticket")
+    
+    def _idempotency_key(self, report: Optional[Report], user_id: Optional[str], action: str = "resolution") -> str:
+        """Idempotency key for the decision's side effects (incident, ticket, refund)"""
+        return make_idempotency_key(self.tenant_id, user_id, report.issue if report else None, action)
+    
+    def _record_incident(self, decision: VerificationDecision, report: Report, intent_result, user_id: Optional[str]) -> dict:
+        """
+        Queue an incident record for the decision when its action plan asks for one.
+        The write-behind queue journals the record and commits it in the background,
+        so the response doesn't wait on the database.
+        
+        Returns:
+            Verification dict, with incident_id set when a record was queued
+        """
+        verification = decision.dict()
+        action_plan = decision.action_plan
+        if not action_plan or not action_plan.make_db_entry:
+            return verification
+        
+        writer = get_incident_writer()
+        if writer is None:
+            return verification
+        
+        is_valid = {'Yes': True, 'No': False}.get(decision.is_valid)  # Low Confidence -> unknown
+        needs_follow_up = action_plan.create_ticket or action_plan.call_refund_api or is_valid is None
+        
+        def submit() -> str:
+            return writer.submit({
+                'user_id': user_id,
+                'tenant_id': self.tenant_id,
+                'intent': intent_result.get('intent') if intent_result else None,
+                'summary': (report.issue or "")[:500],
+                'issue': report.issue,
+                'user_demand': report.user_demand,
+                'is_valid': is_valid,
+                'resolution': decision.resolution,
+                'confidence': decision.confidence,
+                'status': 'open' if needs_follow_up else 'resolved',
+                'policy_refs': decision.policy_citations,
+                'decision_json': verification
+            }, idempotency_key=action_plan.idempotency_key or None)
+
+        try:
+            # Registers the key in the idempotency store, so a retry replays the same incident_id
+            verification['incident_id'] = run_once(action_plan.idempotency_key, submit, action="resolution")
+        except Exception as e:
+            # Record keeping must never fail the verification response
+            logger.error(f"Failed to queue incident record: {e}")
+        
+        return verification
     
     def _format_decision_context(self, report: Report, intent_result, messages: List = None) -> str:
         """Format comprehensive context for final decision including tool results"""
@@ -406,7 +602,7 @@ Make your decision now with the correct literal string values."""
         
         return "\n".join(context_parts)
     
-    def _create_fallback_decision(self, report: Report, intent_result) -> VerificationDecision:
+    def _create_fallback_decision(self, report: Report, intent_result, user_id: Optional[str] = None) -> VerificationDecision:
         """Create fallback decision when LLM decision fails"""
         logger.warning("Using fallback decision creation")
         
@@ -431,7 +627,7 @@ Make your decision now with the correct literal string values."""
                 make_db_entry=True,
                 call_refund_api=False,
                 refund_amount=None,
-                idempotency_key=str(uuid.uuid4())
+                idempotency_key=self._idempotency_key(report, user_id)
             )
         )
 
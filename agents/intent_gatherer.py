@@ -4,15 +4,43 @@ Analyzes user intent and performs strategic retrieval based on query complexity
 """
 
 import json
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Optional
 from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
-from services.agent_schemas import IntentResult, KBDocument
+from services.agent_schemas import IntentResult, IntentWithReport, KBDocument
 from services.rag_scoring import score_and_pack
 import services.services as services
 from services.config_loader import get_config
 from services.logger_setup import setup_logger
 logger = setup_logger()
 config = get_config()
+
+_speculative_executor: Optional[ThreadPoolExecutor] = None
+_speculative_executor_lock = threading.Lock()
+
+
+def _get_speculative_executor() -> ThreadPoolExecutor:
+    """Shared pool for speculative retrievals (graphs and agents are created per request)"""
+    global _speculative_executor
+    with _speculative_executor_lock:
+        if _speculative_executor is None:
+            _speculative_executor = ThreadPoolExecutor(
+                max_workers=config.get('retrieval.speculative.max_workers', 4),
+                thread_name_prefix="speculative-retrieval"
+            )
+    return _speculative_executor
+
+
+def _token_jaccard(a: str, b: str) -> float:
+    """Jaccard similarity of the lowercase word sets of two strings"""
+    tokens_a = set(re.findall(r"\w+", a.lower()))
+    tokens_b = set(re.findall(r"\w+", b.lower()))
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
 # eaach aspect create should be a new search query and therefore self explanatory. Think more.
 # we need to find the query topic and stick to it for question on each aspect. a new meta data needs to be created maybe.
 class IntentGathererAgent:
@@ -34,8 +62,11 @@ class IntentGathererAgent:
             user_role: User role for RBAC filtering
         """
         self.llm = llm
+        # Fused mode also extracts the user-side report fields in the intent call,
+        # so the report maker only has to handle the company documents
+        self.fuse_report = config.get('multi_agent.fused_intent_report.enabled', True)
         # Create structured output LLM for intent analysis
-        self.structured_llm = llm.with_structured_output(IntentResult)
+        self.structured_llm = llm.with_structured_output(IntentWithReport if self.fuse_report else IntentResult)
         self.tenant_id = tenant_id
         self.user_role = user_role
         self.config = config
@@ -48,33 +79,42 @@ class IntentGathererAgent:
             state: Agent state containing messages and context
             
         Returns:
-            Updated state with intent_result and kb_docs
+            Updated state with intent_result, kb_docs and (fused mode) report_draft
         """
         logger.info("IntentGathererAgent: Processing user query")
+        user_query = self._extract_query_text(state['messages'])
+        
+        # Start retrieving for the raw query while the intent call runs
+        speculative = self._start_speculative_retrieval(user_query)
         
         # Step 1: Get intent analysis from LLM
         intent_data = self._analyze_intent(state)
+        user_report = intent_data.pop('user_report', None)
         intent_result = IntentResult(**intent_data)
+        report_draft = user_report if user_report and intent_result.intent != 'query' else None
         
         logger.info(f"Intent Analysis: {intent_result.intent}, aspects: {intent_result.aspects}, "
                    f"out_of_scope: {intent_result.out_of_scope}")
         
         if intent_result.out_of_scope:
             logger.info("Query is out of scope, skipping retrieval")
+            if speculative:
+                speculative.cancel()
             return {
                 'intent_result': intent_result.dict(),
-                'kb_docs': []
+                'kb_docs': [],
+                'report_draft': None
             }
         
         # Step 3: Perform strategic retrieval based on complexity
-        user_query = self._extract_query_text(state['messages'])
-        kb_docs = self._gather_documents(user_query, intent_result.aspects)
+        kb_docs = self._gather_documents(user_query, intent_result.aspects, speculative)
         
         logger.info(f"Retrieved {len(kb_docs)} documents for user query")
         
         return {
             'intent_result': intent_result.dict(),
-            'kb_docs': [doc.dict() for doc in kb_docs]
+            'kb_docs': [doc.dict() for doc in kb_docs],
+            'report_draft': report_draft
         }
     
     def _analyze_intent(self, state: dict) -> dict:
@@ -126,6 +166,16 @@ Guidelines:
      * Financial service complaints
    - Be STRICT: If it's not clearly BFSI-related, mark as out_of_scope=true
 """
+        if self.fuse_report:
+            system_prompt += """
+6. **User Report (user_report):**
+   - Fill ONLY for in-scope complaint, service_request or feature_request intents; leave empty for query
+   - issue: clear statement of the problem (1-2 sentences)
+   - user_demand: what the user is requesting
+   - support_info_from_user: evidence/context provided by the user
+   - policy_refs: policy numbers or section references the user mentioned
+   - Use ONLY the user's messages; if info is not available, use "Not specified"
+"""
 
         messages = [SystemMessage(content=system_prompt)] + list(state['messages'])
         
@@ -158,7 +208,31 @@ Guidelines:
             'out_of_scope': False
         }
     
-    def _gather_documents(self, query: str, aspects: List[str]) -> List[KBDocument]:
+    def _start_speculative_retrieval(self, query: str) -> Optional[Future]:
+        """
+        Submit a retrieval for the raw user query to run alongside the intent call
+        
+        Returns:
+            Future resolving to (documents, scores), or None when disabled
+        """
+        if not query or not self.config.get('retrieval.speculative.enabled', True):
+            return None
+        return _get_speculative_executor().submit(
+            services.retrieve_with_scores,
+            query=query,
+            tenant_id=self.tenant_id,
+            user_role=self.user_role,
+            k=self.config.get('retrieval.k', 6)
+        )
+    
+    def _speculative_result(self, speculative: Future) -> Optional[tuple]:
+        try:
+            return speculative.result()
+        except Exception as e:
+            logger.warning(f"Speculative retrieval failed: {e}")
+            return None
+    
+    def _gather_documents(self, query: str, aspects: List[str], speculative: Optional[Future] = None) -> List[KBDocument]:
         """
         Strategic multi-search with diversity (MMR) and scoring aggregation
         
@@ -167,10 +241,13 @@ Guidelines:
         - If len(aspects) > 1: parallel retrieval per aspect, union, score, dedupe, top-K
         - Use MMR for diversity when configured
         - Apply scoring and threshold filtering
+        - A speculative raw-query retrieval is reused for a single aspect close to the
+          query, merged into multi-aspect results, and cancelled otherwise
         
         Args:
             query: Original user query
             aspects: List of query aspects/facets
+            speculative: Future from _start_speculative_retrieval (optional)
             
         Returns:
             List of KBDocument objects, scored and deduplicated
@@ -182,17 +259,30 @@ Guidelines:
         all_documents = []
         all_scores = []
         
+        min_similarity = self.config.get('retrieval.speculative.min_similarity', 0.3)
+        
         if len(aspects) <= 1:
             # Simple query: single retrieval
             search_query = aspects[0] if aspects else query
-            logger.debug(f"Single-aspect retrieval for: {search_query}")
             
-            docs, scores = services.retrieve_with_scores(
-                query=search_query,
-                tenant_id=self.tenant_id,
-                user_role=self.user_role,
-                k=k_per_aspect
-            )
+            speculative_hit = None
+            if speculative:
+                if _token_jaccard(search_query, query) >= min_similarity:
+                    speculative_hit = self._speculative_result(speculative)
+                else:
+                    speculative.cancel()
+            
+            if speculative_hit:
+                logger.debug(f"Reusing speculative retrieval for: {search_query}")
+                docs, scores = speculative_hit
+            else:
+                logger.debug(f"Single-aspect retrieval for: {search_query}")
+                docs, scores = services.retrieve_with_scores(
+                    query=search_query,
+                    tenant_id=self.tenant_id,
+                    user_role=self.user_role,
+                    k=k_per_aspect
+                )
             
             all_documents.extend(docs)
             all_scores.extend(scores)
@@ -217,6 +307,16 @@ Guidelines:
                 except Exception as e:
                     logger.warning(f"Failed to retrieve for aspect '{aspect}': {e}")
                     continue
+            
+            # The raw-query results are already paid for; add them to the pool (score_and_pack dedupes)
+            if speculative:
+                if self.config.get('retrieval.speculative.merge_multi_aspect', True):
+                    speculative_hit = self._speculative_result(speculative)
+                    if speculative_hit:
+                        all_documents.extend(speculative_hit[0])
+                        all_scores.extend(speculative_hit[1])
+                else:
+                    speculative.cancel()
         
         if not all_documents:
             logger.warning("No documents retrieved for any aspect")
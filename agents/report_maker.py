@@ -7,8 +7,11 @@ from typing import List
 from pydantic import BaseModel, Field
 from langchain_core.messages import SystemMessage, HumanMessage
 from services.agent_schemas import Report, KBDocument
+from services.config_loader import get_config
+from services.context_packer import pack_context
 from services.logger_setup import setup_logger
 logger = setup_logger()
+config = get_config()
 
 # do not just pass in the kb docs received in the output as company_docs_about_issue. it needs to be rephrased and restructured in order to facilitate the user query for further evaluation.  
 class ReportExtraction(BaseModel):
@@ -22,6 +25,14 @@ class ReportExtraction(BaseModel):
                     "Format as clear paragraphs or numbered points in a single string field."
     )
 
+class CompanyDocsExtraction(BaseModel):
+    """Schema for the company-docs part of the report (fused pipeline)"""
+    company_docs_about_issue: str = Field(
+        description="Rephrased and restructured relevant information from company documents. "
+                    "Format as clear paragraphs or numbered points in a single string field."
+    )
+    policy_refs: str = Field(description="Policy numbers or section references found in the documents (if any)")
+
 class ReportMakerAgent:
     """
     Agent responsible for structuring information into a standardized report.
@@ -42,6 +53,9 @@ class ReportMakerAgent:
         """
         self.llm = llm
         self.structured_llm = llm.with_structured_output(ReportExtraction)
+        self.docs_llm = llm.with_structured_output(CompanyDocsExtraction)
+        # KB results up to this many characters go into the report verbatim (no LLM call)
+        self.skip_summary_max_chars = config.get('multi_agent.fused_intent_report.skip_summary_max_chars', 1500)
         
     def process(self, state: dict) -> dict:
         """
@@ -52,6 +66,7 @@ class ReportMakerAgent:
                 - messages: Chat history with user query
                 - kb_docs: List of KBDocument objects from intent gatherer
                 - intent_result: Intent analysis result
+                - report_draft: User-side report fields from the fused intent call (optional)
                 
         Returns:
             Updated state with structured report
@@ -60,9 +75,20 @@ class ReportMakerAgent:
         
         kb_docs_data = state.get('kb_docs', [])
         kb_docs = [KBDocument(**doc) if isinstance(doc, dict) else doc for doc in kb_docs_data]
+        # Merge overlapping chunks and fit chat.context_token_budget
+        kb_docs = pack_context(kb_docs)
         messages = state.get('messages', [])
         self.messages = messages
         
+        report_draft = state.get('report_draft')
+        if report_draft:
+            # User-side fields already extracted with intent; only the company docs remain
+            report = self._complete_report(report_draft, kb_docs)
+            logger.info(f"Completed report from draft - Issue: {report.issue[:50]}...")
+            return {
+                'report': report.dict()
+            }
+        
         # Build context from messages and KB documents
         context = self._format_context(messages, kb_docs)
         
@@ -97,6 +123,13 @@ class ReportMakerAgent:
         context_parts.append("")
         
         # Add KB documents
+        context_parts.append(self._format_documents(kb_docs))
+        
+        return "\n".join(context_parts)
+    
+    def _format_documents(self, kb_docs: List[KBDocument]) -> str:
+        """Format KB documents with source and relevance headers"""
+        context_parts = []
         if kb_docs:
             context_parts.append("=== Company Documents (Knowledge Base) ===")
             for i, doc in enumerate(kb_docs, 1):
@@ -167,6 +200,80 @@ Extract and structure the following from the provided context:
             logger.error(f"Error in report extraction: {e}")
             return self._fallback_report(context, kb_docs)
     
+    def _complete_report(self, report_draft: dict, kb_docs: List[KBDocument]) -> Report:
+        """
+        Fill company_docs_about_issue for a report whose user-side fields came from the intent call.
+        Small KB results are used verbatim; larger ones are summarized with one LLM call.
+        
+        Args:
+            report_draft: issue, user_demand, support_info_from_user and policy_refs
+            kb_docs: Knowledge base documents
+            
+        Returns:
+            Report object
+        """
+        policy_refs = report_draft.get('policy_refs') or "Not specified"
+        
+        if not kb_docs:
+            company_docs = "No relevant documents found in knowledge base."
+        elif sum(len(doc.content) for doc in kb_docs) <= self.skip_summary_max_chars:
+            logger.info("KB results are small, using them verbatim without a summary call")
+            company_docs = self._docs_verbatim(kb_docs)
+        else:
+            company_docs, doc_refs = self._summarize_company_docs(report_draft, kb_docs)
+            if doc_refs and doc_refs != "Not specified":
+                policy_refs = doc_refs if policy_refs == "Not specified" else f"{policy_refs}; {doc_refs}"
+        
+        return Report(
+            issue=report_draft.get('issue') or "Issue not specified",
+            user_demand=report_draft.get('user_demand') or "Not specified",
+            company_docs_about_issue=company_docs,
+            support_info_from_user=report_draft.get('support_info_from_user') or "Not specified",
+            policy_refs=policy_refs
+        )
+    
+    def _summarize_company_docs(self, report_draft: dict, kb_docs: List[KBDocument]) -> tuple:
+        """
+        Rephrase the KB documents relevant to the drafted issue
+        
+        Returns:
+            (company_docs_about_issue, policy_refs from the documents)
+        """
+        system_prompt = """You are a report structuring assistant for a BFSI organization.
+
+Rephrase ONLY the parts of the company documents that address the user's issue.
+
+1. **company_docs_about_issue**: Relevant company document content as numbered points or paragraphs in a SINGLE STRING. Be concise.
+2. **policy_refs**: Policy numbers or section references found in the documents (if any)
+
+**Rules:**
+- Use ONLY information from the provided documents
+- If info not available, use "Not specified"
+- Be crisp - extract only what's relevant to the user's issue"""
+
+        documents = self._format_documents(kb_docs)
+        user_prompt = f"""User's issue: {report_draft.get('issue')}
+User's demand: {report_draft.get('user_demand')}
+
+{documents}"""
+
+        try:
+            extraction = self.docs_llm.invoke([
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=user_prompt)
+            ])
+            return extraction.company_docs_about_issue, extraction.policy_refs
+        except Exception as e:
+            logger.error(f"Error in company docs summary: {e}")
+            return self._docs_verbatim(kb_docs, max_chars=500), None
+    
+    def _docs_verbatim(self, kb_docs: List[KBDocument], max_chars: int = None) -> str:
+        parts = []
+        for i, doc in enumerate(kb_docs, 1):
+            content = doc.content[:max_chars] + "..." if max_chars and len(doc.content) > max_chars else doc.content
+            parts.append(f"{i}. {content}")
+        return "\n\n".join(parts)
+    
     def _fallback_report(self, context: str, kb_docs: List[KBDocument]) -> Report:
         logger.warning("Using fallback report creation")
         issue = ""
@@ -176,11 +283,7 @@ Extract and structure the following from the provided context:
         
         # Convert KB docs to single string for fallback
         if kb_docs:
-            company_docs_parts = []
-            for i, doc in enumerate(kb_docs, 1):
-                content = doc.content[:500] + "..." if len(doc.content) > 500 else doc.content
-                company_docs_parts.append(f"{i}. {content}")
-            company_docs_text = "\n\n".join(company_docs_parts)
+            company_docs_text = self._docs_verbatim(kb_docs, max_chars=500)
         else:
             company_docs_text = "No company documents available"
         
@@ -0,0 +1 @@
+# Benchmarks package for Echo application
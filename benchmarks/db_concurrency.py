@@ -0,0 +1,153 @@
+"""
+Concurrency benchmark for the SQLite data layer
+Runs mixed read/write tool traffic (get_user_data, list_user_policies, create_incident_record)
+from several worker threads against a scratch database, once with SQLite's default rollback
+journal and once with the tuned engine (WAL, synchronous=NORMAL, busy_timeout).
+
+Each scenario gets its own engine and session factory (see use_session_factory); the
+application database and module globals are left untouched. Reads go through the uncached
+loaders, so the read-through user cache doesn't hide database latency.
+
+Usage:
+    python -m benchmarks.db_concurrency --workers 8 --ops 200 --write-ratio 0.2
+"""
+
+import argparse
+import contextvars
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base, create_db_engine, use_session_factory, DEFAULT_SQLITE_PRAGMAS
+from services.user_data_service import (
+    _load_user, _load_user_policies, create_incident_record, insert_user, insert_policy
+)
+
+# SQLite defaults as used before the engine factory (pysqlite's 5s busy timeout, rollback journal)
+ROLLBACK_JOURNAL_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+
+NUM_USERS = 50
+
+
+def seed(num_users: int) -> None:
+    """Create users with two policies each"""
+    for i in range(num_users):
+        user_id = f"BENCH{i:04d}"
+        insert_user({
+            "user_id": user_id,
+            "name": f"Bench User {i}",
+            "email": f"bench{i}@example.com",
+            "date_registered": "2024-01-01"
+        })
+        for j in range(2):
+            insert_policy({
+                "policy_number": f"POL-{user_id}-{j}",
+                "user_id": user_id,
+                "policy_name": "Device Protection",
+                "start_date": "2024-01-01",
+                "end_date": "2025-01-01",
+                "last_payment_amount": 499.0
+            })
+
+
+def worker(ops: int, write_ratio: float, latencies: list, errors: list, lock: threading.Lock) -> None:
+    rng = random.Random()
+    for _ in range(ops):
+        user_id = f"BENCH{rng.randrange(NUM_USERS):04d}"
+        started = time.perf_counter()
+        try:
+            roll = rng.random()
+            if roll < write_ratio:
+                create_incident_record.invoke({"incident_data": {
+                    "user_id": user_id,
+                    "tenant_id": "bench",
+                    "intent": "complaint",
+                    "issue": "Benchmark incident",
+                    "confidence": 0.8
+                }})
+            elif roll < write_ratio + (1 - write_ratio) / 2:
+                _load_user(user_id, None)
+            else:
+                _load_user_policies(user_id)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+
+def run_scenario(name: str, pragmas: dict, workers: int, ops: int, write_ratio: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = Path(tmp_dir) / "bench.db"
+        bench_engine = create_db_engine(f"sqlite:///{db_file}", sqlite_pragmas=pragmas)
+        Base.metadata.create_all(bind=bench_engine)
+        bench_sessions = sessionmaker(autocommit=False, autoflush=False, bind=bench_engine)
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        # Route the tool functions to the scratch database for this scenario only
+        with use_session_factory(bench_sessions):
+            seed(NUM_USERS)
+            # Threads don't inherit context variables: each runs in its own copy of this context
+            threads = [
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(worker, ops, write_ratio, latencies, errors, lock)
+                )
+                for _ in range(workers)
+            ]
+
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - started
+
+        bench_engine.dispose()
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "ops": len(latencies),
+        "errors": len(errors),
+        "locked_errors": sum("locked" in e for e in errors),
+        "ops_per_second": len(latencies) / wall if wall else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent DB tool traffic")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="Operations per worker")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print("\nDB Concurrency Benchmark")
+    print("=" * 60)
+    print(f"workers={args.workers}, ops/worker={args.ops}, write_ratio={args.write_ratio}")
+
+    results = [
+        run_scenario("rollback journal (baseline)", ROLLBACK_JOURNAL_PRAGMAS, args.workers, args.ops, args.write_ratio),
+        run_scenario("WAL + NORMAL + busy_timeout", DEFAULT_SQLITE_PRAGMAS, args.workers, args.ops, args.write_ratio),
+    ]
+
+    for result in results:
+        print(f"\n--- {result['scenario']} ---")
+        print(f"  Completed ops: {result['ops']} ({result['ops_per_second']:.0f} ops/s)")
+        print(f"  Errors: {result['errors']} (database is locked: {result['locked_errors']})")
+        print(f"  Latency p50: {result['p50_ms']:.2f} ms, p95: {result['p95_ms']:.2f} ms")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Fake Jira server
+Minimal stand-in for the Jira REST API v2 endpoints used by JiraTool, for tests and benchmarks:
+
+    GET  /rest/api/2/serverInfo
+    POST /rest/api/2/issue
+    POST /rest/api/2/issue/bulk
+    GET  /rest/api/2/issue/<key>
+    GET  /rest/api/2/field           (fetched once by the client before its first search)
+    GET  /rest/api/2/search          (only "labels in (...)" clauses are evaluated)
+
+Latency and failure rate can be injected to exercise retries and the outbox dispatcher.
+
+Usage:
+    python -m benchmarks.fake_jira_server --port 8089 --latency-ms 150
+    # then: JIRA_URL=http://127.0.0.1:8089 JIRA_EMAIL=x JIRA_API_TOKEN=x JIRA_PROJECT_KEY=ECHO
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+ISSUE_PATH = re.compile(r"^/rest/api/2/issue/([A-Z][A-Z0-9]*-\d+)$")
+LABELS_CLAUSE = re.compile(r"labels\s+in\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+class FakeJiraState:
+    """In-memory issues plus request counters, shared by all handler threads"""
+
+    def __init__(self, latency_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.issues = {}
+        self.requests = {"serverInfo": 0, "issue": 0, "bulk": 0, "get": 0, "search": 0, "failed": 0}
+        self._ids = itertools.count(10001)
+        self._lock = threading.Lock()
+
+    def create_issue(self, fields: dict, base_url: str) -> dict:
+        with self._lock:
+            issue_id = next(self._ids)
+            project = (fields.get("project") or {}).get("key", "ECHO")
+            key = f"{project}-{issue_id - 10000}"
+            issue = {"id": str(issue_id), "key": key, "self": f"{base_url}/rest/api/2/issue/{issue_id}"}
+            self.issues[key] = {**issue, "fields": fields}
+        return issue
+
+    def search_by_labels(self, labels: set, max_results: int) -> list:
+        with self._lock:
+            matches = [
+                {"id": issue["id"], "key": issue["key"], "self": issue["self"],
+                 "fields": {"labels": issue["fields"].get("labels") or []}}
+                for issue in self.issues.values()
+                if labels & set(issue["fields"].get("labels") or [])
+            ]
+        return matches[:max_results]
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    server_version = "FakeJira/1.0"
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a real Jira behind a load balancer
+
+    @property
+    def state(self) -> FakeJiraState:
+        return self.server.state
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        if not self._before_request():
+            return
+        path = self.path.split('?')[0]
+        if path == "/rest/api/2/serverInfo":
+            self._count("serverInfo")
+            self._send(200, {
+                "baseUrl": self.base_url,
+                "version": "9.12.0",
+                "versionNumbers": [9, 12, 0],
+                "deploymentType": "Server",
+                "buildNumber": 9120000,
+                "serverTitle": "Fake Jira"
+            })
+            return
+
+        if path == "/rest/api/2/field":
+            self._send(200, [
+                {"id": field_id, "name": field_id.capitalize(), "custom": False, "clauseNames": [field_id]}
+                for field_id in ("summary", "description", "issuetype", "labels", "project")
+            ])
+            return
+
+        if path == "/rest/api/2/search":
+            self._count("search")
+            params = parse_qs(urlparse(self.path).query)
+            clause = LABELS_CLAUSE.search((params.get("jql") or [""])[0])
+            labels = {label.strip().strip('"') for label in clause.group(1).split(",")} if clause else set()
+            max_results = int((params.get("maxResults") or [50])[0])
+            issues = self.state.search_by_labels(labels, max_results)
+            self._send(200, {"startAt": 0, "maxResults": max_results, "total": len(issues), "issues": issues})
+            return
+
+        match = ISSUE_PATH.match(path)
+        if match:
+            self._count("get")
+            issue = self.state.issues.get(match.group(1))
+            if issue:
+                self._send(200, issue)
+            else:
+                self._send(404, {"errorMessages": ["Issue does not exist"], "errors": {}})
+            return
+
+        self._send(404, {"errorMessages": [f"No route for GET {path}"], "errors": {}})
+
+    def do_POST(self):
+        if not self._before_request():
+            return
+        path = self.path.split('?')[0]
+        body = self._read_json()
+
+        if path == "/rest/api/2/issue":
+            self._count("issue")
+            fields = (body or {}).get("fields", {})
+            errors = self._validate(fields)
+            if errors:
+                self._send(400, {"errorMessages": [], "errors": errors})
+            else:
+                self._send(201, self.state.create_issue(fields, self.base_url))
+            return
+
+        if path == "/rest/api/2/issue/bulk":
+            self._count("bulk")
+            created, failed = [], []
+            for index, update in enumerate((body or {}).get("issueUpdates", [])):
+                fields = update.get("fields", {})
+                errors = self._validate(fields)
+                if errors:
+                    failed.append({
+                        "status": 400,
+                        "elementErrors": {"errorMessages": [], "errors": errors},
+                        "failedElementNumber": index
+                    })
+                else:
+                    created.append(self.state.create_issue(fields, self.base_url))
+            self._send(201 if not failed else 400, {"issues": created, "errors": failed})
+            return
+
+        self._send(404, {"errorMessages": [f"No route for POST {path}"], "errors": {}})
+
+    # ========== HELPERS ==========
+
+    def _before_request(self) -> bool:
+        """Apply injected latency/failures; returns False if the request was failed"""
+        if self.state.latency_ms:
+            time.sleep(self.state.latency_ms / 1000)
+        if self.state.failure_rate and random.random() < self.state.failure_rate:
+            self._read_json()
+            self._count("failed")
+            self._send(503, {"errorMessages": ["Injected failure"], "errors": {}})
+            return False
+        return True
+
+    def _validate(self, fields: dict) -> dict:
+        errors = {}
+        if not fields.get("summary"):
+            errors["summary"] = "You must specify a summary of the issue."
+        if not fields.get("project"):
+            errors["project"] = "project is required"
+        return errors
+
+    def _count(self, name: str) -> None:
+        with self.state._lock:
+            self.state.requests[name] += 1
+
+    def _read_json(self) -> Optional[dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            return None
+
+    def _send(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_jira(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, failure_rate: float = 0.0):
+    """
+    Start the fake server on a background thread
+
+    Args:
+        host: Bind address
+        port: Bind port (0 picks a free port)
+        latency_ms: Delay added to every request
+        failure_rate: Fraction of requests answered with 503
+
+    Returns:
+        (server, base_url); call server.shutdown() to stop it and read server.state for counters
+    """
+    server = ThreadingHTTPServer((host, port), FakeJiraHandler)
+    server.daemon_threads = True
+    server.state = FakeJiraState(latency_ms=latency_ms, failure_rate=failure_rate)
+    thread = threading.Thread(target=server.serve_forever, name="fake-jira", daemon=True)
+    thread.start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Jira REST API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_jira(args.host, args.port, args.latency_ms, args.failure_rate)
+    print(f"Fake Jira listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Jira outbox benchmark
+Compares user-facing latency of creating tickets inline (one create_issue round-trip per
+ticket) against queueing them in the outbox, and measures how long the dispatcher takes to
+drain the queue with bulk creates. Runs against the local fake Jira server.
+
+Usage:
+    python -m benchmarks.jira_outbox --tickets 200 --latency-ms 150
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fake_jira_server import start_fake_jira
+from services.database import Base, create_db_engine, use_session_factory
+from services.jira_tool import JiraTool
+from services.jira_outbox import OutboxDispatcher, enqueue_ticket
+
+
+def configure_jira_env(base_url: str) -> None:
+    os.environ.update({
+        "JIRA_URL": base_url,
+        "JIRA_EMAIL": "bench@example.com",
+        "JIRA_API_TOKEN": "bench-token",
+        "JIRA_PROJECT_KEY": "ECHO",
+    })
+    JiraTool._instance = None  # Reconnect to the fake server
+
+
+def summarize(name: str, latencies: list, wall: float, requests: dict) -> None:
+    latencies = sorted(latencies)
+    print(f"\n--- {name} ---")
+    print(f"  Tickets: {len(latencies)}, wall time: {wall:.2f}s")
+    print(f"  Response latency p50: {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.2f} ms")
+    print(f"  Jira requests: {requests}")
+
+
+def run_inline(tickets: int, latency_ms: float) -> None:
+    server, base_url = start_fake_jira(latency_ms=latency_ms)
+    configure_jira_env(base_url)
+    jira = JiraTool()
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(tickets):
+        t0 = time.perf_counter()
+        jira.create_ticket(f"Benchmark ticket {i}", "Inline creation", "complaint", "medium", "neutral")
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - started
+
+    summarize("inline create_issue", latencies, wall, dict(server.state.requests))
+    server.shutdown()
+
+
+def run_outbox(tickets: int, latency_ms: float) -> None:
+    server, base_url = start_fake_jira(latency_ms=latency_ms)
+    configure_jira_env(base_url)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_engine = create_db_engine(f"sqlite:///{Path(tmp_dir) / 'outbox.db'}")
+        Base.metadata.create_all(bind=bench_engine)
+        bench_sessions = sessionmaker(autocommit=False, autoflush=False, bind=bench_engine)
+
+        # Scratch database for this run only; the dispatcher thread inherits the routing
+        with use_session_factory(bench_sessions):
+            dispatcher = OutboxDispatcher(poll_interval_seconds=0.05)
+            dispatcher.start()
+
+            latencies = []
+            started = time.perf_counter()
+            for i in range(tickets):
+                t0 = time.perf_counter()
+                enqueue_ticket(f"Benchmark ticket {i}", "Outbox creation", "complaint", "medium", "neutral")
+                latencies.append(time.perf_counter() - t0)
+            enqueued = time.perf_counter() - started
+
+            drained = dispatcher.drain(timeout=300)
+            wall = time.perf_counter() - started
+            dispatcher.stop()
+        bench_engine.dispose()
+
+    summarize("outbox enqueue + bulk dispatch", latencies, wall, dict(server.state.requests))
+    print(f"  Enqueue time: {enqueued:.2f}s, drained: {drained}, dispatcher: {dispatcher.stats()}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inline Jira creation vs the outbox")
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Fake Jira per-request latency")
+    args = parser.parse_args()
+
+    print("\nJira Outbox Benchmark")
+    print("=" * 60)
+    print(f"tickets={args.tickets}, jira latency={args.latency_ms}ms")
+
+    run_inline(args.tickets, args.latency_ms)
+    run_outbox(args.tickets, args.latency_ms)
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Verifier mode benchmark
+Runs the claim verifier over sample reports in both modes and compares LLM calls, tokens and
+latency per decision:
+
+    two-call:    tool-check call (llm_with_tools) + structured decision call
+    single-call: one call that either requests tools or submits a VerificationDecision
+
+Read-only tool calls are executed like the graph's tool node. create_jira_ticket stays bound
+so both modes see the same tools, but its calls are answered with a canned result instead of
+queueing a real ticket. Incidents are not recorded.
+Needs the model credentials from .env (GOOGLE_API_KEY for the default model).
+
+Usage:
+    python -m benchmarks.verifier_modes --repeats 3
+"""
+
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+from langchain.chat_models import init_chat_model
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import ToolMessage
+
+from agents.claim_verifier import ClaimVerifierAgent
+from services.config_loader import get_config
+from services.database import init_db
+from services.tools_service import get_all_tools
+
+TENANT_ID = "rentomojo"
+MAX_ROUNDS = 3
+
+# Side-effecting tools answered with a canned result instead of being executed
+STUBBED_TOOL_RESULTS = {
+    "create_jira_ticket": "Successfully created JIRA ticket: BENCH-1"
+}
+
+CASES = [
+    {
+        "intent_result": {"intent": "complaint", "urgency": "high", "sentiment": "negative"},
+        "report": {
+            "issue": "Insurance claim for water damage was rejected despite submitting all documents",
+            "user_demand": "Reconsider the claim and approve the payout",
+            "company_docs_about_issue": "Claims require photos, repair estimate and the policy number; "
+                                        "water damage from gradual leakage is excluded.",
+            "support_info_from_user": "Submitted photos and a repair estimate within 7 days",
+            "policy_refs": "Home Insurance Policy, Section 4.2 Exclusions"
+        },
+        "user_id": "U001",
+        "email": "user001@example.com"
+    },
+    {
+        "intent_result": {"intent": "service_request", "urgency": "medium", "sentiment": "neutral"},
+        "report": {
+            "issue": "Premium was debited twice for the same month",
+            "user_demand": "Refund the duplicate premium payment",
+            "company_docs_about_issue": "Duplicate debits are refunded within 7 working days after verification.",
+            "support_info_from_user": "Two identical debits on the bank statement",
+            "policy_refs": "Payments Policy, Section 2.1 Refunds"
+        },
+        "user_id": "U001",
+        "email": "john.doe@example.com"
+    },
+    {
+        "intent_result": {"intent": "feature_request", "urgency": "low", "sentiment": "positive"},
+        "report": {
+            "issue": "No option to download policy documents from the mobile app",
+            "user_demand": "Add policy document download to the app",
+            "company_docs_about_issue": "Policy documents are available from the web portal.",
+            "support_info_from_user": "Uses the mobile app exclusively",
+            "policy_refs": "None"
+        },
+        "user_id": None,
+        "email": None
+    },
+]
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Counts chat model calls and the tokens they report"""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+                self.tokens += usage.get('total_tokens', 0)
+
+
+class BenchmarkVerifier(ClaimVerifierAgent):
+    """Verifier that returns decisions without recording incidents"""
+
+    def _record_incident(self, decision, report, intent_result, user_id):
+        return decision.dict()
+
+
+def verify(agent: ClaimVerifierAgent, tools_dict: dict, case: dict) -> dict:
+    """Run the verifier until it decides, executing requested tools in between"""
+    state = {**case, "messages": []}
+    for _ in range(MAX_ROUNDS):
+        result = agent.process(state)
+        if result.get('verification'):
+            return result['verification']
+        last_message = result['messages'][-1]
+        tool_messages = []
+        for tool_call in last_message.tool_calls:
+            tool = tools_dict.get(tool_call['name'])
+            if tool_call['name'] in STUBBED_TOOL_RESULTS:
+                content = STUBBED_TOOL_RESULTS[tool_call['name']]
+            elif tool:
+                content = str(tool.invoke(tool_call['args']))
+            else:
+                content = f"Tool {tool_call['name']} not found"
+            tool_messages.append(ToolMessage(tool_call_id=tool_call['id'], name=tool_call['name'], content=content))
+        state["messages"] = list(state["messages"]) + result['messages'] + tool_messages
+    return agent.finalize(state, "verifier_rounds")['verification']
+
+
+def run_mode(single_call: bool, repeats: int) -> dict:
+    model_config = get_config().get_section('model')
+    counter = LLMCallCounter()
+    llm = init_chat_model(
+        model_config.get('name', 'gemini-2.0-flash'),
+        model_provider=model_config.get('provider', 'google_genai'),
+        callbacks=[counter]
+    )
+    tools = get_all_tools(tenant_id=TENANT_ID, user_role="customer")
+    agent = BenchmarkVerifier(llm=llm, tools=tools, tenant_id=TENANT_ID, user_role="customer", single_call=single_call)
+    tools_dict = {tool.name: tool for tool in tools}
+
+    latencies, decisions = [], []
+    for _ in range(repeats):
+        for case in CASES:
+            started = time.perf_counter()
+            decision = verify(agent, tools_dict, case)
+            latencies.append(time.perf_counter() - started)
+            decisions.append(decision.get('is_valid'))
+
+    runs = len(latencies)
+    return {
+        "decisions": runs,
+        "llm_calls_per_decision": counter.calls / runs,
+        "tokens_per_decision": counter.tokens / runs,
+        "p50_seconds": statistics.median(latencies),
+        "max_seconds": max(latencies),
+        "is_valid": decisions
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark two-call vs single-call verifier modes")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per sample case")
+    args = parser.parse_args()
+
+    load_dotenv()
+    init_db()
+    print("\nVerifier Mode Benchmark")
+    print("=" * 60)
+
+    results = {}
+    for name, single_call in (("two-call", False), ("single-call", True)):
+        results[name] = run_mode(single_call, args.repeats)
+        stats = results[name]
+        print(f"\n--- {name} ---")
+        print(f"  Decisions: {stats['decisions']}")
+        print(f"  LLM calls/decision: {stats['llm_calls_per_decision']:.2f}, tokens/decision: {stats['tokens_per_decision']:.0f}")
+        print(f"  Latency p50: {stats['p50_seconds']:.2f}s, max: {stats['max_seconds']:.2f}s")
+
+    agreement = sum(
+        a == b for a, b in zip(results["two-call"]["is_valid"], results["single-call"]["is_valid"])
+    ) / len(results["two-call"]["is_valid"])
+    print(f"\nis_valid agreement between modes: {agreement:.0%}")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
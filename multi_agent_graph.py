@@ -3,6 +3,8 @@ Multi-Agent Graph Orchestration for BFSI Workflow
 Uses LangGraph to coordinate Intent, Answer, Report, and Verification agents
 """
 
+import json
+import time
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, Sequence, Optional
@@ -11,6 +13,8 @@ from operator import add as add_messages
 from langchain.chat_models import init_chat_model
 
 from services.config_loader import get_config
+from services.database import init_db
+from services.jira_outbox import start_outbox_dispatcher
 from services.tools_service import get_all_tools
 from agents import IntentGathererAgent, AnswerGeneratorAgent, ReportMakerAgent, ClaimVerifierAgent
 import os
@@ -35,10 +39,59 @@ class MultiAgentState(TypedDict):
     
     intent_result: Optional[dict]
     kb_docs: list
+    report_draft: Optional[dict]  # User-side report fields from the fused intent call
     report: Optional[dict]
     verification: Optional[dict]
     
     final_answer: Optional[str]
+    
+    # Per-run tool results keyed by tool name + canonical args (see _tool_memo_key)
+    tool_memo: dict
+    tool_calls_saved: int
+    
+    # Run budget usage (see _new_budget) and the limit that stopped the verifier loop, if any
+    budget: dict
+    budget_exhausted: Optional[str]
+
+
+def _new_budget() -> dict:
+    return {'started_at': time.time(), 'verifier_rounds': 0, 'tool_calls': 0, 'tokens': 0}
+
+
+def _budget_exceeded(budget: dict, limits: dict, pending_tool_calls: int = 0) -> Optional[str]:
+    """
+    Check the run budget before another verifier round
+    
+    Args:
+        budget: Usage so far (verifier_rounds, tool_calls, tokens, started_at)
+        limits: multi_agent.budget config
+        pending_tool_calls: Tool calls the next round would execute
+        
+    Returns:
+        Name of the exhausted budget, or None if the loop may continue
+    """
+    if limits.get('max_verifier_rounds') and budget['verifier_rounds'] >= limits['max_verifier_rounds']:
+        return 'verifier_rounds'
+    if limits.get('max_tool_calls') and budget['tool_calls'] + pending_tool_calls > limits['max_tool_calls']:
+        return 'tool_calls'
+    if limits.get('max_tokens') and budget['tokens'] >= limits['max_tokens']:
+        return 'tokens'
+    if limits.get('max_wall_seconds') and time.time() - budget['started_at'] >= limits['max_wall_seconds']:
+        return 'wall_time'
+    return None
+
+
+def _tool_memo_key(tool_name: str, tool_args: dict) -> str:
+    """Memo key for a tool call: name plus args with sorted keys and whitespace-normalized strings"""
+    def canonical(value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        return value
+    return f"{tool_name}:{json.dumps(canonical(tool_args or {}), sort_keys=True, default=str)}"
 
 
 def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "customer", user_id: Optional[str] = None):
@@ -55,6 +108,10 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
     """
     config = get_config()
     
+    # Create tables and apply pending migrations before any agent or tool touches the DB
+    init_db()
+    start_outbox_dispatcher()
+    
     # Initialize LLM
     model_config = config.get_section('model')
     base_llm = init_chat_model(
@@ -76,6 +133,14 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
     tools = get_all_tools(tenant_id=tenant_id, user_role=user_role)
     tools_dict = {tool.name: tool for tool in tools}
     
+    # Read-only tools whose results are reused within a run; side-effecting tools always execute
+    memo_config = config.get('multi_agent.tool_memo', {}) or {}
+    memo_enabled = memo_config.get('enabled', True)
+    cacheable_tools = set(memo_config.get('cacheable_tools', ['retriever_tool', 'get_user_data', 'list_user_policies']))
+    
+    # Limits on the verify <-> tools loop; 0 disables a limit
+    budget_limits = config.get('multi_agent.budget', {}) or {}
+    
     verifier_agent = ClaimVerifierAgent(
         llm=base_llm,
         tools=tools,
@@ -101,8 +166,28 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
     
     def verify_node(state: MultiAgentState) -> dict:
         logger.info("=== Claim Verifier Node ===")
+        budget = dict(state.get('budget') or _new_budget())
+        
+        exhausted = _budget_exceeded(budget, budget_limits)
+        if exhausted:
+            result = verifier_agent.finalize(state, exhausted)
+            return {**result, 'budget': budget, 'budget_exhausted': exhausted}
+        
         result = verifier_agent.process(state)
-        return result
+        budget['verifier_rounds'] += 1
+        for message in result.get('messages', []):
+            usage = getattr(message, 'usage_metadata', None) or {}
+            budget['tokens'] += usage.get('total_tokens', 0)
+        return {**result, 'budget': budget}
+    
+    def finalize_node(state: MultiAgentState) -> dict:
+        """Decide with the context gathered so far once the run budget is exhausted"""
+        logger.info("=== Budget Finalize Node ===")
+        budget = state.get('budget') or _new_budget()
+        last_message = state['messages'][-1]
+        exhausted = _budget_exceeded(budget, budget_limits, len(last_message.tool_calls)) or 'unknown'
+        result = verifier_agent.finalize(state, exhausted)
+        return {**result, 'budget_exhausted': exhausted}
     
     def tool_execution_node(state: MultiAgentState) -> dict:
         """Execute tool calls from the verifier agent"""
@@ -115,12 +200,26 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
             logger.warning("No tool calls found in last message")
             return {'messages': []}
         
+        tool_memo = dict(state.get('tool_memo') or {})
+        calls_saved = state.get('tool_calls_saved') or 0
+        
         tool_results = []
         for tool_call in last_message.tool_calls:
             tool_name = tool_call['name']
             tool_args = tool_call['args']
             tool_id = tool_call['id']
             
+            memo_key = _tool_memo_key(tool_name, tool_args) if memo_enabled and tool_name in cacheable_tools else None
+            if memo_key in tool_memo:
+                logger.info(f"Reusing earlier result for tool: {tool_name} with args: {tool_args}")
+                calls_saved += 1
+                tool_results.append({
+                    'tool_call_id': tool_id,
+                    'name': tool_name,
+                    'content': tool_memo[memo_key]
+                })
+                continue
+            
             logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
             
             if tool_name not in tools_dict:
@@ -133,6 +232,10 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
                 })
                 continue
             
+            if tool_name == 'create_jira_ticket':
+                # Keyed on the run's issue, so a retried run gets the original ticket back
+                tool_args = {**tool_args, 'idempotency_key': verifier_agent.ticket_idempotency_key(state)}
+            
             try:
                 result = tools_dict[tool_name].invoke(tool_args)
                 logger.info(f"Tool {tool_name} executed successfully")
@@ -141,6 +244,8 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
                     'name': tool_name,
                     'content': str(result)
                 })
+                if memo_key:
+                    tool_memo[memo_key] = str(result)
             except Exception as e:
                 error_msg = f"Tool execution failed: {str(e)}"
                 logger.error(f"Tool {tool_name} failed: {e}")
@@ -154,7 +259,11 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
         from langchain_core.messages import ToolMessage
         tool_messages = [ToolMessage(**tr) for tr in tool_results]
         
-        return {'messages': tool_messages}
+        if calls_saved:
+            logger.info(f"Tool memo has saved {calls_saved} call(s) this run")
+        budget = dict(state.get('budget') or _new_budget())
+        budget['tool_calls'] += len(last_message.tool_calls)
+        return {'messages': tool_messages, 'tool_memo': tool_memo, 'tool_calls_saved': calls_saved, 'budget': budget}
     
     def out_of_scope_node(state: MultiAgentState) -> dict:
         """Handle out-of-scope queries with hardcoded response"""
@@ -199,6 +308,10 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
         
         # Check if last message has tool calls
         if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+            exhausted = _budget_exceeded(state.get('budget') or _new_budget(), budget_limits, len(last_message.tool_calls))
+            if exhausted:
+                logger.warning(f"Run budget exhausted ({exhausted}), skipping tool calls and finalizing")
+                return "finalize"
             logger.info(f"Verifier made {len(last_message.tool_calls)} tool call(s), routing to tool execution")
             return "tools"
         
@@ -216,6 +329,7 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
     graph.add_node("verify", verify_node)
     graph.add_node("tools", tool_execution_node)
     graph.add_node("out_of_scope", out_of_scope_node)
+    graph.add_node("finalize", finalize_node)
     
     # Set entry point
     graph.set_entry_point("intent")
@@ -234,14 +348,16 @@ def create_multi_agent_graph(tenant_id: str = "default", user_role: str = "custo
     
     graph.add_edge("answer", END)
     graph.add_edge("out_of_scope", END)
+    graph.add_edge("finalize", END)
     graph.add_edge("report", "verify")
     
-    # Conditional routing from verify: either execute tools or end
+    # Conditional routing from verify: execute tools, finalize when over budget, or end
     graph.add_conditional_edges(
         "verify",
         route_after_verify,
         {
             "tools": "tools",
+            "finalize": "finalize",
             "end": END
         }
     )
@@ -277,9 +393,14 @@ def invoke_graph(query: str, tenant_id: str = "default", user_role: str = "custo
         "email": email,
         "intent_result": None,
         "kb_docs": [],
+        "report_draft": None,
         "report": None,
         "verification": None,
-        "final_answer": None
+        "final_answer": None,
+        "tool_memo": {},
+        "tool_calls_saved": 0,
+        "budget": _new_budget(),
+        "budget_exhausted": None
     }
     
     result = graph.invoke(initial_state)
@@ -23,6 +23,23 @@ class IntentResult(BaseModel):
     )
 
 
+class UserReportFields(BaseModel):
+    """Report fields that only need the user's messages (extracted together with intent)"""
+    issue: str = Field(description="Clear, concise statement of the problem or topic (1-2 sentences)")
+    user_demand: str = Field(description="What the user is specifically requesting or asking for")
+    support_info_from_user: str = Field(description="Any evidence, context, details, or background information provided by the user")
+    policy_refs: str = Field(description="Policy numbers or section references mentioned by the user (if any)")
+
+
+class IntentWithReport(IntentResult):
+    """Intent result plus the user-side report fields, from one fused LLM call"""
+    user_report: Optional[UserReportFields] = Field(
+        default=None,
+        description="User-side report fields. Fill only when intent is complaint, service_request "
+                    "or feature_request and the query is in scope; leave empty for queries."
+    )
+
+
 class KBDocument(BaseModel):
     """Knowledge base document with scoring metadata"""
     content: str = Field(description="Document content/chunk text")
@@ -73,7 +90,7 @@ class ActionPlan(BaseModel):
     )
     idempotency_key: str = Field(
         default="",
-        description="Unique key to prevent duplicate operations"
+        description="Key to prevent duplicate operations; derived by the verifier, leave empty"
     )
 
 
@@ -0,0 +1,328 @@
+"""
+Attachment Cache
+Content-addressed cache (SHA-256 of the file bytes) for extracted document text and
+base64-encoded images, so an attachment that is resent costs a hash instead of a full parse.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config_loader import get_config
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data) -> str:
+    """SHA-256 hex digest of in-memory bytes (bytes, bytearray or memoryview)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path) -> str:
+    """SHA-256 hex digest of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AttachmentCache:
+    """
+    Two-tier LRU cache of string values keyed by (kind, content digest).
+
+    - Memory tier: OrderedDict bounded by total value size in bytes
+    - Disk tier (opt-in): one file per entry under disk_dir, bounded by total size (least
+      recently used evicted first). Usage is tracked in an in-memory index built by a single
+      scan at startup, so writes don't rescan the directory.
+
+    Values are extracted customer attachments, so every entry expires ttl_seconds after it
+    was written, in both tiers; expired disk entries are swept at most every sweep_interval_seconds.
+    """
+
+    def __init__(self,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 sweep_interval_seconds: float = 300):
+        """
+        Initialize the cache
+
+        Args:
+            max_memory_bytes: Size bound for the in-memory tier
+            disk_dir: Directory for the on-disk tier (None to disable it)
+            max_disk_bytes: Size bound for the on-disk tier
+            ttl_seconds: Lifetime of an entry from when it was stored (None/0 for no expiry)
+            sweep_interval_seconds: Minimum time between sweeps of expired disk entries
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.ttl_seconds = ttl_seconds or None
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        # key -> (value, stored_at)
+        self._memory: "OrderedDict[tuple, Tuple[str, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        # disk path -> (size, written_at), least recently used first
+        self._disk_index: "OrderedDict[Path, Tuple[int, float]]" = OrderedDict()
+        self._disk_bytes = 0
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0, "expired": 0}
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, kind: str, digest: str) -> Optional[str]:
+        """
+        Look up a cached value
+
+        Args:
+            kind: Value kind (e.g. 'text', 'image')
+            digest: SHA-256 of the source bytes
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        key = (kind, digest)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[0]
+                self._drop_memory(key)
+                self._stats["expired"] += 1
+
+        value, written_at = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._store_memory(key, value, written_at)
+        return value
+
+    def put(self, kind: str, digest: str, value: str) -> None:
+        """
+        Store a value in both tiers
+
+        Args:
+            kind: Value kind (e.g. 'text', 'image')
+            digest: SHA-256 of the source bytes
+            value: Extracted text or base64 string
+        """
+        if value is None:
+            return
+        key = (kind, digest)
+        now = time.time()
+        with self._lock:
+            self._stats["puts"] += 1
+            self._store_memory(key, value, now)
+        self._write_disk(key, value, now)
+
+    def sweep_expired(self) -> int:
+        """
+        Remove expired entries from both tiers
+
+        Returns:
+            Number of disk entries removed
+        """
+        now = time.time()
+        with self._lock:
+            self._last_sweep = now
+            for key in [key for key, (_, stored_at) in self._memory.items() if self._is_expired(stored_at, now)]:
+                self._drop_memory(key)
+            expired = [path for path, (_, written_at) in self._disk_index.items() if self._is_expired(written_at, now)]
+            for path in expired:
+                self._drop_disk_index(path)
+            self._stats["expired"] += len(expired)
+
+        for path in expired:
+            self._unlink(path)
+        if expired:
+            logger.debug(f"Attachment cache swept {len(expired)} expired disk entries")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit metrics
+
+        Returns:
+            Dictionary with hit/miss counters, hit_rate and tier sizes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["disk_entries"] = len(self._disk_index)
+            stats["disk_bytes"] = self._disk_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Drop the in-memory tier (disk entries are kept)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    # ========== INTERNALS ==========
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at >= self.ttl_seconds
+
+    def _store_memory(self, key: tuple, value: str, stored_at: float) -> None:
+        """Insert into the memory tier and evict LRU entries over the size bound (lock held)"""
+        size = len(value)
+        if size > self.max_memory_bytes:
+            return
+
+        self._drop_memory(key)
+        self._memory[key] = (value, stored_at)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _drop_memory(self, key: tuple) -> None:
+        """Remove one memory entry (lock held)"""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous[0])
+
+    def _drop_disk_index(self, path: Path) -> None:
+        """Remove one disk entry from the index (lock held)"""
+        previous = self._disk_index.pop(path, None)
+        if previous is not None:
+            self._disk_bytes -= previous[0]
+
+    def _disk_path(self, key: tuple) -> Path:
+        kind, digest = key
+        return self.disk_dir / kind / digest[:2] / f"{digest}.txt"
+
+    def _load_disk_index(self) -> None:
+        """Index existing disk entries once at startup, dropping expired ones"""
+        now = time.time()
+        entries = []
+        for path in self.disk_dir.rglob('*.txt'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self._is_expired(stat.st_mtime, now):
+                self._unlink(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        for written_at, size, path in sorted(entries):
+            self._disk_index[path] = (size, written_at)
+            self._disk_bytes += size
+        self._last_sweep = now
+        self._enforce_disk_bound()
+
+    def _read_disk(self, key: tuple, now: float) -> Tuple[Optional[str], float]:
+        if not self.disk_dir:
+            return None, now
+        path = self._disk_path(key)
+        with self._lock:
+            entry = self._disk_index.get(path)
+            if entry is None:
+                return None, now
+            if self._is_expired(entry[1], now):
+                self._drop_disk_index(path)
+                self._stats["expired"] += 1
+                expired = True
+            else:
+                self._disk_index.move_to_end(path)  # Refresh recency for disk eviction
+                expired = False
+        if expired:
+            self._unlink(path)
+            return None, now
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read(), entry[1]
+        except FileNotFoundError:
+            with self._lock:
+                self._drop_disk_index(path)
+            return None, now
+        except Exception as e:
+            logger.warning(f"Attachment cache read failed for {path}: {e}")
+            return None, now
+
+    def _write_disk(self, key: tuple, value: str, now: float) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+            with self._lock:
+                self._drop_disk_index(path)
+                self._disk_index[path] = (size, now)
+                self._disk_bytes += size
+            self._enforce_disk_bound()
+            if now - self._last_sweep >= self.sweep_interval_seconds:
+                self.sweep_expired()
+        except Exception as e:
+            logger.warning(f"Attachment cache write failed for {path}: {e}")
+
+    def _enforce_disk_bound(self) -> None:
+        """Evict least recently used disk entries until the tier fits max_disk_bytes"""
+        evicted = []
+        with self._lock:
+            while self._disk_bytes > self.max_disk_bytes and self._disk_index:
+                path, (size, _) = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                self._stats["evictions"] += 1
+                evicted.append(path)
+        for path in evicted:
+            self._unlink(path)
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Attachment cache could not remove {path}: {e}")
+
+
+def _build_default_cache() -> Optional[AttachmentCache]:
+    cache_config = config.get_section('attachment_cache')
+    if not cache_config.get('enabled', True):
+        return None
+    ttl_hours = cache_config.get('ttl_hours', 24)
+    return AttachmentCache(
+        max_memory_bytes=int(cache_config.get('max_memory_mb', 64) * 1024 * 1024),
+        # Extracted attachments are customer data: only persisted when explicitly enabled
+        disk_dir=cache_config.get('disk_dir', '.attachment_cache') if cache_config.get('disk_enabled', False) else None,
+        max_disk_bytes=int(cache_config.get('max_disk_mb', 512) * 1024 * 1024),
+        ttl_seconds=ttl_hours * 3600 if ttl_hours else None,
+        sweep_interval_seconds=cache_config.get('sweep_interval_seconds', 300)
+    )
+
+
+# Default cache instance (None when disabled in config)
+attachment_cache = _build_default_cache()
@@ -0,0 +1,95 @@
+"""
+Bulk Import CLI
+Loads users or policies from a CSV or JSONL file through bulk_insert_users / bulk_insert_policies,
+reporting throughput and writing rejected rows to a quarantine file.
+
+Usage:
+    python -m services.bulk_import users customers.csv
+    python -m services.bulk_import policies policy_book.jsonl --chunk-size 1000 --quarantine bad_rows.jsonl
+"""
+
+import argparse
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from .user_data_service import bulk_insert_users, bulk_insert_policies
+
+IMPORTERS = {
+    "users": bulk_insert_users,
+    "policies": bulk_insert_policies,
+}
+
+
+def read_rows(file_path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows from a CSV (header row required) or JSONL file
+
+    Args:
+        file_path: Path to a .csv or .jsonl file
+
+    Yields:
+        One dict per row; malformed JSONL lines are yielded as {"_raw": line}
+        so they are quarantined with their row number
+    """
+    suffix = file_path.suffix.lower()
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        if suffix == '.csv':
+            yield from csv.DictReader(f)
+        elif suffix in ('.jsonl', '.ndjson'):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield {"_raw": line}
+        else:
+            raise ValueError(f"Unsupported file type: {suffix} (expected .csv or .jsonl)")
+
+
+def write_quarantine(entries, quarantine_path: Path) -> None:
+    """Write quarantined rows, one JSON object per line"""
+    with open(quarantine_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users or policies from CSV/JSONL")
+    parser.add_argument("kind", choices=sorted(IMPORTERS), help="Record type to import")
+    parser.add_argument("file", type=Path, help="CSV or JSONL file")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per transaction")
+    parser.add_argument("--no-upsert", action="store_true", help="Skip rows whose key already exists")
+    parser.add_argument("--quarantine", type=Path, default=None,
+                        help="Where to write rejected rows (default: <file>.quarantine.jsonl)")
+    args = parser.parse_args()
+
+    if not args.file.exists():
+        parser.error(f"File not found: {args.file}")
+
+    result = IMPORTERS[args.kind](
+        read_rows(args.file),
+        chunk_size=args.chunk_size,
+        upsert=not args.no_upsert
+    )
+
+    print(f"\nImported {args.kind} from {args.file}")
+    print(f"  Rows read:    {result['total_rows']}")
+    print(f"  Written:      {result['written']}")
+    print(f"  Quarantined:  {len(result['quarantined'])}")
+    print(f"  Elapsed:      {result['elapsed_seconds']:.2f}s ({result['rows_per_second']:.0f} rows/s)")
+
+    if result['quarantined']:
+        quarantine_path = args.quarantine or args.file.with_name(args.file.name + ".quarantine.jsonl")
+        write_quarantine(result['quarantined'], quarantine_path)
+        print(f"  Quarantine file: {quarantine_path}")
+
+
+if __name__ == "__main__":
+    from .database import init_db
+
+    init_db()
+    main()
@@ -0,0 +1,146 @@
+"""
+Context Packer
+Turns scored KB chunks into a compact prompt context: adjacent chunks of the same source are
+merged with their overlapping text removed, then the merged passages are packed greedily by
+score into a token budget (chat.context_token_budget).
+"""
+
+from typing import Dict, List, Optional
+
+from .agent_schemas import KBDocument
+from .config_loader import get_config
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+# Shorter matches between neighbouring chunks are treated as coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count from characters (chat.chars_per_token, ~4 for English text)"""
+    chars_per_token = config.get('chat.chars_per_token', 4) or 4
+    return max(1, int(len(text) / chars_per_token)) if text else 0
+
+
+def strip_overlap(previous: str, current: str, max_overlap: int) -> str:
+    """
+    Remove the text `current` repeats from the end of `previous`
+
+    Args:
+        previous: Preceding chunk
+        current: Following chunk
+        max_overlap: Longest overlap to look for (the splitter's chunk_overlap)
+
+    Returns:
+        current without its overlapping prefix
+    """
+    for size in range(min(len(previous), len(current), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+
+def merge_adjacent_chunks(kb_docs: List[KBDocument], max_overlap: Optional[int] = None) -> List[KBDocument]:
+    """
+    Merge chunks of the same source with consecutive chunk_index into single passages
+
+    Args:
+        kb_docs: Scored KB documents
+        max_overlap: Longest overlap to strip (default: document_processing.chunking.chunk_overlap)
+
+    Returns:
+        Merged documents; each keeps the best score of its chunks and lists them in metadata['chunk_indices']
+    """
+    if max_overlap is None:
+        max_overlap = config.get('document_processing.chunking.chunk_overlap', 200)
+
+    groups: Dict[str, List[KBDocument]] = {}
+    passthrough = []
+    for doc in kb_docs:
+        if isinstance(doc.metadata.get('chunk_index'), int):
+            groups.setdefault(doc.source, []).append(doc)
+        else:
+            passthrough.append(doc)
+
+    merged = list(passthrough)
+    for chunks in groups.values():
+        # Same chunk retrieved twice (e.g. by two aspects): keep the best-scored copy
+        unique: Dict[int, KBDocument] = {}
+        for chunk in chunks:
+            index = chunk.metadata['chunk_index']
+            if index not in unique or chunk.score > unique[index].score:
+                unique[index] = chunk
+
+        run: List[KBDocument] = []
+        for index in sorted(unique):
+            if run and index != run[-1].metadata['chunk_index'] + 1:
+                merged.append(_join_run(run, max_overlap))
+                run = []
+            run.append(unique[index])
+        merged.append(_join_run(run, max_overlap))
+
+    return merged
+
+
+def pack_context(kb_docs: List[KBDocument],
+                 token_budget: Optional[int] = None,
+                 max_overlap: Optional[int] = None) -> List[KBDocument]:
+    """
+    Merge overlapping chunks and keep the best passages that fit the token budget
+
+    Passages are taken greedily by score; one that doesn't fit is skipped in favour of smaller,
+    lower-scored ones. If even the best passage exceeds the budget it is truncated to fit.
+
+    Args:
+        kb_docs: Scored KB documents
+        token_budget: Token budget for document text (default: chat.context_token_budget; 0 = unlimited)
+        max_overlap: Longest overlap to strip (default: document_processing.chunking.chunk_overlap)
+
+    Returns:
+        Packed documents, highest score first
+    """
+    if not kb_docs:
+        return []
+    if token_budget is None:
+        token_budget = config.get('chat.context_token_budget', 3000)
+
+    passages = sorted(merge_adjacent_chunks(kb_docs, max_overlap), key=lambda doc: doc.score, reverse=True)
+    if not token_budget:
+        return passages
+
+    packed, used = [], 0
+    for passage in passages:
+        tokens = estimate_tokens(passage.content)
+        if used + tokens <= token_budget:
+            packed.append(passage)
+            used += tokens
+
+    if not packed:
+        best = passages[0]
+        chars_per_token = config.get('chat.chars_per_token', 4) or 4
+        packed = [best.model_copy(update={'content': best.content[:int(token_budget * chars_per_token)]})]
+        used = token_budget
+
+    original = sum(estimate_tokens(doc.content) for doc in kb_docs)
+    logger.debug(f"Packed {len(kb_docs)} chunks into {len(packed)} passages: ~{used} of ~{original} tokens "
+                 f"(budget {token_budget})")
+    return packed
+
+
+def _join_run(run: List[KBDocument], max_overlap: int) -> KBDocument:
+    if len(run) == 1:
+        return run[0]
+
+    content = run[0].content
+    for previous, chunk in zip(run, run[1:]):
+        content = f"{content} {strip_overlap(previous.content, chunk.content, max_overlap)}"
+
+    first = run[0]
+    return KBDocument(
+        content=content,
+        score=max(chunk.score for chunk in run),
+        source=first.source,
+        metadata={**first.metadata, 'chunk_indices': [chunk.metadata['chunk_index'] for chunk in run]}
+    )
@@ -6,10 +6,10 @@ import docx2txt
 from pathlib import Path
 from langchain.schema import Document
 from .services import vector_store
-from datetime import datetime
 import hashlib
 from .config_loader import get_config
 from .logger_setup import setup_logger
+from .kb_files import make_file_id, create_file_record, save_file_record, delete_file_records
 ## want this to be a separate layer for data ingestion into the vector db - chromaDB
 ## a function that takes multi-file input and stores them in the vector db
 logger = setup_logger()
@@ -18,9 +18,14 @@ logger = setup_logger()
 config = get_config()
 doc_processing_config = config.get_section('document_processing')
 
-def create_enhanced_metadata(file_path: Path, chunk_index: int, total_chunks: int, word_count: int, char_count: int, page_number: int = None, tenant_id: str = "default", access_roles: list = None, document_visibility: str = "Public") -> dict:
+def create_enhanced_metadata(file_path: Path, chunk_index: int, total_chunks: int, word_count: int, char_count: int, page_number: int = None, tenant_id: str = "default", access_roles: list = None, document_visibility: str = "Public", file_id: str = None) -> dict:
     """
-    Create comprehensive metadata for document chunks to enable effective retrieval scoring
+    Create compact per-chunk metadata for document chunks
+
+    File-level fields (filename, size, timestamps, document type) live once in the
+    kb_files record referenced by file_id; derived quality fields (position ratio,
+    density, first/last flags) are recomputed at scoring time. Only what ChromaDB
+    needs for filtering and what differs per chunk is stored here.
 
     Args:
         file_path: Path to the source file
@@ -32,50 +37,33 @@ def create_enhanced_metadata(file_path: Path, chunk_index: int, total_chunks: in
         tenant_id: Unique identifier for tenant (default: "default")
         access_roles: List of roles that can access this document (default: ["customer"])
         document_visibility: Document visibility level (default: "Public")
+        file_id: Id of the file record (None to derive it from source and tenant)
 
     Returns:
-        dict: Enhanced metadata for scoring during retrieval and tenant filtering
+        dict: Compact metadata for tenant filtering and retrieval scoring
     """
-    file_stats = file_path.stat()
-
     # Set default access roles if not provided
     if access_roles is None:
         access_roles = ["customer"]
 
-    # Basic file information
+    source = str(file_path)
+
     metadata = {
-        # File identification
-        "source": str(file_path),
-        "filename": file_path.name,
-        "file_extension": file_path.suffix.lower(),
-        "file_size_bytes": file_stats.st_size,
+        # File reference (full file-level record is in kb_files)
+        "file_id": file_id or make_file_id(source, tenant_id),
+        "source": source,
 
         # Multi-tenant and RBAC metadata
         "tenant_id": tenant_id,
         "document_visibility": document_visibility,
 
-        # Temporal information for recency scoring
-        "ingestion_timestamp": datetime.now().isoformat(),
-        "file_modified_timestamp": datetime.fromtimestamp(file_stats.st_mtime).isoformat(),
-        "file_created_timestamp": datetime.fromtimestamp(file_stats.st_ctime).isoformat(),
-
         # Document structure for position-based scoring
         "chunk_index": chunk_index,
         "total_chunks": total_chunks,
-        "chunk_position_ratio": chunk_index / max(total_chunks - 1, 1),  # 0.0 to 1.0
 
         # Content quality metrics
         "word_count": word_count,
         "char_count": char_count,
-        "content_density": word_count / max(char_count, 1),  # words per character
-
-        # Document type for format-based scoring
-        "document_type": get_document_type(file_path.suffix.lower()),
-
-        # Quality indicators
-        "is_first_chunk": chunk_index == 0,
-        "is_last_chunk": chunk_index == total_chunks - 1,
-        "relative_chunk_size": char_count,  # Will be used for size-based scoring
     }
 
     # Add boolean fields for each access role (denormalized approach for ChromaDB compatibility)
@@ -85,7 +73,6 @@ def create_enhanced_metadata(file_path: Path, chunk_index: int, total_chunks: in
     # Add page number for PDFs
     if page_number is not None:
         metadata["page_number"] = page_number
-        metadata["is_first_page"] = page_number == 1
 
     return metadata
 
@@ -193,6 +180,91 @@ def extract_txt(file_path) -> list:
 
     return enhanced_documents
 
+def get_processor_map() -> dict:
+    """
+    Map supported file extensions (from config) to their extraction processors
+    """
+    supported_types = {}
+    for ext in get_supported_extensions():
+        if ext == '.pdf':
+            supported_types[ext] = extract_pdf
+        elif ext == '.docx':
+            supported_types[ext] = extract_docx
+        elif ext in ['.txt', '.md']:
+            supported_types[ext] = extract_txt
+    return supported_types
+
+def get_chunk_id(metadata: dict) -> str:
+    """
+    Deterministic vector store id for a chunk, so re-writing a file is an upsert rather than a duplicate
+    """
+    return f"{metadata['file_id']}:{metadata['chunk_index']}"
+
+def build_document_chunks(file_path: Path, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> list:
+    """
+    Extract, chunk and annotate a single file, ready to be written to the vector store
+
+    Args:
+        file_path: Path to the file (must exist and have a supported extension)
+        tenant_id: Unique identifier for tenant
+        access_roles: List of roles that can access the document (default: ["customer"])
+        document_visibility: Document visibility level
+
+    Returns:
+        list: Chunk Documents with enhanced metadata, empty if nothing could be extracted
+    """
+    file_path = Path(file_path)
+    processor = get_processor_map()[file_path.suffix.lower()]
+    file_content = processor(str(file_path))
+
+    if not file_content:
+        return []
+
+    # Chunking Process initiate using config values
+    chunking_config = doc_processing_config.get('chunking', {})
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunking_config.get('chunk_size', 1000),
+        chunk_overlap=chunking_config.get('chunk_overlap', 200)
+    )
+
+    pages_split = text_splitter.split_documents(file_content)
+    if not pages_split:
+        return []
+
+    # File-level metadata is gathered once (single stat) and stored once per file
+    file_record = create_file_record(
+        file_path,
+        tenant_id=tenant_id,
+        access_roles=access_roles,
+        document_visibility=document_visibility,
+        document_type=get_document_type(file_path.suffix.lower()),
+        total_chunks=len(pages_split)
+    )
+
+    # Build compact chunk metadata with proper chunk indexing and tenant information
+    enhanced_chunks = []
+    for chunk_idx, chunk in enumerate(pages_split):
+        enhanced_metadata = create_enhanced_metadata(
+            file_path=file_path,
+            chunk_index=chunk_idx,
+            total_chunks=len(pages_split),
+            word_count=len(chunk.page_content.split()),
+            char_count=len(chunk.page_content),
+            page_number=chunk.metadata.get('page_number'),  # Preserve page number if exists
+            tenant_id=tenant_id,
+            access_roles=access_roles,
+            document_visibility=document_visibility,
+            file_id=file_record["file_id"]
+        )
+
+        enhanced_chunks.append(Document(
+            page_content=chunk.page_content,
+            metadata=enhanced_metadata
+        ))
+
+    save_file_record(file_record)
+    return enhanced_chunks
+
 def ingest_file_with_feedback(file_path: str, original_file_name: str = None, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> dict:
     """Modified version of file ingestion that returns detailed status for UI with tenant support"""
     try:
@@ -203,195 +275,161 @@ def ingest_file_with_feedback(file_path: str, original_file_name: str = None, te
         if not os.path.exists(file_path):
             return {"success": False, "message": f"File not found: {file_name}", "file_name": file_name}
         
-        # Get supported file processors mapping from config
-        supported_extensions = get_supported_extensions()
-        supported_types = {}
-        for ext in supported_extensions:
-            if ext == '.pdf':
-                supported_types[ext] = extract_pdf
-            elif ext == '.docx':
-                supported_types[ext] = extract_docx
-            elif ext in ['.txt', '.md']:
-                supported_types[ext] = extract_txt
-        
         file_extension = file_path.suffix.lower()
         
         # Check if file extension is supported
-        if file_extension not in supported_types:
+        if file_extension not in get_processor_map():
             return {"success": False, "message": f"Unsupported file type: {file_extension}", "file_name": file_name}
         
-        # Process file based on type
-        processor = supported_types[file_extension]
-        file_content = processor(str(file_path))
+        enhanced_chunks = build_document_chunks(file_path, tenant_id, access_roles, document_visibility)
         
-        if not file_content:
+        if not enhanced_chunks:
             return {"success": False, "message": f"No content extracted from file", "file_name": file_name}
-        
-        # Chunking Process initiate using config values
-        chunking_config = doc_processing_config.get('chunking', {})
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunking_config.get('chunk_size', 1000),
-            chunk_overlap=chunking_config.get('chunk_overlap', 200)
-        )
 
-        pages_split = text_splitter.split_documents(file_content)
-
-        # Update metadata for chunked documents with proper chunk indexing and tenant information
-        enhanced_chunks = []
-        for chunk_idx, chunk in enumerate(pages_split):
-            # Create enhanced metadata for this chunk with tenant information
-            enhanced_metadata = create_enhanced_metadata(
-                file_path=file_path,
-                chunk_index=chunk_idx,
-                total_chunks=len(pages_split),
-                word_count=len(chunk.page_content.split()),
-                char_count=len(chunk.page_content),
-                page_number=chunk.metadata.get('page_number'),  # Preserve page number if exists
-                tenant_id=tenant_id,
-                access_roles=access_roles,
-                document_visibility=document_visibility
-            )
-
-            # Preserve any existing metadata and merge with enhanced metadata
-            original_metadata = chunk.metadata.copy()
-            original_metadata.update(enhanced_metadata)
-
-            enhanced_chunk = Document(
-                page_content=chunk.page_content,
-                metadata=original_metadata
-            )
-            enhanced_chunks.append(enhanced_chunk)
-
-            # Log ingestion metadata before storing
-            logger.info(f"Ingesting file into vector DB - File: {file_name}, "
-                       f"Access Roles: {access_roles or ['customer']}, "
-                       f"File Type: {file_extension}, "
-                       f"Tenant ID: {tenant_id}, "
-                       f"Document Visibility: {document_visibility}, "
-                       f"Chunks: {len(pages_split)}")
-            
-            # Store in vector DB with enhanced metadata
-            vector_store.add_documents(documents=enhanced_chunks)
-            
-            return {"success": True, "message": f"Successfully processed {len(pages_split)} chunks", "file_name": file_name}
+        # Log ingestion metadata before storing
+        logger.info(f"Ingesting file into vector DB - File: {file_name}, "
+                   f"Access Roles: {access_roles or ['customer']}, "
+                   f"File Type: {file_extension}, "
+                   f"Tenant ID: {tenant_id}, "
+                   f"Document Visibility: {document_visibility}, "
+                   f"Chunks: {len(enhanced_chunks)}")
+        
+        # Store in vector DB with enhanced metadata
+        vector_store.add_documents(documents=enhanced_chunks, ids=[get_chunk_id(chunk.metadata) for chunk in enhanced_chunks])
+        
+        return {"success": True, "message": f"Successfully processed {len(enhanced_chunks)} chunks", "file_name": file_name}
         
     except Exception as e:
         return {"success": False, "message": f"Error: {str(e)}", "file_name": file_path.name if file_path else "unknown"}
 
 ## ----------main ingestion---------
-def ingest_file_to_vectordb(file_paths, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> None:
+def ingest_file_to_vectordb(file_paths, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> str:
     """
     Main function to ingest one or multiple files into ChromaDB vector store
     Supports: PDF, DOCX, TXT, MD file extensions with multi-tenant support
 
+    Runs as a persisted ingestion job (see ingestion_jobs.py): progress is checkpointed per
+    batch in SQLite and an interrupted job can be resumed with resume_incomplete_jobs().
+
     Args:
         file_paths (str or list): Path(s) to the file(s) to ingest
         tenant_id (str): Unique identifier for tenant (default: "rentomojo")
         access_roles (list): List of roles that can access documents (default: ["customer"])
         document_visibility (str): Document visibility level (default: "Public")
 
+    Returns:
+        str: job_id of the ingestion job (query it with get_ingestion_job_status)
+
     Note:
-        Skips unsupported or missing files and continues processing others
+        Unsupported or missing files are marked failed and the others continue processing
     """
-    # Get supported file processors mapping from config
-    supported_extensions = get_supported_extensions()
-    supported_types = {}
-    for ext in supported_extensions:
-        if ext == '.pdf':
-            supported_types[ext] = extract_pdf
-        elif ext == '.docx':
-            supported_types[ext] = extract_docx
-        elif ext in ['.txt', '.md']:
-            supported_types[ext] = extract_txt
-    
-    # Convert single file path to list for uniform processing
-    if isinstance(file_paths, str):
-        file_paths = [file_paths]
-    
-    successful_files = []
-    
-    for file_path in file_paths:
-        try:
-            file_path = Path(file_path)
-            
-            # Check if file exists
-            if not os.path.exists(file_path):
-                print(f"Skipping: File not found - {file_path}")
-                continue
-            
-            file_extension = file_path.suffix.lower()
-            
-            # Check if file extension is supported
-            if file_extension not in supported_types:
-                print(f"Skipping: Unsupported file type - {file_path}")
-                continue
-            
-            # Process file based on type
-            processor = supported_types[file_extension]
-            file_content = processor(str(file_path))
-            
-            if not file_content:
-                logger.warning(f"No content extracted from: {file_path}")
-                continue
-            
-            # Chunking Process initiate using config values
-            chunking_config = doc_processing_config.get('chunking', {})
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunking_config.get('chunk_size', 1000),
-                chunk_overlap=chunking_config.get('chunk_overlap', 200)
-            )
+    # Import here to avoid circular imports
+    from .ingestion_jobs import create_ingestion_job, run_ingestion_job
 
-            pages_split = text_splitter.split_documents(file_content)
-
-            # Update metadata for chunked documents with proper chunk indexing and tenant information
-            enhanced_chunks = []
-            for chunk_idx, chunk in enumerate(pages_split):
-                # Create enhanced metadata for this chunk with tenant information
-                enhanced_metadata = create_enhanced_metadata(
-                    file_path=file_path,
-                    chunk_index=chunk_idx,
-                    total_chunks=len(pages_split),
-                    word_count=len(chunk.page_content.split()),
-                    char_count=len(chunk.page_content),
-                    page_number=chunk.metadata.get('page_number'),  # Preserve page number if exists
-                    tenant_id=tenant_id,
-                    access_roles=access_roles,
-                    document_visibility=document_visibility
-                )
-
-                # Preserve any existing metadata and merge with enhanced metadata
-                original_metadata = chunk.metadata.copy()
-                original_metadata.update(enhanced_metadata)
-
-                enhanced_chunk = Document(
-                    page_content=chunk.page_content,
-                    metadata=original_metadata
-                )
-                enhanced_chunks.append(enhanced_chunk)
-
-            # Log ingestion metadata before storing
-            logger.info(f"Ingesting file into vector DB - File: {file_path.name}, "
-                       f"Access Roles: {access_roles or ['customer']}, "
-                       f"File Type: {file_extension}, "
-                       f"Tenant ID: {tenant_id}, "
-                       f"Document Visibility: {document_visibility}, "
-                       f"Chunks: {len(pages_split)}")
-            
-            # Store in vector DB with enhanced metadata
-            vector_store.add_documents(documents=enhanced_chunks)
-            print(f"Successfully ingested {file_path.name}")
-            successful_files.append(file_path.name)
-            
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
-            continue
-    
-    if successful_files:
-        print(f"Total files processed: {len(successful_files)}")
+    job_id = create_ingestion_job(file_paths, tenant_id, access_roles, document_visibility)
+    status = run_ingestion_job(job_id)
+
+    files_by_state = status["files_by_state"]
+    if files_by_state["written"]:
+        logger.info(f"Total files processed: {files_by_state['written']} (failed: {files_by_state['failed']})")
     else:
-        print("No files were successfully processed")
+        logger.warning("No files were successfully processed")
+
+    return job_id
+
+## ----------deletion & re-index---------
+def _source_filter(source: str, tenant_id: str = None) -> dict:
+    """Build the ChromaDB where-filter that selects every chunk of a source (optionally per tenant)"""
+    if tenant_id is None:
+        return {"source": source}
+    return {"$and": [{"source": source}, {"tenant_id": tenant_id}]}
+
+def _get_chunk_ids(source: str, tenant_id: str = None) -> list:
+    """Return ids of all chunks stored for a source without loading documents or embeddings"""
+    result = vector_store._collection.get(where=_source_filter(source, tenant_id), include=[])
+    return result.get('ids') or []
+
+def delete_document_by_source(source: str, tenant_id: str = None) -> dict:
+    """
+    Remove every chunk of a document from the vector store in a single batched delete
+
+    Args:
+        source (str): Source path the document was ingested from (the chunk's "source" metadata)
+        tenant_id (str, optional): Restrict deletion to one tenant's copy of the document
+
+    Returns:
+        dict: {"success", "message", "source", "deleted_chunks"}
+    """
+    source = str(source)
+    try:
+        chunk_ids = _get_chunk_ids(source, tenant_id)
+        if not chunk_ids:
+            return {"success": False, "message": f"No chunks found for source: {source}", "source": source, "deleted_chunks": 0}
+
+        # One delete call for all chunk ids instead of one round-trip per chunk
+        vector_store.delete(ids=chunk_ids)
+        delete_file_records(source, tenant_id)
+
+        logger.info(f"Deleted document from vector DB - Source: {source}, Tenant ID: {tenant_id}, Chunks: {len(chunk_ids)}")
+        return {"success": True, "message": f"Deleted {len(chunk_ids)} chunks", "source": source, "deleted_chunks": len(chunk_ids)}
+
+    except Exception as e:
+        logger.error(f"Error deleting document {source}: {e}")
+        return {"success": False, "message": f"Error: {str(e)}", "source": source, "deleted_chunks": 0}
+
+def replace_document_by_source(file_path: str, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> dict:
+    """
+    Re-index a document: write the new version's chunks, then purge the previous version's chunks
+
+    The new chunks are added before the old ones are deleted, so retrieval never sees the
+    document missing while it is being re-indexed.
+
+    Args:
+        file_path (str): Path to the updated file (also used as the source to replace)
+        tenant_id (str): Unique identifier for tenant
+        access_roles (list): List of roles that can access the document (default: ["customer"])
+        document_visibility (str): Document visibility level
+
+    Returns:
+        dict: {"success", "message", "source", "added_chunks", "deleted_chunks"}
+    """
+    file_path = Path(file_path)
+    source = str(file_path)
+    try:
+        if not os.path.exists(file_path):
+            return {"success": False, "message": f"File not found: {source}", "source": source, "added_chunks": 0, "deleted_chunks": 0}
+        if file_path.suffix.lower() not in get_processor_map():
+            return {"success": False, "message": f"Unsupported file type: {file_path.suffix.lower()}", "source": source, "added_chunks": 0, "deleted_chunks": 0}
+
+        old_chunk_ids = _get_chunk_ids(source, tenant_id)
+
+        enhanced_chunks = build_document_chunks(file_path, tenant_id, access_roles, document_visibility)
+        if not enhanced_chunks:
+            # Keep the previous version retrievable rather than leaving the document empty
+            return {"success": False, "message": f"No content extracted from file", "source": source, "added_chunks": 0, "deleted_chunks": 0}
+
+        new_chunk_ids = vector_store.add_documents(documents=enhanced_chunks, ids=[get_chunk_id(chunk.metadata) for chunk in enhanced_chunks])
+
+        new_id_set = set(new_chunk_ids)
+        stale_ids = [chunk_id for chunk_id in old_chunk_ids if chunk_id not in new_id_set]
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+
+        logger.info(f"Re-indexed document - Source: {source}, Tenant ID: {tenant_id}, "
+                    f"Added: {len(enhanced_chunks)}, Deleted: {len(stale_ids)}")
+        return {"success": True, "message": f"Replaced {len(stale_ids)} chunks with {len(enhanced_chunks)} chunks",
+                "source": source, "added_chunks": len(enhanced_chunks), "deleted_chunks": len(stale_ids)}
+
+    except Exception as e:
+        logger.error(f"Error re-indexing document {source}: {e}")
+        return {"success": False, "message": f"Error: {str(e)}", "source": source, "added_chunks": 0, "deleted_chunks": 0}
         
 if __name__ == "__main__":
+    from .database import init_db
+    from .ingestion_jobs import resume_incomplete_jobs
+    init_db()
+    resume_incomplete_jobs()
+
     file_paths_input = input("Give the file path(s) to ingest (comma-separated for multiple): ")
     file_paths = [path.strip() for path in file_paths_input.split(',')]
     ingest_file_to_vectordb(file_paths)
@@ -3,29 +3,224 @@ SQLAlchemy Database Models and Session Management
 ORM models for BFSI Multi-Agent Workflow
 """
 
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, Text, ForeignKey
+from sqlalchemy import (
+    create_engine, event, Column, String, Integer, Float, Boolean, Text, DateTime, ForeignKey, Index, JSON, Computed
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.pool import QueuePool, StaticPool
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+import os
+import threading
+
+from .config_loader import get_config
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+db_config = get_config().get_section('database')
 
 # Database file path
 DB_PATH = Path(__file__).parent.parent / "echopilot.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = os.environ.get("DATABASE_URL") or db_config.get('url') or f"sqlite:///{DB_PATH}"
+
+# SQLite pragmas tuned for concurrent agent workers: WAL lets readers run alongside a writer,
+# synchronous=NORMAL is durable under WAL, busy_timeout waits for a lock instead of failing
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+def create_db_engine(database_url: Optional[str] = None,
+                     sqlite_pragmas: Optional[Dict[str, Any]] = None,
+                     **engine_kwargs) -> Engine:
+    """
+    Create a SQLAlchemy engine configured from the database config section
+
+    SQLite file databases get a bounded QueuePool and the pragmas above on every new
+    connection; in-memory SQLite uses a single shared connection; any other URL
+    (e.g. postgresql://...) gets a regular server connection pool.
+
+    Args:
+        database_url: Database URL (None to use DATABASE_URL env var, config, then echopilot.db)
+        sqlite_pragmas: Pragmas to apply on SQLite connections (None to use config/defaults)
+        **engine_kwargs: Extra create_engine arguments, overriding config values
+
+    Returns:
+        Configured Engine
+    """
+    url = database_url or DATABASE_URL
+    pool_config = db_config.get('pool', {}) or {}
+
+    kwargs: Dict[str, Any] = {
+        "echo": db_config.get('echo', False),  # Set to True for SQL query debugging
+        "pool_pre_ping": True,
+    }
+
+    if url.startswith('sqlite'):
+        if sqlite_pragmas is None:
+            sqlite_pragmas = {**DEFAULT_SQLITE_PRAGMAS, **(db_config.get('sqlite_pragmas', {}) or {})}
+
+        if url in ('sqlite://', 'sqlite:///:memory:'):
+            kwargs.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+        else:
+            kwargs.update(
+                poolclass=QueuePool,
+                pool_size=pool_config.get('size', 10),
+                max_overflow=pool_config.get('max_overflow', 10),
+                pool_timeout=pool_config.get('timeout_seconds', 30),
+                connect_args={
+                    "check_same_thread": False,  # Needed for SQLite
+                    "timeout": sqlite_pragmas.get('busy_timeout', 5000) / 1000,
+                },
+            )
+    else:
+        kwargs.update(
+            pool_size=pool_config.get('size', 10),
+            max_overflow=pool_config.get('max_overflow', 10),
+            pool_timeout=pool_config.get('timeout_seconds', 30),
+            pool_recycle=pool_config.get('recycle_seconds', 1800),
+        )
+
+    kwargs.update(engine_kwargs)
+    new_engine = create_engine(url, **kwargs)
+
+    if url.startswith('sqlite') and sqlite_pragmas:
+        _register_sqlite_pragmas(new_engine, sqlite_pragmas)
+
+    logger.info(f"Database engine created for {new_engine.url.render_as_string(hide_password=True)} "
+                f"(dialect: {new_engine.dialect.name})")
+    return new_engine
+
+
+def _register_sqlite_pragmas(target_engine: Engine, pragmas: Dict[str, Any]) -> None:
+    """Apply pragmas to every new DBAPI connection of a SQLite engine"""
+
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=False  # Set to True for SQL query debugging
-)
+engine = create_db_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Set once init_db() has created tables and applied migrations in this process
+_db_initialized = False
+_init_lock = threading.Lock()
+
 # Create Base class for declarative models
 Base = declarative_base()
 
+# JSON on SQLite (JSON1 text), JSONB on PostgreSQL
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
+
+def json_path_expression(column: str, path: tuple, sql_type: str, dialect: Optional[str] = None) -> str:
+    """
+    SQL expression extracting a scalar from a JSON column, for generated columns
+
+    Args:
+        column: JSON column name
+        path: Keys from the document root to the value, e.g. ('action_plan', 'refund_amount')
+        sql_type: Target type for PostgreSQL ('boolean', 'double precision', ...)
+        dialect: Dialect name (default: the application engine's)
+
+    Returns:
+        Dialect-specific SQL expression string
+    """
+    dialect = dialect or engine.dialect.name
+    if dialect == 'postgresql':
+        parents = "".join(f" -> '{key}'" for key in path[:-1])
+        return f"(({column}{parents} ->> '{path[-1]}')::{sql_type})"
+    return f"json_extract({column}, '$.{'.'.join(path)}')"
+
+
+# SQLite can only add VIRTUAL generated columns to existing tables; PostgreSQL only has STORED
+_PERSIST_GENERATED = engine.dialect.name != 'sqlite'
+
+# Async engine/session factory, created on first use so aiosqlite is only needed by async callers
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_database_url(database_url: Optional[str] = None) -> str:
+    """
+    Map a sync database URL to its async driver (sqlite -> aiosqlite, postgresql -> asyncpg)
+
+    Args:
+        database_url: Sync database URL (None to use database.async_url from config, then DATABASE_URL)
+
+    Returns:
+        Async database URL
+    """
+    if database_url is None and db_config.get('async_url'):
+        return db_config['async_url']
+
+    url = database_url or DATABASE_URL
+    if url.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + url[len('sqlite:'):]
+    if url.startswith('postgresql:'):
+        return 'postgresql+asyncpg:' + url[len('postgresql:'):]
+    return url
+
+
+def get_async_engine():
+    """
+    Get the shared AsyncEngine, creating it on first call
+
+    Uses the same pool sizing and SQLite pragmas as the sync engine.
+
+    Returns:
+        AsyncEngine bound to the application database
+    """
+    global _async_engine, _AsyncSessionLocal
+
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = get_async_database_url()
+        pool_config = db_config.get('pool', {}) or {}
+        kwargs: Dict[str, Any] = {
+            "echo": db_config.get('echo', False),
+            "pool_pre_ping": True,
+        }
+        if url.startswith('sqlite'):
+            sqlite_pragmas = {**DEFAULT_SQLITE_PRAGMAS, **(db_config.get('sqlite_pragmas', {}) or {})}
+            kwargs["connect_args"] = {"timeout": sqlite_pragmas.get('busy_timeout', 5000) / 1000}
+        else:
+            sqlite_pragmas = None
+            kwargs["pool_recycle"] = pool_config.get('recycle_seconds', 1800)
+        if not (url.endswith(':memory:') or url.endswith('://')):
+            kwargs.update(
+                pool_size=pool_config.get('size', 10),
+                max_overflow=pool_config.get('max_overflow', 10),
+                pool_timeout=pool_config.get('timeout_seconds', 30),
+            )
+
+        _async_engine = create_async_engine(url, **kwargs)
+        if sqlite_pragmas:
+            _register_sqlite_pragmas(_async_engine.sync_engine, sqlite_pragmas)
+
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+        logger.info(f"Async database engine created (dialect: {_async_engine.dialect.name})")
+
+    return _async_engine
+
 
 # ========== ORM MODELS ==========
 
@@ -75,7 +270,8 @@ class Incident(Base):
     
     incident_id = Column(String(100), primary_key=True, index=True)
     user_id = Column(String(100), ForeignKey("users.user_id"), nullable=True, index=True)
-    tenant_id = Column(String(100), nullable=True, index=True)
+    idempotency_key = Column(String(100), nullable=True, unique=True, index=True)
+    tenant_id = Column(String(100), nullable=True)
     intent = Column(String(200), nullable=True)
     summary = Column(Text, nullable=True)
     issue = Column(Text, nullable=True)
@@ -84,27 +280,206 @@ class Incident(Base):
     resolution = Column(Text, nullable=True)
     confidence = Column(Float, nullable=True)
     status = Column(String(50), nullable=False, default='open', index=True)
-    policy_refs = Column(Text, nullable=True)  # JSON string
-    decision_json = Column(Text, nullable=True)  # JSON string
-    created_at = Column(String(50), nullable=False)
-    updated_at = Column(String(50), nullable=False)
+    policy_refs = Column(JSONType, nullable=True)  # List of policy references
+    decision_json = Column(JSONType, nullable=True)  # VerificationDecision as a dict
+    # Hot decision_json fields as generated columns, so they can be indexed and filtered in SQL
+    create_ticket = Column(Boolean, Computed(
+        json_path_expression('decision_json', ('action_plan', 'create_ticket'), 'boolean'),
+        persisted=_PERSIST_GENERATED
+    ))
+    call_refund_api = Column(Boolean, Computed(
+        json_path_expression('decision_json', ('action_plan', 'call_refund_api'), 'boolean'),
+        persisted=_PERSIST_GENERATED
+    ))
+    refund_amount = Column(Float, Computed(
+        json_path_expression('decision_json', ('action_plan', 'refund_amount'), 'double precision'),
+        persisted=_PERSIST_GENERATED
+    ))
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="incidents")
     
+    __table_args__ = (
+        # Matches list_incidents_page's keyset order (created_at DESC, incident_id DESC)
+        Index('ix_incidents_created_at_incident_id', 'created_at', 'incident_id'),
+        # Tenant-scoped ops queries (see services/incident_analytics.py and services/migrations.py)
+        Index('ix_incidents_tenant_status_created', 'tenant_id', 'status', 'created_at'),
+        Index('ix_incidents_tenant_created', 'tenant_id', 'created_at'),
+        Index('ix_incidents_tenant_intent', 'tenant_id', 'intent'),
+        # Decision filters on the generated columns
+        Index('ix_incidents_create_ticket', 'create_ticket'),
+        Index('ix_incidents_refund', 'call_refund_api', 'refund_amount'),
+    )
+    
     def __repr__(self):
         return f"<Incident(incident_id='{self.incident_id}', user_id='{self.user_id}', status='{self.status}')>"
 
 
+class KBFile(Base):
+    """KB file table - file-level metadata shared by every chunk of an ingested document"""
+    __tablename__ = "kb_files"
+
+    file_id = Column(String(64), primary_key=True, index=True)
+    source = Column(String(1000), nullable=False, index=True)
+    filename = Column(String(500), nullable=False)
+    file_extension = Column(String(20), nullable=True)
+    file_size_bytes = Column(Integer, nullable=True)
+    document_type = Column(String(50), nullable=True)
+    tenant_id = Column(String(100), nullable=False, index=True)
+    document_visibility = Column(String(50), nullable=True)
+    access_roles = Column(Text, nullable=True)  # JSON string
+    total_chunks = Column(Integer, nullable=True)
+    ingestion_timestamp = Column(String(50), nullable=False)
+    file_modified_timestamp = Column(String(50), nullable=True)
+    file_created_timestamp = Column(String(50), nullable=True)
+
+    def __repr__(self):
+        return f"<KBFile(file_id='{self.file_id}', source='{self.source}', tenant_id='{self.tenant_id}')>"
+
+
+class IngestionJob(Base):
+    """Ingestion job table - a persisted, resumable batch of files to ingest into the vector store"""
+    __tablename__ = "ingestion_jobs"
+
+    job_id = Column(String(100), primary_key=True, index=True)
+    tenant_id = Column(String(100), nullable=False, index=True)
+    access_roles = Column(Text, nullable=True)  # JSON string
+    document_visibility = Column(String(50), nullable=True)
+    status = Column(String(50), nullable=False, default='pending', index=True)
+    created_at = Column(String(50), nullable=False)
+    started_at = Column(String(50), nullable=True)
+    updated_at = Column(String(50), nullable=False)
+    completed_at = Column(String(50), nullable=True)
+
+    # Relationships
+    files = relationship("IngestionJobFile", back_populates="job", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<IngestionJob(job_id='{self.job_id}', tenant_id='{self.tenant_id}', status='{self.status}')>"
+
+
+class IngestionJobFile(Base):
+    """Ingestion job file table - per-file progress (pending/extracting/embedding/written/failed)"""
+    __tablename__ = "ingestion_job_files"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(100), ForeignKey("ingestion_jobs.job_id"), nullable=False, index=True)
+    file_path = Column(String(1000), nullable=False)
+    state = Column(String(50), nullable=False, default='pending')
+    total_chunks = Column(Integer, nullable=True)
+    chunks_written = Column(Integer, nullable=False, default=0)
+    file_signature = Column(String(100), nullable=True)  # mtime_ns:size of the version being embedded
+    error = Column(Text, nullable=True)
+    updated_at = Column(String(50), nullable=False)
+
+    # Relationships
+    job = relationship("IngestionJob", back_populates="files")
+
+    def __repr__(self):
+        return f"<IngestionJobFile(job_id='{self.job_id}', file_path='{self.file_path}', state='{self.state}')>"
+
+
+class JiraOutbox(Base):
+    """Jira outbox table - ticket requests created asynchronously by the outbox dispatcher"""
+    __tablename__ = "jira_outbox"
+
+    outbox_id = Column(String(100), primary_key=True, index=True)  # Provisional ticket reference
+    fields = Column(JSONType, nullable=False)  # Jira issue fields
+    status = Column(String(50), nullable=False, default='pending')  # pending/sending/ambiguous/reconciling/created/failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    issue_key = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    idempotency_key = Column(String(100), nullable=True, unique=True, index=True)  # Dedupes repeated requests
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Dispatcher poll: due pending requests, oldest first
+        Index('ix_jira_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<JiraOutbox(outbox_id='{self.outbox_id}', status='{self.status}', issue_key='{self.issue_key}')>"
+
+
+class IdempotencyKey(Base):
+    """Idempotency key table - stored results of side-effecting actions (see services/idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(100), primary_key=True)
+    action = Column(String(50), nullable=True)
+    status = Column(String(20), nullable=False, default='in_progress')  # in_progress/completed
+    result = Column(JSONType, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key='{self.key}', status='{self.status}')>"
+
+
 # ========== DATABASE INITIALIZATION ==========
 
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """
+    Initialize database tables and apply pending schema migrations.
+    Called once at application startup (graph construction, service entry points);
+    repeated calls in the same process are no-ops.
+    """
+    global _db_initialized
+    from .migrations import run_migrations
+
+    with _init_lock:
+        if _db_initialized:
+            return
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        ensure_indexes()
+        _db_initialized = True
+
+
+def ensure_indexes(bind: Optional[Engine] = None) -> None:
+    """
+    Create any model indexes missing from existing tables.
+    create_all only adds indexes when it creates the table, so indexes added to a
+    model later would otherwise never reach an existing database.
+
+    Args:
+        bind: Engine to use (default: the application engine)
+    """
+    bind = bind or engine
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
 
 # ========== SESSION MANAGEMENT ==========
 
+# Session factory used by get_db_session in the current context instead of SessionLocal
+_session_factory_override: ContextVar[Optional[sessionmaker]] = ContextVar("session_factory_override", default=None)
+
+
+@contextmanager
+def use_session_factory(factory: sessionmaker) -> Iterator[None]:
+    """
+    Route get_db_session() in the current context to another session factory,
+    e.g. a scratch database in benchmarks, without rebinding the module globals.
+    Threads don't inherit the context: run them with contextvars.copy_context().run.
+
+    Usage:
+        with use_session_factory(sessionmaker(bind=scratch_engine)):
+            get_user_data.invoke({"user_id": "U001"})
+    """
+    token = _session_factory_override.set(factory)
+    try:
+        yield
+    finally:
+        _session_factory_override.reset(token)
+
+
 @contextmanager
 def get_db_session() -> Session:
     """
@@ -115,7 +490,7 @@ def get_db_session() -> Session:
         with get_db_session() as session:
             user = session.query(User).filter_by(user_id="123").first()
     """
-    session = SessionLocal()
+    session = (_session_factory_override.get() or SessionLocal)()
     try:
         yield session
         session.commit()
@@ -126,6 +501,28 @@ def get_db_session() -> Session:
         session.close()
 
 
+@asynccontextmanager
+async def get_async_db_session() -> AsyncIterator[Any]:
+    """
+    Async context manager for database sessions.
+    Same commit/rollback semantics as get_db_session, without blocking the event loop.
+
+    Usage:
+        async with get_async_db_session() as session:
+            result = await session.execute(select(User).where(User.user_id == "123"))
+    """
+    get_async_engine()
+    session = _AsyncSessionLocal()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
 def get_db():
     """
     Dependency function for getting database sessions.
@@ -141,6 +538,3 @@ def get_db():
         db.close()
 
 
-# Initialize database tables on module import
-init_db()
-
@@ -0,0 +1,222 @@
+"""
+Idempotency
+Deterministic idempotency keys for side-effecting actions (tickets, incidents, refunds) and a
+persistent key store. run_once(key, fn) runs fn the first time a key is seen and returns the
+stored result for every repeat, so a retried graph run doesn't repeat downstream calls.
+"""
+
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from .config_loader import get_config
+from .database import get_db_session, IdempotencyKey
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+_IN_PROGRESS = object()
+
+
+def normalize_issue(text: Optional[str]) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so rephrased retries hash alike"""
+    text = re.sub(r"[^\w\s]", " ", (text or "").lower())
+    return " ".join(text.split())
+
+
+def make_idempotency_key(tenant_id: Optional[str],
+                         user_id: Optional[str],
+                         issue: Optional[str],
+                         action: str,
+                         now: Optional[float] = None) -> str:
+    """
+    Derive the idempotency key for one action on one issue
+
+    The key is a sha256 over tenant, user, normalized issue, action type and the current
+    idempotency window (idempotency.window_hours), so the same issue raised again after the
+    window is treated as new. A retry just after a window boundary keeps the previous
+    window's key while that key is still live in the key store (claimed via run_once less
+    than window_hours ago), so retries never straddle two keys.
+
+    Args:
+        tenant_id: Tenant identifier
+        user_id: User identifier (None if unknown)
+        issue: Issue text the action is taken for
+        action: Action type, e.g. 'resolution' or 'jira_ticket'
+        now: Timestamp used to pick the window (default: current time); key liveness is
+            always checked against the store's expiry at the current time
+
+    Returns:
+        Key of the form '<action>:<sha256 hex>'
+    """
+    now = now or time.time()
+    window_seconds = float(config.get('idempotency.window_hours', 24) or 0) * 3600
+    if window_seconds <= 0:
+        return _bucket_key(tenant_id, user_id, issue, action, 0)
+
+    bucket = int(now // window_seconds)
+    previous = _bucket_key(tenant_id, user_id, issue, action, bucket - 1)
+    if _is_live(previous):
+        return previous
+    return _bucket_key(tenant_id, user_id, issue, action, bucket)
+
+
+def run_once(key: Optional[str], fn: Callable[[], Any], action: Optional[str] = None) -> Any:
+    """
+    Run a side-effecting action at most once per key
+
+    The first caller claims the key and runs fn; its (JSON-serializable) result is stored and
+    returned to every later caller with the same key until the key expires. A caller that finds
+    the key claimed by a live run waits for its result. If fn raises, the claim is released so
+    a retry can run the action again.
+
+    Args:
+        key: Idempotency key (None runs fn without deduplication)
+        fn: Action to run
+        action: Action type recorded with the key
+
+    Returns:
+        Result of fn, or the stored result of the earlier run
+    """
+    if not key:
+        return fn()
+
+    in_progress_timeout = float(config.get('idempotency.in_progress_timeout_seconds', 30))
+    deadline = time.monotonic() + in_progress_timeout
+    while True:
+        claimed, cached = _claim(key, action, in_progress_timeout)
+        if claimed:
+            break
+        if cached is not _IN_PROGRESS:
+            logger.info(f"Idempotent replay of {key}, returning stored result")
+            return cached
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Action for idempotency key {key} is still in progress")
+        time.sleep(0.1)
+
+    try:
+        result = fn()
+    except Exception:
+        _release(key)
+        raise
+    _complete(key, result)
+    return result
+
+
+def get_stored_result(key: str) -> Optional[Any]:
+    """
+    Stored result for a completed, unexpired key
+
+    Args:
+        key: Idempotency key
+
+    Returns:
+        The stored result, or None if the key is unknown, in progress or expired
+    """
+    with get_db_session() as session:
+        row = session.get(IdempotencyKey, key)
+        if not row or row.status != 'completed' or _expired(row, datetime.now()):
+            return None
+        return row.result
+
+
+def purge_expired_keys() -> int:
+    """
+    Delete expired keys
+
+    Returns:
+        Number of keys deleted
+    """
+    with get_db_session() as session:
+        return (
+            session.query(IdempotencyKey)
+            .filter(IdempotencyKey.expires_at.isnot(None), IdempotencyKey.expires_at <= datetime.now())
+            .delete(synchronize_session=False)
+        )
+
+
+# ========== INTERNALS ==========
+
+def _bucket_key(tenant_id: Optional[str], user_id: Optional[str], issue: Optional[str], action: str, bucket: int) -> str:
+    payload = "\x1f".join([tenant_id or "", user_id or "", normalize_issue(issue), action, str(bucket)])
+    return f"{action}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def _is_live(key: str) -> bool:
+    """Whether a key is claimed or completed in the store and not yet expired"""
+    try:
+        with get_db_session() as session:
+            row = session.get(IdempotencyKey, key)
+            return row is not None and not _expired(row, datetime.now())
+    except Exception as e:
+        logger.warning(f"Idempotency key lookup failed for {key}: {e}")
+        return False
+
+
+def _claim(key: str, action: Optional[str], in_progress_timeout: float) -> tuple:
+    """Returns (True, None) if this caller owns the key, else (False, stored result or _IN_PROGRESS)"""
+    now = datetime.now()
+    window_hours = float(config.get('idempotency.window_hours', 24) or 0)
+    try:
+        with get_db_session() as session:
+            row = session.get(IdempotencyKey, key)
+            if row and _expired(row, now):
+                session.delete(row)
+                session.flush()
+                row = None
+
+            if row is None:
+                session.add(IdempotencyKey(
+                    key=key,
+                    action=action,
+                    status='in_progress',
+                    created_at=now,
+                    updated_at=now,
+                    expires_at=now + timedelta(hours=window_hours) if window_hours > 0 else None
+                ))
+                return True, None
+
+            if row.status == 'completed':
+                return False, row.result
+            if row.updated_at <= now - timedelta(seconds=in_progress_timeout):
+                # The previous owner died mid-action; take the key over
+                logger.warning(f"Taking over stale in-progress idempotency key {key}")
+                row.updated_at = now
+                return True, None
+            return False, _IN_PROGRESS
+    except IntegrityError:
+        # Another caller inserted the key first
+        return False, _IN_PROGRESS
+
+
+def _complete(key: str, result: Any) -> None:
+    try:
+        with get_db_session() as session:
+            row = session.get(IdempotencyKey, key)
+            if row:
+                row.status = 'completed'
+                row.result = result
+                row.updated_at = datetime.now()
+    except Exception as e:
+        # The action already happened; failing to store it only loses deduplication
+        logger.error(f"Failed to store result for idempotency key {key}: {e}")
+
+
+def _release(key: str) -> None:
+    try:
+        with get_db_session() as session:
+            session.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == 'in_progress'
+            ).delete(synchronize_session=False)
+    except Exception as e:
+        logger.error(f"Failed to release idempotency key {key}: {e}")
+
+
+def _expired(row: IdempotencyKey, now: datetime) -> bool:
+    return row.expires_at is not None and row.expires_at <= now
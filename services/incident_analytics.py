@@ -0,0 +1,215 @@
+"""
+Incident Analytics
+Tenant-scoped aggregate queries over incidents for ops dashboards. Each query is built by a
+_*_stmt function so its plan can be checked against the composite indexes on incidents.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, case, cast, func, select, true
+from sqlalchemy.sql import Select
+
+from .database import get_db_session, Incident
+
+
+# ========== QUERY BUILDERS ==========
+
+def _recent_incidents_stmt(tenant_id: str, status: Optional[str], since: Optional[datetime], limit: int) -> Select:
+    # Served by ix_incidents_tenant_status_created (or ix_incidents_tenant_created without status)
+    stmt = select(
+        Incident.incident_id, Incident.user_id, Incident.intent, Incident.summary,
+        Incident.status, Incident.confidence, Incident.created_at
+    ).where(Incident.tenant_id == tenant_id)
+    if status:
+        stmt = stmt.where(Incident.status == status)
+    if since:
+        stmt = stmt.where(Incident.created_at >= since)
+    return stmt.order_by(Incident.created_at.desc()).limit(limit)
+
+
+def _counts_by_status_stmt(tenant_id: str, since: Optional[datetime]) -> Select:
+    stmt = select(Incident.status, func.count()).where(Incident.tenant_id == tenant_id)
+    if since:
+        stmt = stmt.where(Incident.created_at >= since)
+    return stmt.group_by(Incident.status)
+
+
+def _counts_by_intent_stmt(tenant_id: str, since: Optional[datetime]) -> Select:
+    stmt = select(Incident.intent, func.count()).where(Incident.tenant_id == tenant_id)
+    if since:
+        stmt = stmt.where(Incident.created_at >= since)
+    return stmt.group_by(Incident.intent)
+
+
+def _confidence_histogram_stmt(tenant_id: str, bins: int, since: Optional[datetime]) -> Select:
+    # confidence is in [0, 1]; 1.0 falls into the last bucket
+    bucket = case(
+        (Incident.confidence >= 1, bins - 1),
+        else_=cast(Incident.confidence * bins, Integer)
+    ).label("bucket")
+    stmt = select(bucket, func.count()).where(
+        Incident.tenant_id == tenant_id,
+        Incident.confidence.isnot(None)
+    )
+    if since:
+        stmt = stmt.where(Incident.created_at >= since)
+    return stmt.group_by(bucket)
+
+
+def _refund_incidents_stmt(min_amount: float, tenant_id: Optional[str], limit: int) -> Select:
+    # Filters on generated columns from decision_json, served by ix_incidents_refund
+    stmt = select(
+        Incident.incident_id, Incident.user_id, Incident.tenant_id, Incident.intent,
+        Incident.status, Incident.confidence, Incident.refund_amount, Incident.created_at
+    ).where(
+        Incident.call_refund_api == true(),
+        Incident.refund_amount > min_amount
+    )
+    if tenant_id:
+        stmt = stmt.where(Incident.tenant_id == tenant_id)
+    return stmt.order_by(Incident.refund_amount.desc()).limit(limit)
+
+
+# ========== ANALYTICS API ==========
+
+def list_recent_incidents(tenant_id: str,
+                          status: Optional[str] = "open",
+                          since_hours: Optional[float] = 24,
+                          limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Newest incidents for a tenant, e.g. open incidents in the last day
+
+    Args:
+        tenant_id: Tenant identifier
+        status: Filter by status (None for all statuses)
+        since_hours: Only incidents created in the last N hours (None for all time)
+        limit: Maximum number of incidents
+
+    Returns:
+        List of incident dicts (list-view columns), newest first
+    """
+    since = _since(since_hours)
+    with get_db_session() as session:
+        rows = session.execute(_recent_incidents_stmt(tenant_id, status, since, limit)).all()
+    return [dict(row._mapping) for row in rows]
+
+
+def count_incidents_by_status(tenant_id: str, since_hours: Optional[float] = None) -> Dict[str, int]:
+    """
+    Incident counts per status for a tenant
+
+    Args:
+        tenant_id: Tenant identifier
+        since_hours: Only incidents created in the last N hours (None for all time)
+
+    Returns:
+        Mapping of status to count
+    """
+    with get_db_session() as session:
+        rows = session.execute(_counts_by_status_stmt(tenant_id, _since(since_hours))).all()
+    return {status: count for status, count in rows}
+
+
+def count_incidents_by_intent(tenant_id: str, since_hours: Optional[float] = None) -> Dict[str, int]:
+    """
+    Incident counts per intent for a tenant
+
+    Args:
+        tenant_id: Tenant identifier
+        since_hours: Only incidents created in the last N hours (None for all time)
+
+    Returns:
+        Mapping of intent to count (incidents without an intent are counted under 'unknown')
+    """
+    with get_db_session() as session:
+        rows = session.execute(_counts_by_intent_stmt(tenant_id, _since(since_hours))).all()
+    return {intent or "unknown": count for intent, count in rows}
+
+
+def confidence_histogram(tenant_id: str, bins: int = 10, since_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Histogram of verifier confidence for a tenant's incidents
+
+    Args:
+        tenant_id: Tenant identifier
+        bins: Number of equal-width buckets over [0, 1]
+        since_hours: Only incidents created in the last N hours (None for all time)
+
+    Returns:
+        One dict per bucket with lower, upper and count (empty buckets included)
+    """
+    bins = max(int(bins), 1)
+    with get_db_session() as session:
+        rows = session.execute(_confidence_histogram_stmt(tenant_id, bins, _since(since_hours))).all()
+    counts = {bucket: count for bucket, count in rows}
+    return [
+        {"lower": i / bins, "upper": (i + 1) / bins, "count": counts.get(i, 0)}
+        for i in range(bins)
+    ]
+
+
+def list_refund_incidents(min_amount: float = 0.0, tenant_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Incidents whose decision called the refund API for more than min_amount, largest first
+
+    Args:
+        min_amount: Refund amount threshold (exclusive)
+        tenant_id: Restrict to one tenant (None for all tenants)
+        limit: Maximum number of incidents
+
+    Returns:
+        List of incident dicts including refund_amount
+    """
+    with get_db_session() as session:
+        rows = session.execute(_refund_incidents_stmt(min_amount, tenant_id, limit)).all()
+    return [dict(row._mapping) for row in rows]
+
+
+def count_ticketed_incidents(tenant_id: str, since_hours: Optional[float] = None) -> int:
+    """
+    Number of a tenant's incidents whose decision requested a ticket
+
+    Args:
+        tenant_id: Tenant identifier
+        since_hours: Only incidents created in the last N hours (None for all time)
+
+    Returns:
+        Count of incidents with action_plan.create_ticket set
+    """
+    stmt = select(func.count()).select_from(Incident).where(
+        Incident.tenant_id == tenant_id,
+        Incident.create_ticket == true()
+    )
+    since = _since(since_hours)
+    if since:
+        stmt = stmt.where(Incident.created_at >= since)
+    with get_db_session() as session:
+        return session.execute(stmt).scalar() or 0
+
+
+def get_tenant_incident_summary(tenant_id: str, since_hours: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Dashboard summary for a tenant: totals, counts by status and intent, confidence histogram
+
+    Args:
+        tenant_id: Tenant identifier
+        since_hours: Only incidents created in the last N hours (None for all time)
+
+    Returns:
+        Dictionary with total, by_status, by_intent and confidence_histogram
+    """
+    by_status = count_incidents_by_status(tenant_id, since_hours)
+    return {
+        "tenant_id": tenant_id,
+        "since_hours": since_hours,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_intent": count_incidents_by_intent(tenant_id, since_hours),
+        "ticketed": count_ticketed_incidents(tenant_id, since_hours),
+        "confidence_histogram": confidence_histogram(tenant_id, since_hours=since_hours)
+    }
+
+
+def _since(since_hours: Optional[float]) -> Optional[datetime]:
+    return datetime.now() - timedelta(hours=since_hours) if since_hours else None
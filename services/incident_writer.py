@@ -0,0 +1,432 @@
+"""
+Incident Write-Behind Queue
+Accepts incident records from the claim verifier without blocking the response: records are
+appended to a local journal (at-least-once), then group-committed to the incidents table in
+batches by a background thread. idempotency_key makes journal replays and retries safe.
+"""
+
+import atexit
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from .config_loader import get_config
+from .database import get_db_session, Incident
+from .logger_setup import setup_logger
+from .models import IncidentCreate
+
+logger = setup_logger()
+config = get_config()
+
+
+class IncidentWriter:
+    """
+    Background group-commit writer for incident records.
+
+    Journal format (JSONL): {"op": "put", "record": {...}} for each accepted record,
+    {"op": "ack", "keys": [...]} once a batch is committed and {"op": "failed", "keys": [...]}
+    for dead-lettered records. On startup, puts without an ack or failed op are replayed.
+    Records whose commit fails stay unacknowledged and are re-queued with exponential backoff;
+    after max_attempts they are moved to the dead-letter file. Once compact_after_records
+    records have been resolved, the journal is rewritten with only the unresolved puts.
+    """
+
+    def __init__(self,
+                 journal_path: str = ".incident_journal.jsonl",
+                 batch_size: int = 50,
+                 flush_interval_seconds: float = 0.5,
+                 fsync: bool = True,
+                 retry_backoff_seconds: float = 1.0,
+                 max_retry_backoff_seconds: float = 300.0,
+                 max_attempts: int = 10,
+                 dead_letter_path: Optional[str] = None,
+                 compact_after_records: int = 1000):
+        """
+        Initialize the writer and replay any unacknowledged journal entries
+
+        Args:
+            journal_path: Local journal file used for crash recovery
+            batch_size: Maximum records per commit
+            flush_interval_seconds: Maximum time a record waits for its batch to fill
+            fsync: fsync the journal after every accepted record
+            retry_backoff_seconds: Delay before the first retry of a failed record (doubles per attempt)
+            max_retry_backoff_seconds: Upper bound for the retry delay
+            max_attempts: Failed attempts after which a record is dead-lettered
+            dead_letter_path: JSONL file for dead-lettered records (default: journal_path + '.failed')
+            compact_after_records: Resolved records after which the journal is compacted
+        """
+        self.journal_path = Path(journal_path)
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.fsync = fsync
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.max_attempts = max(int(max_attempts), 1)
+        self.dead_letter_path = Path(dead_letter_path or f"{journal_path}.failed")
+        self.compact_after_records = max(int(compact_after_records), 1)
+
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._pending_keys = set()
+        self._failed_keys = set()  # Failed and waiting for a retry; unacknowledged in the journal
+        self._retries: List[tuple] = []  # Heap of (retry_at, seq, record)
+        self._retry_seq = 0
+        self._attempts: Dict[str, int] = {}  # Failed attempts per idempotency key
+        self._unresolved: Dict[str, Dict[str, Any]] = {}  # Journaled records not yet acked or dead-lettered
+        self._resolved_since_compact = 0
+        self._stop = threading.Event()
+        self._stats = {"submitted": 0, "written": 0, "duplicates": 0, "failed": 0, "dead_lettered": 0,
+                       "batches": 0, "replayed": 0, "compactions": 0}
+
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._replay_journal()
+
+        self._thread = threading.Thread(target=self._run, name="incident-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, incident_data: Dict[str, Any], idempotency_key: Optional[str] = None) -> str:
+        """
+        Validate and enqueue an incident record; returns as soon as it is journaled
+
+        Args:
+            incident_data: Incident fields as accepted by create_incident_record
+            idempotency_key: Key identifying this logical incident; resubmitting the same
+                key never creates a second row and returns the same incident_id (default: a random key)
+
+        Returns:
+            incident_id assigned to the record
+        """
+        try:
+            incident_create = IncidentCreate(**incident_data)
+        except ValidationError as e:
+            raise ValueError(f"Invalid incident data: {e}")
+
+        timestamp = datetime.now().isoformat()
+        record = incident_create.dict()
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        record.update({
+            # Derived from the key so a retried submit reports the incident_id that was stored
+            "incident_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"incident:{idempotency_key}")),
+            "idempotency_key": idempotency_key,
+            "created_at": timestamp,
+            "updated_at": timestamp
+        })
+
+        with self._journal_lock:
+            self._append_journal({"op": "put", "record": record})
+            self._unresolved.setdefault(record["idempotency_key"], record)
+            self._pending_keys.add(record["idempotency_key"])
+            self._stats["submitted"] += 1
+        self._queue.put(record)
+
+        return record["incident_id"]
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Block until every submitted record has been committed (or failed)
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._journal_lock:
+                if not self._pending_keys:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush outstanding records and stop the background thread"""
+        if self._stop.is_set():
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+        with self._journal_lock:
+            self._journal.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get writer metrics
+
+        Returns:
+            Dictionary with submitted/written/duplicate/failed/dead-lettered counts, batches,
+            compactions, queue depth and records waiting for a retry
+        """
+        with self._journal_lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending_keys)
+            stats["retrying"] = len(self._failed_keys)
+        stats["avg_batch_size"] = stats["written"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    # ========== BACKGROUND WRITER ==========
+
+    def _run(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            self._requeue_due_retries()
+            try:
+                first = self._queue.get(timeout=self.flush_interval_seconds)
+            except queue.Empty:
+                continue
+
+            # Group commit: wait up to flush_interval for the batch to fill
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        written, duplicates, failed, error = 0, 0, [], None
+        try:
+            written, duplicates = self._insert(batch)
+        except IntegrityError:
+            # A key committed concurrently elsewhere; isolate per record
+            for record in batch:
+                try:
+                    w, d = self._insert([record])
+                    written += w
+                    duplicates += d
+                except Exception as e:
+                    logger.error(f"Incident {record['incident_id']} could not be written: {e}")
+                    failed.append(record)
+                    error = str(e)
+        except Exception as e:
+            # Leave the batch unacknowledged in the journal and retry it with backoff
+            logger.error(f"Incident batch of {len(batch)} failed, will retry: {e}")
+            failed, error = batch, str(e)
+
+        failed_keys = {record["idempotency_key"] for record in failed}
+        acked = [record["idempotency_key"] for record in batch if record["idempotency_key"] not in failed_keys]
+
+        with self._journal_lock:
+            if acked:
+                self._append_journal({"op": "ack", "keys": acked})
+            self._pending_keys.difference_update(record["idempotency_key"] for record in batch)
+            self._failed_keys.difference_update(acked)
+            for key in acked:
+                self._resolve(key)
+            for record in failed:
+                self._schedule_retry(record, error)
+            self._stats["written"] += written
+            self._stats["duplicates"] += duplicates
+            self._stats["failed"] += len(failed)
+            self._stats["batches"] += 1
+            self._maybe_compact_journal()
+
+        logger.debug(f"Incident writer committed batch: {written} written, {duplicates} duplicates, {len(failed)} failed")
+
+    def _schedule_retry(self, record: Dict[str, Any], error: Optional[str]) -> None:
+        """Park a failed record until its backoff elapses, or dead-letter it (journal lock held)"""
+        key = record["idempotency_key"]
+        attempts = self._attempts.get(key, 0) + 1
+        self._attempts[key] = attempts
+        if attempts >= self.max_attempts:
+            self._dead_letter(record, attempts, error)
+            return
+        delay = min(self.retry_backoff_seconds * 2 ** (attempts - 1), self.max_retry_backoff_seconds)
+        self._failed_keys.add(key)
+        self._retry_seq += 1
+        heapq.heappush(self._retries, (time.monotonic() + delay, self._retry_seq, record))
+
+    def _dead_letter(self, record: Dict[str, Any], attempts: int, error: Optional[str]) -> None:
+        """Give up on a record: keep it in the dead-letter file and stop replaying it (journal lock held)"""
+        key = record["idempotency_key"]
+        logger.error(f"Incident {record['incident_id']} failed {attempts} times, moving it to {self.dead_letter_path}: {error}")
+        try:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"record": record, "attempts": attempts, "error": error,
+                                    "failed_at": datetime.now().isoformat()}, default=str) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except OSError as e:
+            # Keep the record in the journal so it is replayed rather than lost
+            logger.error(f"Could not write dead letter for incident {record['incident_id']}: {e}")
+            return
+        self._append_journal({"op": "failed", "keys": [key]})
+        self._failed_keys.discard(key)
+        self._resolve(key)
+        self._stats["dead_lettered"] += 1
+
+    def _requeue_due_retries(self) -> None:
+        """Move failed records whose backoff elapsed back onto the queue"""
+        now = time.monotonic()
+        with self._journal_lock:
+            while self._retries and self._retries[0][0] <= now:
+                _, _, record = heapq.heappop(self._retries)
+                self._failed_keys.discard(record["idempotency_key"])
+                self._pending_keys.add(record["idempotency_key"])
+                self._queue.put(record)
+
+    def _insert(self, records: List[Dict[str, Any]]) -> tuple:
+        """Insert records in one transaction, skipping idempotency keys already stored"""
+        unique = {}
+        for record in records:
+            unique.setdefault(record["idempotency_key"], record)
+
+        with get_db_session() as session:
+            existing = {
+                key for (key,) in
+                session.query(Incident.idempotency_key)
+                .filter(Incident.idempotency_key.in_(list(unique)))
+                .all()
+            }
+            new_records = [record for key, record in unique.items() if key not in existing]
+            session.add_all([
+                Incident(
+                    incident_id=record["incident_id"],
+                    idempotency_key=record["idempotency_key"],
+                    user_id=record.get("user_id"),
+                    tenant_id=record.get("tenant_id"),
+                    intent=record.get("intent"),
+                    summary=record.get("summary"),
+                    issue=record.get("issue"),
+                    user_demand=record.get("user_demand"),
+                    is_valid=record.get("is_valid"),
+                    resolution=record.get("resolution"),
+                    confidence=record.get("confidence"),
+                    status=record.get("status") or 'open',
+                    policy_refs=record.get("policy_refs") or [],
+                    decision_json=record.get("decision_json") or {},
+                    created_at=datetime.fromisoformat(record["created_at"]),
+                    updated_at=datetime.fromisoformat(record["updated_at"])
+                )
+                for record in new_records
+            ])
+
+        return len(new_records), len(records) - len(new_records)
+
+    # ========== JOURNAL ==========
+
+    def _append_journal(self, entry: Dict[str, Any]) -> None:
+        """Append one journal line (journal lock held)"""
+        self._journal.write(json.dumps(entry, default=str) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _resolve(self, key: str) -> None:
+        """Forget a record that was acked or dead-lettered (journal lock held)"""
+        self._attempts.pop(key, None)
+        if self._unresolved.pop(key, None) is not None:
+            self._resolved_since_compact += 1
+
+    def _maybe_compact_journal(self) -> None:
+        """Shrink the journal once enough of it is resolved, even while records are in flight (journal lock held)"""
+        if not self._unresolved:
+            if self._resolved_since_compact:
+                self._truncate_journal()
+            return
+        if self._resolved_since_compact < self.compact_after_records:
+            return
+
+        # Rewrite with only the unresolved puts, then swap it in atomically
+        compacted_path = self.journal_path.with_name(self.journal_path.name + ".compact")
+        with open(compacted_path, 'w', encoding='utf-8') as f:
+            for record in self._unresolved.values():
+                f.write(json.dumps({"op": "put", "record": record}, default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._journal.close()
+        os.replace(compacted_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._resolved_since_compact = 0
+        self._stats["compactions"] += 1
+        logger.debug(f"Compacted incident journal to {len(self._unresolved)} unresolved record(s)")
+
+    def _truncate_journal(self) -> None:
+        """Drop the journal once everything in it is resolved (journal lock held)"""
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._journal.flush()
+        self._resolved_since_compact = 0
+
+    def _replay_journal(self) -> None:
+        """Re-enqueue journaled records that were never acknowledged"""
+        puts: Dict[str, Dict[str, Any]] = {}
+        acked = set()
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn final line from a crash mid-write
+                    if entry.get("op") == "put":
+                        record = entry["record"]
+                        puts.setdefault(record["idempotency_key"], record)
+                    elif entry.get("op") in ("ack", "failed"):
+                        acked.update(entry.get("keys", []))
+        except FileNotFoundError:
+            return
+
+        unacked = [record for key, record in puts.items() if key not in acked]
+        if not unacked:
+            with self._journal_lock:
+                self._truncate_journal()
+            return
+
+        logger.info(f"Replaying {len(unacked)} unacknowledged incident record(s) from {self.journal_path}")
+        for record in unacked:
+            self._unresolved[record["idempotency_key"]] = record
+            self._pending_keys.add(record["idempotency_key"])
+            self._queue.put(record)
+        self._stats["replayed"] = len(unacked)
+
+
+_writer: Optional[IncidentWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_incident_writer() -> Optional[IncidentWriter]:
+    """
+    Get the shared incident writer, starting it on first use
+
+    Returns:
+        IncidentWriter, or None when incident_writer.enabled is false
+    """
+    global _writer
+    writer_config = config.get_section('incident_writer')
+    if not writer_config.get('enabled', True):
+        return None
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = IncidentWriter(
+                journal_path=writer_config.get('journal_path', '.incident_journal.jsonl'),
+                batch_size=writer_config.get('batch_size', 50),
+                flush_interval_seconds=writer_config.get('flush_interval_seconds', 0.5),
+                fsync=writer_config.get('fsync', True),
+                retry_backoff_seconds=writer_config.get('retry_backoff_seconds', 1.0),
+                max_retry_backoff_seconds=writer_config.get('max_retry_backoff_seconds', 300.0),
+                max_attempts=writer_config.get('max_attempts', 10),
+                dead_letter_path=writer_config.get('dead_letter_path'),
+                compact_after_records=writer_config.get('compact_after_records', 1000)
+            )
+    return _writer
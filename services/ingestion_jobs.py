@@ -0,0 +1,342 @@
+"""
+Resumable Ingestion Jobs
+Runs vector store ingestion as persisted jobs tracked in SQLite, with per-file state and
+batch-level checkpoints so a crash resumes from the last committed batch instead of starting over.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from .config_loader import get_config
+from .data_ingestion import build_document_chunks, get_processor_map, get_chunk_id, delete_document_by_source
+from .database import get_db_session, IngestionJob, IngestionJobFile
+from .logger_setup import setup_logger
+from .services import vector_store
+
+logger = setup_logger()
+config = get_config()
+
+# Per-file states, in processing order
+FILE_STATES = ['pending', 'extracting', 'embedding', 'written', 'failed']
+FINISHED_FILE_STATES = {'written', 'failed'}
+
+# Job statuses a run can claim; a 'running' job is only claimable once its lease expired
+CLAIMABLE_JOB_STATUSES = ['pending', 'running']
+
+
+def create_ingestion_job(file_paths, tenant_id: str = "rentomojo", access_roles: list = None, document_visibility: str = "Public") -> str:
+    """
+    Persist a new ingestion job with one pending entry per file
+
+    Args:
+        file_paths (str or list): Path(s) to the file(s) to ingest
+        tenant_id (str): Unique identifier for tenant
+        access_roles (list): List of roles that can access documents (default: ["customer"])
+        document_visibility (str): Document visibility level
+
+    Returns:
+        job_id of the created job
+    """
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+
+    job_id = str(uuid.uuid4())
+    timestamp = datetime.now().isoformat()
+
+    with get_db_session() as session:
+        job = IngestionJob(
+            job_id=job_id,
+            tenant_id=tenant_id,
+            access_roles=json.dumps(access_roles or ["customer"]),
+            document_visibility=document_visibility,
+            status='pending',
+            created_at=timestamp,
+            updated_at=timestamp
+        )
+        job.files = [
+            IngestionJobFile(file_path=str(Path(path)), state='pending', chunks_written=0, updated_at=timestamp)
+            for path in file_paths
+        ]
+        session.add(job)
+
+    logger.info(f"Created ingestion job {job_id} for {len(file_paths)} file(s), tenant: {tenant_id}")
+    return job_id
+
+
+def run_ingestion_job(job_id: str) -> Dict[str, Any]:
+    """
+    Run (or resume) an ingestion job until every file is written or failed
+
+    The job is claimed first with a conditional UPDATE, so two processes resuming the same job
+    don't both ingest it: a pending job, or a running job whose last checkpoint is older than
+    document_processing.ingestion_job_lease_seconds, can be claimed; otherwise the current
+    status is returned without running anything.
+
+    Files already written are skipped; files interrupted mid-embedding continue after their
+    last committed batch. Chunk ids are deterministic, so re-writing a batch is an upsert.
+    If a file changed since its checkpoint (different mtime/size), its partially written
+    chunks are purged and it is re-ingested from chunk 0.
+
+    Args:
+        job_id: Id of the job to run
+
+    Returns:
+        Job status dict (see get_ingestion_job_status). The final status is 'completed' if
+        every file was written, 'completed_with_errors' if some failed and 'failed' if all did
+    """
+    if not _claim_job(job_id):
+        status = get_ingestion_job_status(job_id)
+        if status is None:
+            raise ValueError(f"Ingestion job not found: {job_id}")
+        logger.info(f"Ingestion job {job_id} not claimed (status: {status['status']}), skipping")
+        return status
+    return _run_claimed_job(job_id)
+
+
+def _run_claimed_job(job_id: str) -> Dict[str, Any]:
+    """Ingest the unfinished files of a job this caller has claimed (see run_ingestion_job)"""
+    batch_size = max(int(config.get('document_processing.ingestion_batch_size', 64)), 1)
+
+    with get_db_session() as session:
+        job = session.query(IngestionJob).filter(IngestionJob.job_id == job_id).first()
+
+        tenant_id = job.tenant_id
+        access_roles = json.loads(job.access_roles) if job.access_roles else None
+        document_visibility = job.document_visibility
+        file_entries = [
+            (entry.id, entry.file_path, entry.chunks_written, entry.file_signature)
+            for entry in job.files
+            if entry.state not in FINISHED_FILE_STATES
+        ]
+
+        job.started_at = job.started_at or job.updated_at
+
+    supported_types = get_processor_map()
+
+    for entry_id, file_path, chunks_written, checkpoint_signature in file_entries:
+        path = Path(file_path)
+        try:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"File not found: {file_path}")
+            if path.suffix.lower() not in supported_types:
+                raise ValueError(f"Unsupported file type: {path.suffix.lower()}")
+
+            signature = _file_signature(path)
+            if chunks_written and checkpoint_signature != signature:
+                # Checkpointed offsets refer to the old version's chunks
+                logger.warning(f"{path.name} changed since its checkpoint, re-ingesting from chunk 0")
+                delete_document_by_source(str(path), tenant_id=tenant_id)
+                chunks_written = 0
+
+            _update_file(entry_id, state='extracting', chunks_written=chunks_written, file_signature=signature)
+            chunks = build_document_chunks(path, tenant_id, access_roles, document_visibility)
+            if not chunks:
+                raise ValueError("No content extracted from file")
+
+            _update_file(entry_id, state='embedding', total_chunks=len(chunks))
+            if chunks_written:
+                logger.info(f"Resuming {path.name} at chunk {chunks_written}/{len(chunks)}")
+
+            for start in range(chunks_written, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                vector_store.add_documents(
+                    documents=batch,
+                    ids=[get_chunk_id(chunk.metadata) for chunk in batch]
+                )
+                # Checkpoint after each committed batch
+                _update_file(entry_id, chunks_written=start + len(batch))
+
+            _update_file(entry_id, state='written')
+            logger.info(f"Ingestion job {job_id}: wrote {len(chunks)} chunks for {path.name}")
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id}: failed to ingest {file_path}: {e}")
+            _update_file(entry_id, state='failed', error=str(e))
+
+    with get_db_session() as session:
+        job = session.query(IngestionJob).filter(IngestionJob.job_id == job_id).first()
+        timestamp = datetime.now().isoformat()
+        job.status = _final_job_status([entry.state for entry in job.files])
+        job.updated_at = timestamp
+        job.completed_at = timestamp
+
+    status = get_ingestion_job_status(job_id)
+    logger.info(f"Ingestion job {job_id} {status['status']}: {status['files_by_state']}, "
+                f"{status['chunks_written']} chunks, {status['chunks_per_second']:.1f} chunks/s")
+    return status
+
+
+def resume_incomplete_jobs() -> List[str]:
+    """
+    Resume every job left pending or running (e.g. after a crash or restart)
+    Running jobs whose lease hasn't expired belong to another process and are skipped.
+
+    Returns:
+        List of job ids that were resumed
+    """
+    with get_db_session() as session:
+        job_ids = [
+            job.job_id for job in
+            session.query(IngestionJob)
+            .filter(IngestionJob.status.in_(CLAIMABLE_JOB_STATUSES))
+            .order_by(IngestionJob.created_at)
+            .all()
+        ]
+
+    resumed = []
+    for job_id in job_ids:
+        if not _claim_job(job_id):
+            continue
+        logger.info(f"Resuming ingestion job {job_id}")
+        _run_claimed_job(job_id)
+        resumed.append(job_id)
+
+    return resumed
+
+
+def get_ingestion_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get progress, throughput and ETA for an ingestion job
+
+    Args:
+        job_id: Id of the job
+
+    Returns:
+        Dictionary with job status, per-state file counts, chunk progress,
+        throughput (chunks/s, files/s) and eta_seconds, or None if job not found
+    """
+    with get_db_session() as session:
+        job = session.query(IngestionJob).filter(IngestionJob.job_id == job_id).first()
+        if not job:
+            return None
+
+        files = [
+            {
+                "file_path": entry.file_path,
+                "state": entry.state,
+                "total_chunks": entry.total_chunks,
+                "chunks_written": entry.chunks_written,
+                "error": entry.error
+            }
+            for entry in job.files
+        ]
+        status = job.status
+        started_at = job.started_at
+        completed_at = job.completed_at
+        created_at = job.created_at
+
+    files_by_state = {state: 0 for state in FILE_STATES}
+    for entry in files:
+        files_by_state[entry["state"]] = files_by_state.get(entry["state"], 0) + 1
+
+    chunks_written = sum(entry["chunks_written"] or 0 for entry in files)
+    finished_files = files_by_state['written'] + files_by_state['failed']
+    remaining_files = len(files) - finished_files
+
+    elapsed = 0.0
+    if started_at:
+        end_time = datetime.fromisoformat(completed_at) if completed_at else datetime.now()
+        elapsed = max((end_time - datetime.fromisoformat(started_at)).total_seconds(), 0.0)
+
+    chunks_per_second = chunks_written / elapsed if elapsed > 0 else 0.0
+    files_per_second = finished_files / elapsed if elapsed > 0 else 0.0
+
+    # Chunks left in files already being embedded are known exactly; untouched files are
+    # estimated from the average time per finished file
+    eta_seconds = None
+    if remaining_files == 0:
+        eta_seconds = 0.0
+    elif files_per_second > 0:
+        eta_seconds = remaining_files / files_per_second
+    elif chunks_per_second > 0:
+        known_remaining = sum(
+            (entry["total_chunks"] or 0) - (entry["chunks_written"] or 0)
+            for entry in files if entry["state"] == 'embedding'
+        )
+        eta_seconds = known_remaining / chunks_per_second
+
+    return {
+        "job_id": job_id,
+        "status": status,
+        "created_at": created_at,
+        "started_at": started_at,
+        "completed_at": completed_at,
+        "total_files": len(files),
+        "files_by_state": files_by_state,
+        "chunks_written": chunks_written,
+        "elapsed_seconds": elapsed,
+        "chunks_per_second": chunks_per_second,
+        "files_per_second": files_per_second,
+        "eta_seconds": eta_seconds,
+        "files": files
+    }
+
+
+def _claim_job(job_id: str) -> bool:
+    """
+    Mark a job running if it is pending or its lease expired; True if this caller owns it
+
+    The lease is renewed by every checkpoint (_update_file touches the job's updated_at).
+    """
+    lease_seconds = float(config.get('document_processing.ingestion_job_lease_seconds', 600))
+    now = datetime.now()
+    lease_cutoff = (now - timedelta(seconds=lease_seconds)).isoformat()
+    with get_db_session() as session:
+        claimed = (
+            session.query(IngestionJob)
+            .filter(
+                IngestionJob.job_id == job_id,
+                or_(
+                    IngestionJob.status == 'pending',
+                    (IngestionJob.status == 'running') & (IngestionJob.updated_at <= lease_cutoff)
+                )
+            )
+            .update({"status": 'running', "updated_at": now.isoformat()}, synchronize_session=False)
+        )
+    if claimed == 1:
+        logger.info(f"Claimed ingestion job {job_id}")
+    return claimed == 1
+
+
+def _final_job_status(file_states: List[str]) -> str:
+    """Job status from its files' final states"""
+    failed = sum(state == 'failed' for state in file_states)
+    if failed == 0:
+        return 'completed'
+    if failed == len(file_states):
+        return 'failed'
+    return 'completed_with_errors'
+
+
+def _file_signature(path: Path) -> str:
+    """mtime_ns:size of a file, used to detect changes between a checkpoint and a resume"""
+    stats = path.stat()
+    return f"{stats.st_mtime_ns}:{stats.st_size}"
+
+
+def _update_file(entry_id: int, **fields) -> None:
+    """Commit a state/progress change for one job file"""
+    with get_db_session() as session:
+        entry = session.query(IngestionJobFile).filter(IngestionJobFile.id == entry_id).first()
+        for key, value in fields.items():
+            setattr(entry, key, value)
+        entry.updated_at = datetime.now().isoformat()
+        entry.job.updated_at = entry.updated_at
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import init_db
+
+    init_db()
+    if len(sys.argv) > 2 and sys.argv[1] == "status":
+        print(json.dumps(get_ingestion_job_status(sys.argv[2]), indent=2))
+    else:
+        resumed = resume_incomplete_jobs()
+        print(f"Resumed {len(resumed)} ingestion job(s)")
@@ -0,0 +1,543 @@
+"""
+Jira Ticket Outbox
+Ticket requests are written to the jira_outbox table and answered with a provisional reference;
+a background dispatcher creates them in Jira with bulk API calls, rate limiting and
+exponential-backoff retries, so the user never waits on Jira.
+
+The dispatcher runs in one designated process (jira.outbox.run_dispatcher, overridable with
+the JIRA_OUTBOX_DISPATCHER env var, or the CLI below); other processes only enqueue. Entries
+are claimed with a conditional UPDATE, so even two dispatchers never send the same entry twice.
+Every ticket is sent with an outbox-<reference> label. When a bulk call fails without a
+per-ticket answer (e.g. a read timeout after Jira already created the issues), or a dispatcher
+dies mid-send, the entries are marked 'ambiguous' and reconciled by searching Jira for their
+labels before anything is sent again.
+
+Usage:
+    python -m services.jira_outbox              # run the dispatcher in the foreground
+    python -m services.jira_outbox status REF   # show one outbox entry
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from .config_loader import get_config
+from .database import get_db_session, JiraOutbox
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+PROVISIONAL_PREFIX = "PENDING-"
+OUTBOX_LABEL_PREFIX = "outbox-"
+
+# Entries not yet resolved to 'created' or 'failed'
+OUTSTANDING_STATUSES = ['pending', 'sending', 'ambiguous', 'reconciling']
+
+
+def is_outbox_enabled() -> bool:
+    """Whether create_jira_ticket should queue tickets instead of creating them inline"""
+    return bool(config.get('jira.outbox.enabled', True))
+
+
+def enqueue_ticket(summary: str,
+                   description: str,
+                   issue_type: str,
+                   urgency: str = "medium",
+                   sentiment: str = "neutral",
+                   idempotency_key: Optional[str] = None) -> str:
+    """
+    Queue a ticket for background creation
+
+    Args:
+        summary: Ticket subject
+        description: Ticket description
+        issue_type: service_request, complaint or feature_request
+        urgency: high, medium or low
+        sentiment: positive, neutral or negative
+        idempotency_key: Key identifying this ticket request; a repeat returns the existing entry
+
+    Returns:
+        Provisional ticket reference (resolve it with get_ticket_status)
+    """
+    from .jira_tool import JiraTool
+
+    if idempotency_key:
+        existing = _find_by_idempotency_key(idempotency_key)
+        if existing:
+            logger.info(f"Jira ticket request already queued as {existing}")
+            return existing
+
+    outbox_id = f"{PROVISIONAL_PREFIX}{uuid.uuid4().hex[:12].upper()}"
+    now = datetime.now()
+
+    try:
+        with get_db_session() as session:
+            session.add(JiraOutbox(
+                outbox_id=outbox_id,
+                fields=JiraTool.build_issue_fields(summary, description, issue_type, urgency, sentiment),
+                status='pending',
+                attempts=0,
+                next_attempt_at=now,
+                idempotency_key=idempotency_key,
+                created_at=now,
+                updated_at=now
+            ))
+    except IntegrityError:
+        # A concurrent request with the same key got in first
+        existing = _find_by_idempotency_key(idempotency_key) if idempotency_key else None
+        if not existing:
+            raise
+        return existing
+
+    # Only nudges a dispatcher running in this process; others pick the entry up on their next poll
+    if _dispatcher is not None:
+        _dispatcher.wake()
+    logger.info(f"Queued Jira ticket {outbox_id}: {summary[:80]}")
+    return outbox_id
+
+
+def get_ticket_status(outbox_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a queued ticket
+
+    Args:
+        outbox_id: Provisional reference returned by enqueue_ticket
+
+    Returns:
+        Dictionary with outbox_id, status, issue_key, attempts and last_error, or None if unknown
+    """
+    with get_db_session() as session:
+        entry = session.query(JiraOutbox).filter(JiraOutbox.outbox_id == outbox_id).first()
+        if not entry:
+            return None
+        return {
+            "outbox_id": entry.outbox_id,
+            "status": entry.status,
+            "issue_key": entry.issue_key,
+            "attempts": entry.attempts,
+            "last_error": entry.last_error,
+            "created_at": entry.created_at,
+            "updated_at": entry.updated_at
+        }
+
+
+def outbox_label(outbox_id: str) -> str:
+    """Jira label that ties a created issue back to its outbox entry"""
+    return f"{OUTBOX_LABEL_PREFIX}{outbox_id}"
+
+
+def _find_by_idempotency_key(idempotency_key: str) -> Optional[str]:
+    with get_db_session() as session:
+        row = session.query(JiraOutbox.outbox_id).filter(JiraOutbox.idempotency_key == idempotency_key).first()
+        return row[0] if row else None
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(float(rate), 0.001)
+        self.capacity = float(burst or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class OutboxDispatcher:
+    """
+    Background thread draining the jira_outbox table.
+
+    Each cycle first reconciles 'ambiguous' entries, then claims up to batch_size due entries,
+    creates them with one bulk Jira call, and records the issue key or schedules a retry
+    (exponential backoff with jitter). An entry is claimed by a conditional UPDATE
+    (status 'pending' -> 'sending', 'ambiguous' -> 'reconciling'), so concurrent dispatchers
+    never claim the same entry.
+
+    If the bulk call raises, Jira may have created some or all of the issues, so the batch is
+    marked 'ambiguous' instead of being retried. Reconciling searches Jira for the entries'
+    outbox labels: found entries are recorded as created, the rest go back to 'pending'.
+    Entries left in 'sending' or 'reconciling' longer than lease_seconds (e.g. by a crash) are
+    reclaimed as 'ambiguous'; the lease must exceed the time a bulk call can take.
+    """
+
+    def __init__(self,
+                 batch_size: int = 50,
+                 poll_interval_seconds: float = 1.0,
+                 max_attempts: int = 5,
+                 backoff_base_seconds: float = 2,
+                 backoff_max_seconds: float = 300,
+                 rate_limit_per_second: float = 5,
+                 lease_seconds: float = 300):
+        """
+        Initialize the dispatcher (call start() to run it)
+
+        Args:
+            batch_size: Maximum tickets per bulk create call
+            poll_interval_seconds: Idle wait between polls
+            max_attempts: Attempts before an entry is marked failed
+            backoff_base_seconds: First retry delay; doubled per attempt
+            backoff_max_seconds: Upper bound for the retry delay
+            rate_limit_per_second: Jira API calls per second
+            lease_seconds: How long an entry may stay 'sending' before it is reclaimed
+        """
+        self.batch_size = max(int(batch_size), 1)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.rate_limiter = RateLimiter(rate_limit_per_second)
+        self.lease_seconds = lease_seconds
+        self._last_reclaim = 0.0
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"created": 0, "retried": 0, "failed": 0, "ambiguous": 0, "reconciled": 0, "api_calls": 0}
+        self._stats_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the background thread (it uses the session routing of the calling context)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name="jira-outbox", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the background thread after the current batch"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self) -> None:
+        """Process new entries now instead of at the next poll"""
+        self._wake.set()
+
+    def drain(self, timeout: float = 60.0) -> bool:
+        """
+        Wait until no entry is outstanding (pending, sending or being reconciled)
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the outbox drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with get_db_session() as session:
+                outstanding = session.query(JiraOutbox).filter(
+                    JiraOutbox.status.in_(OUTSTANDING_STATUSES)
+                ).count()
+            if not outstanding:
+                return True
+            self.wake()
+            time.sleep(0.05)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Dispatcher counters (created, retried, failed, ambiguous, reconciled, api_calls)"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def dispatch_once(self) -> int:
+        """
+        Reconcile ambiguous entries, then claim and send one batch of due entries
+
+        Returns:
+            Number of entries processed
+        """
+        from .jira_tool import JiraTool, CircuitOpenError, JiraNotConfiguredError
+
+        # Leave entries pending while the breaker is open rather than spending their attempts
+        if not JiraTool().breaker.is_call_permitted():
+            return 0
+
+        processed = self._reconcile_ambiguous()
+
+        batch = self._claim_batch()
+        if not batch:
+            return processed
+
+        self.rate_limiter.acquire()
+        with self._stats_lock:
+            self._stats["api_calls"] += 1
+        try:
+            results = JiraTool().create_tickets_bulk([
+                self._labelled_fields(outbox_id, fields) for outbox_id, fields, _ in batch
+            ])
+        except (CircuitOpenError, JiraNotConfiguredError) as e:
+            # Raised before anything was sent, so nothing can have been created
+            logger.warning(f"Jira bulk create not sent for {len(batch)} ticket(s): {e}")
+            results = [{"key": None, "error": str(e)}] * len(batch)
+        except Exception as e:
+            # Jira may have created some of the issues (e.g. read timeout): don't re-send blindly
+            logger.warning(f"Jira bulk create failed for {len(batch)} ticket(s), reconciling before retrying: {e}")
+            self._mark_ambiguous(batch, str(e))
+            return processed + len(batch)
+
+        self._record_results(batch, results)
+        return processed + len(batch)
+
+    # ========== INTERNALS ==========
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._last_reclaim >= min(self.lease_seconds, 60):
+                    self._reclaim_interrupted()
+                processed = self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Jira outbox dispatch error: {e}")
+                processed = 0
+
+            if processed < self.batch_size:
+                self._wake.wait(self.poll_interval_seconds)
+                self._wake.clear()
+
+    def _claim_batch(self, from_status: str = 'pending', to_status: str = 'sending') -> List[tuple]:
+        """
+        Claim up to batch_size due entries and return (outbox_id, fields, attempts)
+
+        Each candidate is claimed with UPDATE ... WHERE status = from_status; only rows that
+        update actually changed are returned, so an entry claimed concurrently by another
+        dispatcher is skipped. On PostgreSQL the candidate scan also skips locked rows.
+        """
+        now = datetime.now()
+        with get_db_session() as session:
+            candidates = (
+                session.query(JiraOutbox.outbox_id, JiraOutbox.fields, JiraOutbox.attempts)
+                .filter(JiraOutbox.status == from_status, JiraOutbox.next_attempt_at <= now)
+                .order_by(JiraOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)  # Not rendered on SQLite
+                .all()
+            )
+            batch = []
+            for outbox_id, fields, attempts in candidates:
+                claimed = (
+                    session.query(JiraOutbox)
+                    .filter(JiraOutbox.outbox_id == outbox_id, JiraOutbox.status == from_status)
+                    .update({"status": to_status, "updated_at": now}, synchronize_session=False)
+                )
+                if claimed == 1:
+                    batch.append((outbox_id, fields, attempts))
+        return batch
+
+    def _record_results(self, batch: List[tuple], results: List[dict]) -> None:
+        now = datetime.now()
+        created = retried = failed = 0
+        with get_db_session() as session:
+            for (outbox_id, _, attempts), result in zip(batch, results):
+                entry = session.query(JiraOutbox).filter(JiraOutbox.outbox_id == outbox_id).first()
+                entry.attempts = attempts + 1
+                entry.updated_at = now
+                if result.get("key"):
+                    entry.status = 'created'
+                    entry.issue_key = result["key"]
+                    entry.last_error = None
+                    created += 1
+                elif entry.attempts >= self.max_attempts:
+                    entry.status = 'failed'
+                    entry.last_error = result.get("error")
+                    failed += 1
+                    logger.error(f"Jira ticket {outbox_id} failed after {entry.attempts} attempts: {entry.last_error}")
+                else:
+                    entry.status = 'pending'
+                    entry.last_error = result.get("error")
+                    entry.next_attempt_at = now + timedelta(seconds=self._backoff(entry.attempts))
+                    retried += 1
+
+        with self._stats_lock:
+            self._stats["created"] += created
+            self._stats["retried"] += retried
+            self._stats["failed"] += failed
+        logger.info(f"Jira outbox batch: {created} created, {retried} retrying, {failed} failed")
+
+    @staticmethod
+    def _labelled_fields(outbox_id: str, fields: dict) -> dict:
+        """Issue fields with the entry's outbox label added, so the issue can be found again"""
+        return {**fields, "labels": list(fields.get("labels") or []) + [outbox_label(outbox_id)]}
+
+    def _mark_ambiguous(self, batch: List[tuple], error: str) -> None:
+        """Charge an attempt and park entries whose send outcome is unknown until they are reconciled"""
+        now = datetime.now()
+        with get_db_session() as session:
+            for outbox_id, _, attempts in batch:
+                entry = session.query(JiraOutbox).filter(JiraOutbox.outbox_id == outbox_id).first()
+                entry.attempts = attempts + 1
+                entry.status = 'ambiguous'
+                entry.last_error = error
+                entry.updated_at = now
+                entry.next_attempt_at = now + timedelta(seconds=self._backoff(entry.attempts))
+        with self._stats_lock:
+            self._stats["ambiguous"] += len(batch)
+
+    def _reconcile_ambiguous(self) -> int:
+        """
+        Resolve due 'ambiguous' entries by searching Jira for their outbox labels
+
+        Returns:
+            Number of entries reconciled
+        """
+        from .jira_tool import JiraTool
+
+        batch = self._claim_batch(from_status='ambiguous', to_status='reconciling')
+        if not batch:
+            return 0
+
+        self.rate_limiter.acquire()
+        with self._stats_lock:
+            self._stats["api_calls"] += 1
+        try:
+            found = JiraTool().find_issues_by_labels([outbox_label(outbox_id) for outbox_id, _, _ in batch])
+        except Exception as e:
+            logger.warning(f"Jira outbox reconcile failed for {len(batch)} ticket(s), will retry: {e}")
+            self._mark_ambiguous(batch, f"Reconcile failed: {e}")
+            return len(batch)
+
+        now = datetime.now()
+        created = retried = failed = 0
+        with get_db_session() as session:
+            for outbox_id, _, attempts in batch:
+                entry = session.query(JiraOutbox).filter(JiraOutbox.outbox_id == outbox_id).first()
+                entry.updated_at = now
+                issue_key = found.get(outbox_label(outbox_id))
+                if issue_key:
+                    entry.status = 'created'
+                    entry.issue_key = issue_key
+                    entry.last_error = None
+                    created += 1
+                elif attempts >= self.max_attempts:
+                    entry.status = 'failed'
+                    failed += 1
+                    logger.error(f"Jira ticket {outbox_id} failed after {attempts} attempts: {entry.last_error}")
+                else:
+                    # Known not to exist; its backoff already elapsed while it was ambiguous
+                    entry.status = 'pending'
+                    entry.next_attempt_at = now
+                    retried += 1
+
+        with self._stats_lock:
+            self._stats["created"] += created
+            self._stats["retried"] += retried
+            self._stats["failed"] += failed
+            self._stats["reconciled"] += len(batch)
+        logger.info(f"Jira outbox reconcile: {created} already created, {retried} re-queued, {failed} failed")
+        return len(batch)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base_seconds * (2 ** (attempts - 1)), self.backoff_max_seconds)
+        return delay * random.uniform(0.5, 1.0)  # Jitter so retries don't synchronise
+
+    def _reclaim_interrupted(self) -> None:
+        """Mark entries whose 'sending'/'reconciling' lease expired (their dispatcher died) ambiguous"""
+        now = datetime.now()
+        self._last_reclaim = time.monotonic()
+        with get_db_session() as session:
+            # The dead dispatcher may have created the issues, so reconcile before re-sending
+            reclaimed = (
+                session.query(JiraOutbox)
+                .filter(
+                    JiraOutbox.status.in_(['sending', 'reconciling']),
+                    JiraOutbox.updated_at <= now - timedelta(seconds=self.lease_seconds)
+                )
+                .update({"status": 'ambiguous', "next_attempt_at": now, "updated_at": now}, synchronize_session=False)
+            )
+        if reclaimed:
+            logger.info(f"Marked {reclaimed} Jira outbox entr(ies) interrupted mid-call as ambiguous")
+
+
+_dispatcher: Optional[OutboxDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def is_dispatcher_process() -> bool:
+    """Whether this process is designated to run the outbox dispatcher (JIRA_OUTBOX_DISPATCHER, then config)"""
+    override = os.environ.get("JIRA_OUTBOX_DISPATCHER")
+    if override is not None:
+        return override.strip().lower() in ("1", "true", "yes")
+    return bool(config.get('jira.outbox.run_dispatcher', True))
+
+
+def start_outbox_dispatcher() -> Optional[OutboxDispatcher]:
+    """
+    Start the shared dispatcher at application startup, if this is the designated process
+
+    Returns:
+        The running OutboxDispatcher, or None if the outbox is disabled or another process dispatches
+    """
+    if not is_outbox_enabled() or not is_dispatcher_process():
+        return None
+    return get_outbox_dispatcher(start=True)
+
+
+def get_outbox_dispatcher(start: bool = True) -> OutboxDispatcher:
+    """
+    Get the shared dispatcher configured from jira.outbox, starting it on first use
+
+    Args:
+        start: Start the background thread if it isn't running (regardless of designation)
+
+    Returns:
+        OutboxDispatcher instance
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            outbox_config = config.get('jira.outbox', {}) or {}
+            _dispatcher = OutboxDispatcher(
+                batch_size=outbox_config.get('batch_size', 50),
+                poll_interval_seconds=outbox_config.get('poll_interval_seconds', 1.0),
+                max_attempts=outbox_config.get('max_attempts', 5),
+                backoff_base_seconds=outbox_config.get('backoff_base_seconds', 2),
+                backoff_max_seconds=outbox_config.get('backoff_max_seconds', 300),
+                rate_limit_per_second=outbox_config.get('rate_limit_per_second', 5),
+                lease_seconds=outbox_config.get('lease_seconds', 300)
+            )
+        if start:
+            _dispatcher.start()
+    return _dispatcher
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    from .database import init_db
+
+    init_db()
+    if len(sys.argv) > 2 and sys.argv[1] == "status":
+        print(json.dumps(get_ticket_status(sys.argv[2]), indent=2, default=str))
+    else:
+        dispatcher = get_outbox_dispatcher()
+        print("Jira outbox dispatcher running (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(5)
+                print(dispatcher.stats())
+        except KeyboardInterrupt:
+            dispatcher.stop()
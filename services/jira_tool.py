@@ -1,12 +1,117 @@
-from jira import JIRA
+"""
+Jira Tool
+Lazily connected Jira client. The connection is only opened on the first Jira call, over a
+pooled keep-alive session with explicit connect/read timeouts. Calls go through a circuit
+breaker: while Jira is failing, ticket creation fails over to the outbox instead of blocking
+the tool call. Latency is recorded per operation (see metrics()).
+"""
+
 import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
 from dotenv import load_dotenv
-from typing import List, Optional
+from jira import JIRA, JIRAError
+from requests.adapters import HTTPAdapter
+
+from .config_loader import get_config
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+REQUIRED_ENV_VARS = ("JIRA_URL", "JIRA_EMAIL", "JIRA_API_TOKEN", "JIRA_PROJECT_KEY")
+
+
+class JiraNotConfiguredError(RuntimeError):
+    """Raised when the Jira environment variables are missing"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Jira while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls are rejected
+    for reset_timeout_seconds; then a single trial call is let through (half-open), which
+    closes the circuit on success or re-opens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout_seconds: Time the circuit stays open before a trial call
+        """
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def is_call_permitted(self) -> bool:
+        """Whether allow() would let a call through, without claiming the half-open trial"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at >= self.reset_timeout_seconds
+            return not self._trial_in_flight
+
+    def allow(self) -> bool:
+        """Claim permission for one call"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Jira circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Jira circuit breaker opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
 
 class JiraTool:
     _instance: Optional['JiraTool'] = None
-    _jira_client: Optional[JIRA] = None
-    _project_key: Optional[str] = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -15,46 +120,246 @@ class JiraTool:
         return cls._instance
 
     def _initialize(self):
-        """Initialize JIRA client connection"""
-        load_dotenv()
-        host = os.environ.get("JIRA_URL")
-        api_token = os.environ.get("JIRA_API_TOKEN")
-        self._project_key = os.environ.get("JIRA_PROJECT_KEY")
-        email = os.environ.get("JIRA_EMAIL")
-
-        self._jira_client = JIRA(
-            server=host,
-            basic_auth=(email, api_token)
+        """Read settings only; the Jira connection is opened on first use"""
+        jira_config = config.get('jira', {}) or {}
+        breaker_config = jira_config.get('circuit_breaker', {}) or {}
+
+        self._jira_client: Optional[JIRA] = None
+        self._project_key: Optional[str] = None
+        self._client_lock = threading.Lock()
+        self._connect_timeout = jira_config.get('connect_timeout_seconds', 3)
+        self._read_timeout = jira_config.get('read_timeout_seconds', 10)
+        self._max_retries = jira_config.get('max_retries', 0)
+        self._pool_connections = jira_config.get('pool_connections', 4)
+        self._pool_maxsize = jira_config.get('pool_maxsize', 10)
+        self.breaker = CircuitBreaker(
+            failure_threshold=breaker_config.get('failure_threshold', 5),
+            reset_timeout_seconds=breaker_config.get('reset_timeout_seconds', 30)
         )
-        
-        server_info = self._jira_client.server_info()
-        print("Connected to Jira: ", server_info['baseUrl'])
 
-    def create_ticket(self, summary: str, description: str, intent: str, urgency: str, sentiment: str) -> str:
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._metrics_window = jira_config.get('metrics_window', 500)
+        self._metrics_lock = threading.Lock()
+
+    def _get_client(self) -> JIRA:
+        """Connect on first use; raises JiraNotConfiguredError if the Jira env vars are missing"""
+        if self._jira_client is not None:
+            return self._jira_client
+
+        with self._client_lock:
+            if self._jira_client is None:
+                load_dotenv()
+                missing = [name for name in REQUIRED_ENV_VARS if not os.environ.get(name)]
+                if missing:
+                    raise JiraNotConfiguredError(f"Jira client not configured, missing: {', '.join(missing)}")
+
+                client = JIRA(
+                    server=os.environ["JIRA_URL"],
+                    basic_auth=(os.environ["JIRA_EMAIL"], os.environ["JIRA_API_TOKEN"]),
+                    timeout=(self._connect_timeout, self._read_timeout),
+                    max_retries=self._max_retries,
+                    get_server_info=False  # Skip the serverInfo round-trip on connect
+                )
+                # Keep-alive pool sized for the dispatcher and concurrent tool calls
+                adapter = HTTPAdapter(pool_connections=self._pool_connections, pool_maxsize=self._pool_maxsize)
+                client._session.mount("https://", adapter)
+                client._session.mount("http://", adapter)
+
+                self._project_key = os.environ["JIRA_PROJECT_KEY"]
+                self._jira_client = client
+                logger.info(f"Jira client ready for {os.environ['JIRA_URL']}")
+        return self._jira_client
+
+    def _call(self, operation: str, fn: Callable[[JIRA], Any]) -> Any:
+        """Run one Jira call through the circuit breaker, recording its latency"""
+        client = self._get_client()
+        if not self.breaker.allow():
+            self._record(operation, None, error=True)
+            raise CircuitOpenError("Jira circuit breaker is open")
+
+        started = time.perf_counter()
+        try:
+            result = fn(client)
+        except Exception as e:
+            self._record(operation, time.perf_counter() - started, error=True)
+            if self._is_outage(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # Jira answered; the request itself was rejected
+            raise
+        self._record(operation, time.perf_counter() - started, error=False)
+        self.breaker.record_success()
+        return result
+
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """Connection errors, timeouts, 5xx and 429 count against the breaker; other 4xx do not"""
+        if isinstance(error, JIRAError) and error.status_code is not None:
+            return error.status_code >= 500 or error.status_code == 429
+        return True
+
+    def create_ticket(self, summary: str, description: str, intent: str, urgency: str, sentiment: str,
+                      idempotency_key: Optional[str] = None) -> str:
         """Creates a jira ticket for service request, complaints and feature request.
-            Args: 
+            Args:
                 summary: this would be the subject of the ticket. Keep it short and self-defining
                 description: description should contain all the necessary details to help the associates resolve the issue
                 intent (one of): service_request, complaints or feature_request
                 urgency (one of): high (if told critical or urgent), medium (default for complaint and service_request), low (else)
                 sentiment (one of): positive (on receiving good remark), neutral (default), negative (if user expresses bad experience)
-            returns: ticket id as string if success. None if failed to create ticket.
+                idempotency_key: dedupes the outbox entry if the ticket is failed over to the outbox
+            returns: ticket id as string if success, a provisional outbox reference if Jira is unavailable,
+                or an error message if the ticket could not be created or queued.
         """
-        if not self._jira_client or not self._project_key:
-            return "Jira client not initialized properly"
-        
-        issue_data = {
-            "project": {"key": self._project_key},
+        fields = self.build_issue_fields(summary, description, intent, urgency, sentiment)
+        try:
+            new_issue = self._call(
+                "create_issue",
+                lambda client: client.create_issue(fields={"project": {"key": self._project_key}, **fields})
+            )
+            logger.info(f"Jira issue created: {new_issue.key}")
+            return new_issue.key
+        except JiraNotConfiguredError as e:
+            logger.error(f"Failed to create issue: {e}")
+            return f"Failed to create issue: {str(e)}"
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError) and not self._is_outage(e):
+                logger.error(f"Failed to create issue: {e}")
+                return f"Failed to create issue: {str(e)}"
+            error = e
+
+        # Jira is down or the breaker is open: queue the ticket instead of failing the tool call
+        from .jira_outbox import enqueue_ticket
+        logger.warning(f"Jira unavailable ({error}), queueing ticket in the outbox")
+        try:
+            return enqueue_ticket(summary, description, intent, urgency, sentiment, idempotency_key=idempotency_key)
+        except Exception as e:
+            logger.error(f"Failed to queue issue: {e}")
+            return f"Failed to create issue: {str(error)}"
+
+    @staticmethod
+    def build_issue_fields(summary: str, description: str, intent: str, urgency: str, sentiment: str) -> dict:
+        """Jira issue fields for a ticket (project is added from JIRA_PROJECT_KEY when sent)"""
+        return {
             "summary": summary,
             "description": description,
             "issuetype": {"name": "Story"},
             "labels": [intent, urgency, sentiment]
         }
+
+    def create_tickets_bulk(self, issue_fields: List[dict]) -> List[dict]:
+        """Creates several tickets with one bulk API call.
+            Args:
+                issue_fields: list of issue field dicts from build_issue_fields
+            returns: one dict per input, in order, with 'key' (issue key or None) and 'error' (None on success)
+            raises: JiraNotConfiguredError if Jira is not configured, CircuitOpenError while the breaker is open
+        """
+        if not issue_fields:
+            return []
+
+        # prefetch=False skips the GET per created issue; only the keys are needed
+        results = self._call(
+            "create_issues",
+            lambda client: client.create_issues(
+                field_list=[{"project": {"key": self._project_key}, **fields} for fields in issue_fields],
+                prefetch=False
+            )
+        )
+        return [
+            {
+                "key": result["issue"].key if result.get("status") == "Success" and result.get("issue") else None,
+                "error": None if result.get("status") == "Success" else str(result.get("error"))
+            }
+            for result in results
+        ]
+
+    def find_issues_by_labels(self, labels: List[str]) -> Dict[str, str]:
+        """Finds issues carrying any of the given labels with one JQL search.
+            Args:
+                labels: labels to look for (e.g. the outbox labels of a batch whose outcome is unknown)
+            returns: mapping of label to the key of an issue carrying it; labels with no issue are absent
+            raises: JiraNotConfiguredError if Jira is not configured, CircuitOpenError while the breaker is open
+        """
+        if not labels:
+            return {}
+
+        wanted = set(labels)
+        quoted = ", ".join(f'"{label}"' for label in labels)
+        issues = self._call(
+            "search_issues",
+            lambda client: client.search_issues(
+                f'project = "{self._project_key}" AND labels in ({quoted})',
+                maxResults=len(labels) * 2,
+                fields="labels",
+                json_result=True
+            )
+        )
+        found = {}
+        for issue in issues.get("issues", []):
+            for label in (issue.get("fields") or {}).get("labels") or []:
+                if label in wanted:
+                    found.setdefault(label, issue["key"])
+        return found
+
+    def health_check(self) -> Dict[str, Any]:
+        """
+        Probe Jira with a serverInfo call
+
+        Returns:
+            Dictionary with status ('ok', 'unconfigured', 'circuit_open' or 'error'),
+            breaker state, latency_ms and the server version or error
+        """
+        started = time.perf_counter()
         try:
-            new_issue = self._jira_client.create_issue(fields=issue_data)
-            print("Issue created successfully! with issue key:", new_issue.key)
-            return new_issue.key
+            info = self._call("server_info", lambda client: client.server_info())
+            status, detail = "ok", {"version": info.get("version"), "base_url": info.get("baseUrl")}
+        except CircuitOpenError as e:
+            status, detail = "circuit_open", {"error": str(e)}
+        except JiraNotConfiguredError as e:
+            status, detail = "unconfigured", {"error": str(e)}
         except Exception as e:
-            print("Failed to create issue:", str(e))
-            return f"Failed to create issue: {str(e)}"
+            status, detail = "error", {"error": str(e)}
+        return {
+            "status": status,
+            "breaker": self.breaker.state,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            **detail
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Per-operation call metrics over the most recent calls
+
+        Returns:
+            Mapping of operation to calls, errors, avg_ms, p50_ms, p95_ms and max_ms, plus breaker state
+        """
+        with self._metrics_lock:
+            snapshot = {op: (sorted(values), dict(self._counters[op])) for op, values in self._latencies.items()}
+
+        result: Dict[str, Any] = {"breaker": self.breaker.state}
+        for op, (values, counters) in snapshot.items():
+            stats = dict(counters)
+            if values:
+                stats.update({
+                    "avg_ms": round(sum(values) / len(values) * 1000, 2),
+                    "p50_ms": round(values[len(values) // 2] * 1000, 2),
+                    "p95_ms": round(values[max(int(len(values) * 0.95) - 1, 0)] * 1000, 2),
+                    "max_ms": round(values[-1] * 1000, 2)
+                })
+            result[op] = stats
+        return result
 
+    def _record(self, operation: str, elapsed: Optional[float], error: bool) -> None:
+        with self._metrics_lock:
+            if operation not in self._latencies:
+                self._latencies[operation] = deque(maxlen=self._metrics_window)
+                self._counters[operation] = {"calls": 0, "errors": 0, "rejected": 0}
+            counters = self._counters[operation]
+            if elapsed is None:
+                counters["rejected"] += 1
+                return
+            counters["calls"] += 1
+            if error:
+                counters["errors"] += 1
+            self._latencies[operation].append(elapsed)
@@ -0,0 +1,214 @@
+"""
+KB File Registry
+File-level metadata for ingested documents, stored once per file in SQLite and referenced
+from each chunk by file_id instead of being repeated on every chunk in ChromaDB.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .database import get_db_session, KBFile
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+
+# Fields kept on the file record and merged back into chunk metadata for scoring
+FILE_LEVEL_FIELDS = (
+    "source", "filename", "file_extension", "file_size_bytes", "document_type",
+    "ingestion_timestamp", "file_modified_timestamp", "file_created_timestamp",
+)
+
+# Small in-process cache so retrieval scoring doesn't hit SQLite for every query
+_CACHE_TTL_SECONDS = 300
+_CACHE_MAX_ENTRIES = 2048
+_record_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def make_file_id(source: str, tenant_id: str) -> str:
+    """
+    Deterministic id for a tenant's copy of a source file
+
+    Args:
+        source: Source path of the file
+        tenant_id: Tenant the file was ingested for
+
+    Returns:
+        Hex digest identifying the file record
+    """
+    return hashlib.sha256(f"{tenant_id}:{source}".encode('utf-8')).hexdigest()[:32]
+
+
+def create_file_record(file_path: Path,
+                       tenant_id: str = "default",
+                       access_roles: Optional[List[str]] = None,
+                       document_visibility: str = "Public",
+                       document_type: Optional[str] = None,
+                       total_chunks: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Build the file-level metadata record, calling stat() once per file
+
+    Args:
+        file_path: Path to the source file
+        tenant_id: Unique identifier for tenant
+        access_roles: Roles that can access the document (default: ["customer"])
+        document_visibility: Document visibility level
+        document_type: Document type used for quality scoring
+        total_chunks: Number of chunks the file was split into
+
+    Returns:
+        dict: File record, including its file_id
+    """
+    file_path = Path(file_path)
+    file_stats = file_path.stat()
+    source = str(file_path)
+
+    return {
+        "file_id": make_file_id(source, tenant_id),
+        "source": source,
+        "filename": file_path.name,
+        "file_extension": file_path.suffix.lower(),
+        "file_size_bytes": file_stats.st_size,
+        "document_type": document_type,
+        "tenant_id": tenant_id,
+        "document_visibility": document_visibility,
+        "access_roles": access_roles or ["customer"],
+        "total_chunks": total_chunks,
+        "ingestion_timestamp": datetime.now().isoformat(),
+        "file_modified_timestamp": datetime.fromtimestamp(file_stats.st_mtime).isoformat(),
+        "file_created_timestamp": datetime.fromtimestamp(file_stats.st_ctime).isoformat(),
+    }
+
+
+def save_file_record(record: Dict[str, Any]) -> str:
+    """
+    Insert or update a file record
+
+    Args:
+        record: File record as returned by create_file_record
+
+    Returns:
+        file_id of the saved record
+    """
+    row = dict(record)
+    row["access_roles"] = json.dumps(row.get("access_roles") or [])
+
+    with get_db_session() as session:
+        session.merge(KBFile(**row))
+
+    _invalidate(record["file_id"])
+    return record["file_id"]
+
+
+def delete_file_records(source: str, tenant_id: Optional[str] = None) -> int:
+    """
+    Delete the file record(s) for a source
+
+    Args:
+        source: Source path of the file
+        tenant_id: Restrict deletion to one tenant (None for all tenants)
+
+    Returns:
+        Number of records deleted
+    """
+    with get_db_session() as session:
+        query = session.query(KBFile).filter(KBFile.source == str(source))
+        if tenant_id is not None:
+            query = query.filter(KBFile.tenant_id == tenant_id)
+        file_ids = [row.file_id for row in query.all()]
+        if file_ids:
+            session.query(KBFile).filter(KBFile.file_id.in_(file_ids)).delete(synchronize_session=False)
+
+    for file_id in file_ids:
+        _invalidate(file_id)
+    return len(file_ids)
+
+
+def get_file_records(file_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch file records for a set of file ids, using one query for all cache misses
+
+    Args:
+        file_ids: File ids referenced by retrieved chunks
+
+    Returns:
+        Mapping of file_id to file record (missing ids are omitted)
+    """
+    wanted = {file_id for file_id in file_ids if file_id}
+    if not wanted:
+        return {}
+
+    now = time.monotonic()
+    records = {}
+    with _cache_lock:
+        for file_id in wanted:
+            cached = _record_cache.get(file_id)
+            if cached and now - cached[1] < _CACHE_TTL_SECONDS:
+                records[file_id] = cached[0]
+
+    missing = wanted - records.keys()
+    if missing:
+        try:
+            with get_db_session() as session:
+                rows = session.query(KBFile).filter(KBFile.file_id.in_(missing)).all()
+                loaded = {row.file_id: _row_to_dict(row) for row in rows}
+        except Exception as e:
+            logger.warning(f"Could not load KB file records: {e}")
+            loaded = {}
+
+        with _cache_lock:
+            if len(_record_cache) + len(loaded) > _CACHE_MAX_ENTRIES:
+                _record_cache.clear()
+            for file_id, record in loaded.items():
+                _record_cache[file_id] = (record, now)
+        records.update(loaded)
+
+    return records
+
+
+def expand_chunk_metadata(metadata: Dict[str, Any], file_record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Rebuild the full scoring view of a chunk from its compact metadata and file record
+
+    Chunks ingested before file records existed already carry every field, so values
+    present on the chunk always win.
+
+    Args:
+        metadata: Chunk metadata as stored in ChromaDB
+        file_record: File record for the chunk's file_id, if any
+
+    Returns:
+        dict: Metadata with file-level and derived per-chunk fields filled in
+    """
+    expanded = {field: file_record.get(field) for field in FILE_LEVEL_FIELDS} if file_record else {}
+    expanded.update(metadata)
+
+    chunk_index = expanded.get('chunk_index', 0)
+    total_chunks = expanded.get('total_chunks', 1)
+    word_count = expanded.get('word_count', 0)
+    char_count = expanded.get('char_count', 0)
+
+    expanded.setdefault('chunk_position_ratio', chunk_index / max(total_chunks - 1, 1))
+    expanded.setdefault('content_density', word_count / max(char_count, 1))
+    expanded.setdefault('is_first_chunk', chunk_index == 0)
+    expanded.setdefault('is_last_chunk', chunk_index == total_chunks - 1)
+    if expanded.get('page_number') is not None:
+        expanded.setdefault('is_first_page', expanded['page_number'] == 1)
+
+    return expanded
+
+
+def _row_to_dict(row: KBFile) -> Dict[str, Any]:
+    record = {column.name: getattr(row, column.name) for column in KBFile.__table__.columns}
+    record["access_roles"] = json.loads(row.access_roles) if row.access_roles else []
+    return record
+
+
+def _invalidate(file_id: str) -> None:
+    with _cache_lock:
+        _record_cache.pop(file_id, None)
@@ -0,0 +1,339 @@
+"""
+Knowledge Base Directory Watcher
+Monitors per-tenant KB folders and incrementally re-ingests new, modified and removed files
+in the background, so nobody has to run data_ingestion.py by hand.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config_loader import get_config
+from .data_ingestion import get_supported_extensions, delete_document_by_source, replace_document_by_source
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+# Sentinel pushed on the work queue to stop the worker thread
+_STOP = object()
+
+
+class WatchedFolder:
+    """A KB folder together with the tenant/RBAC settings used when ingesting its files"""
+
+    def __init__(self, path: str, tenant_id: str, access_roles: Optional[List[str]] = None,
+                 document_visibility: str = "Public"):
+        self.path = Path(path)
+        self.tenant_id = tenant_id
+        self.access_roles = access_roles or ["customer"]
+        self.document_visibility = document_visibility
+
+    def __repr__(self):
+        return f"<WatchedFolder(path='{self.path}', tenant_id='{self.tenant_id}')>"
+
+
+class KBWatcher:
+    """
+    Polling watcher that keeps the vector store in sync with a set of KB folders.
+
+    - A scanner thread snapshots (mtime, size) for every supported file
+    - Changes are debounced: a file is only queued once it has been stable for debounce_seconds
+    - A single worker thread drains the queue and re-ingests only the affected files
+    - Files that fail to ingest are retried with exponential backoff
+    - A folder that is missing or unreadable (e.g. an unmounted volume) is skipped for the
+      scan without removing its files from the index
+
+    Retrieval is never blocked: the scanner and worker run on daemon threads and
+    ChromaDB keeps serving queries while chunks are being replaced.
+    """
+
+    def __init__(self,
+                 folders: List[WatchedFolder],
+                 poll_interval: Optional[float] = None,
+                 debounce_seconds: Optional[float] = None,
+                 state_file: Optional[str] = None):
+        """
+        Initialize the watcher
+
+        Args:
+            folders: Folders to watch with their tenant/RBAC settings
+            poll_interval: Seconds between folder scans (None to use config)
+            debounce_seconds: Quiet period before a changed file is ingested (None to use config)
+            state_file: Path of the JSON snapshot of ingested files (None to use config)
+        """
+        watcher_config = config.get('document_processing.watcher', {}) or {}
+
+        self.folders = folders
+        self.poll_interval = poll_interval if poll_interval is not None else watcher_config.get('poll_interval_seconds', 5)
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else watcher_config.get('debounce_seconds', 10)
+        self.state_file = Path(state_file or watcher_config.get('state_file', 'knowledgeBase/.kb_watcher_state.json'))
+        self.retry_backoff_seconds = watcher_config.get('retry_backoff_seconds', 30)
+        self.max_retry_backoff_seconds = watcher_config.get('max_retry_backoff_seconds', 900)
+        self.supported_extensions = set(get_supported_extensions())
+
+        # path -> (mtime, size) of the last successfully ingested version
+        self._ingested: Dict[str, Tuple[float, int]] = self._load_state()
+        # path -> (signature, first_seen_at) for changes waiting out the debounce window
+        self._pending: Dict[str, Tuple[Tuple[float, int], float]] = {}
+        # Paths currently queued or being processed, so a burst doesn't queue duplicates
+        self._in_flight = set()
+        # path -> (signature, attempts, retry_at) for files whose last ingestion failed
+        self._failures: Dict[str, Tuple[Optional[Tuple[float, int]], int, float]] = {}
+        # Folders whose last scan failed, so the warning is logged once per outage
+        self._unavailable = set()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._state_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._scanner_thread: Optional[threading.Thread] = None
+        self._worker_thread: Optional[threading.Thread] = None
+
+    # ========== LIFECYCLE ==========
+
+    def start(self) -> None:
+        """Start the scanner and worker threads"""
+        if self._scanner_thread and self._scanner_thread.is_alive():
+            logger.warning("KB watcher already running")
+            return
+
+        self._stop_event.clear()
+        self._worker_thread = threading.Thread(target=self._worker_loop, name="kb-watcher-worker", daemon=True)
+        self._scanner_thread = threading.Thread(target=self._scan_loop, name="kb-watcher-scanner", daemon=True)
+        self._worker_thread.start()
+        self._scanner_thread.start()
+        logger.info(f"KB watcher started for {len(self.folders)} folder(s), "
+                    f"poll={self.poll_interval}s, debounce={self.debounce_seconds}s")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop scanning and let the worker finish the file it is currently ingesting"""
+        self._stop_event.set()
+        self._queue.put(_STOP)
+        for thread in (self._scanner_thread, self._worker_thread):
+            if thread:
+                thread.join(timeout)
+        logger.info("KB watcher stopped")
+
+    # ========== SCANNING ==========
+
+    def scan_once(self) -> int:
+        """
+        Scan all folders once and queue files whose debounce window has elapsed
+
+        Returns:
+            Number of files queued for (re-)ingestion or removal
+        """
+        now = time.monotonic()
+        seen = set()
+        unavailable: List[WatchedFolder] = []
+        queued = 0
+
+        for folder in self.folders:
+            try:
+                files = self._list_files(folder)
+            except OSError as e:
+                # Missing or unmounted folder: its files are unknown, not deleted
+                if folder.path not in self._unavailable:
+                    logger.warning(f"Watched folder unavailable, keeping its indexed files: {folder.path} ({e})")
+                    self._unavailable.add(folder.path)
+                unavailable.append(folder)
+                continue
+            if folder.path in self._unavailable:
+                self._unavailable.discard(folder.path)
+                logger.info(f"Watched folder available again: {folder.path}")
+
+            for file_path in files:
+                path_key = str(file_path)
+                seen.add(path_key)
+                try:
+                    stats = file_path.stat()
+                except OSError:
+                    # File vanished between listing and stat - next scan will see the removal
+                    continue
+
+                signature = (stats.st_mtime, stats.st_size)
+                with self._state_lock:
+                    if self._ingested.get(path_key) == signature or path_key in self._in_flight:
+                        self._pending.pop(path_key, None)
+                        continue
+                    if self._backing_off(path_key, signature, now):
+                        continue
+
+                    pending = self._pending.get(path_key)
+                    if pending is None or pending[0] != signature:
+                        # New change (or still being written) - restart the debounce window
+                        self._pending[path_key] = (signature, now)
+                        continue
+                    if now - pending[1] < self.debounce_seconds:
+                        continue
+                    del self._pending[path_key]
+
+                self._enqueue(("upsert", path_key, signature, folder))
+                queued += 1
+
+        # Files we ingested before but that are gone now
+        with self._state_lock:
+            candidates = [
+                path_key for path_key in self._ingested
+                if path_key not in seen and path_key not in self._in_flight
+                and not self._backing_off(path_key, None, now)
+            ]
+        for path_key in candidates:
+            folder = self._folder_for(path_key)
+            if folder is not None and folder not in unavailable:
+                self._enqueue(("delete", path_key, None, folder))
+                queued += 1
+
+        return queued
+
+    def _list_files(self, folder: WatchedFolder) -> List[Path]:
+        """List supported files in a folder; raises OSError if the folder is missing or unreadable"""
+        if not folder.path.is_dir():
+            raise FileNotFoundError(f"not a directory: {folder.path}")
+        return [
+            file_path for file_path in folder.path.rglob('*')
+            if file_path.suffix.lower() in self.supported_extensions and file_path.is_file()
+        ]
+
+    def _backing_off(self, path_key: str, signature: Optional[Tuple[float, int]], now: float) -> bool:
+        """Whether a failed path is still waiting out its retry backoff (caller holds _state_lock)"""
+        failure = self._failures.get(path_key)
+        if failure is None:
+            return False
+        if failure[0] != signature:
+            # The file changed since the failed attempt - try the new version right away
+            del self._failures[path_key]
+            return False
+        return now < failure[2]
+
+    def _scan_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                queued = self.scan_once()
+                if queued:
+                    logger.info(f"KB watcher queued {queued} file(s) for re-indexing")
+            except Exception as e:
+                logger.error(f"KB watcher scan failed: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def _enqueue(self, job: tuple) -> None:
+        with self._state_lock:
+            self._in_flight.add(job[1])
+        self._queue.put(job)
+
+    def _folder_for(self, path_key: str) -> Optional[WatchedFolder]:
+        path = Path(path_key)
+        for folder in self.folders:
+            try:
+                path.relative_to(folder.path)
+                return folder
+            except ValueError:
+                continue
+        return None
+
+    # ========== WORKER ==========
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+
+            action, path_key, signature, folder = job
+            try:
+                if action == "delete":
+                    delete_document_by_source(path_key, tenant_id=folder.tenant_id)
+                    with self._state_lock:
+                        self._ingested.pop(path_key, None)
+                        self._failures.pop(path_key, None)
+                    logger.info(f"KB watcher removed chunks for deleted file: {path_key}")
+                else:
+                    # Replace swaps in the new chunks before dropping the old version's chunks
+                    result = replace_document_by_source(
+                        path_key,
+                        tenant_id=folder.tenant_id,
+                        access_roles=folder.access_roles,
+                        document_visibility=folder.document_visibility
+                    )
+                    if not result["success"]:
+                        self._record_failure(path_key, signature, result['message'])
+                        continue
+                    with self._state_lock:
+                        self._ingested[path_key] = signature
+                        self._failures.pop(path_key, None)
+                    logger.info(f"KB watcher re-indexed: {path_key} (tenant: {folder.tenant_id})")
+                self._save_state()
+            except Exception as e:
+                self._record_failure(path_key, signature, str(e))
+            finally:
+                with self._state_lock:
+                    self._in_flight.discard(path_key)
+
+    def _record_failure(self, path_key: str, signature: Optional[Tuple[float, int]], reason: str) -> None:
+        """Schedule the next attempt for a failed file with exponential backoff"""
+        with self._state_lock:
+            previous = self._failures.get(path_key)
+            attempts = previous[1] + 1 if previous and previous[0] == signature else 1
+            delay = min(self.retry_backoff_seconds * 2 ** (attempts - 1), self.max_retry_backoff_seconds)
+            self._failures[path_key] = (signature, attempts, time.monotonic() + delay)
+        logger.warning(f"KB watcher could not process {path_key} (attempt {attempts}): {reason}. "
+                       f"Retrying in {delay:.0f}s")
+
+    # ========== STATE PERSISTENCE ==========
+
+    def _load_state(self) -> Dict[str, Tuple[float, int]]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            return {path: tuple(signature) for path, signature in raw.items()}
+        except Exception as e:
+            logger.warning(f"Could not read KB watcher state {self.state_file}: {e}. Re-indexing all files.")
+            return {}
+
+    def _save_state(self) -> None:
+        with self._state_lock:
+            snapshot = dict(self._ingested)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.state_file)
+
+
+def load_watched_folders() -> List[WatchedFolder]:
+    """
+    Build watched folders from the document_processing.watcher.folders config
+
+    Returns:
+        List of WatchedFolder objects
+    """
+    folders_config = config.get('document_processing.watcher.folders', []) or []
+    return [
+        WatchedFolder(
+            path=entry['path'],
+            tenant_id=entry.get('tenant_id', 'default'),
+            access_roles=entry.get('access_roles'),
+            document_visibility=entry.get('document_visibility', 'Public')
+        )
+        for entry in folders_config
+        if entry.get('path')
+    ]
+
+
+if __name__ == "__main__":
+    from .database import init_db
+
+    init_db()
+    watcher = KBWatcher(load_watched_folders())
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
@@ -0,0 +1,207 @@
+"""
+Schema Migrations
+Ordered, idempotent schema changes for databases created before a model change, tracked in a
+schema_migrations table. Base.metadata.create_all only creates missing tables, so changes to
+existing tables (new indexes, column types, backfills) are applied here.
+
+Usage:
+    python -m services.migrations            # apply pending migrations
+    python -m services.migrations status     # list applied/pending migrations
+"""
+
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+# ========== MIGRATIONS ==========
+
+def _incident_datetime_columns(conn: Connection) -> None:
+    """Store incident created_at/updated_at as proper DATETIME values"""
+    if conn.dialect.name == 'sqlite':
+        # Rows written with isoformat() use a 'T' separator, which SQLAlchemy's SQLite
+        # DateTime type doesn't parse and which sorts differently from ' '
+        conn.execute(text(
+            "UPDATE incidents SET "
+            "created_at = REPLACE(created_at, 'T', ' '), "
+            "updated_at = REPLACE(updated_at, 'T', ' ') "
+            "WHERE created_at LIKE '%T%' OR updated_at LIKE '%T%'"
+        ))
+    elif conn.dialect.name == 'postgresql':
+        for column in ('created_at', 'updated_at'):
+            if _column_type(conn, 'incidents', column).startswith('VARCHAR'):
+                conn.execute(text(
+                    f"ALTER TABLE incidents ALTER COLUMN {column} "
+                    f"TYPE TIMESTAMP USING {column}::timestamp"
+                ))
+
+
+def _incident_composite_indexes(conn: Connection) -> None:
+    """Composite indexes for tenant-scoped incident queries, replacing the single tenant_id index"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_tenant_status_created "
+        "ON incidents (tenant_id, status, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_tenant_created "
+        "ON incidents (tenant_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_tenant_intent "
+        "ON incidents (tenant_id, intent)"
+    ))
+    # Every tenant_id lookup is served by the composite indexes' leading column
+    conn.execute(text("DROP INDEX IF EXISTS ix_incidents_tenant_id"))
+
+
+def _incident_idempotency_key(conn: Connection) -> None:
+    """idempotency_key column so replayed/retried incident writes are deduplicated"""
+    if not _column_type(conn, 'incidents', 'idempotency_key'):
+        conn.execute(text("ALTER TABLE incidents ADD COLUMN idempotency_key VARCHAR(100)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_incidents_idempotency_key "
+        "ON incidents (idempotency_key)"
+    ))
+
+
+def _incident_json_columns(conn: Connection) -> None:
+    """Native JSON decision columns plus indexed generated columns for hot action_plan fields"""
+    from .database import json_path_expression
+
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        for column in ('policy_refs', 'decision_json'):
+            if _column_type(conn, 'incidents', column) != 'JSONB':
+                conn.execute(text(
+                    f"ALTER TABLE incidents ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb"
+                ))
+    # On SQLite the existing TEXT values are already valid JSON, which is what the JSON type stores
+
+    generated = [
+        ('create_ticket', 'BOOLEAN', ('action_plan', 'create_ticket'), 'boolean'),
+        ('call_refund_api', 'BOOLEAN', ('action_plan', 'call_refund_api'), 'boolean'),
+        ('refund_amount', 'FLOAT', ('action_plan', 'refund_amount'), 'double precision'),
+    ]
+    storage = 'STORED' if dialect == 'postgresql' else 'VIRTUAL'
+    for column, column_type, path, sql_type in generated:
+        if not _column_type(conn, 'incidents', column):
+            expression = json_path_expression('decision_json', path, sql_type, dialect=dialect)
+            conn.execute(text(
+                f"ALTER TABLE incidents ADD COLUMN {column} {column_type} "
+                f"GENERATED ALWAYS AS ({expression}) {storage}"
+            ))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_incidents_create_ticket ON incidents (create_ticket)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_incidents_refund ON incidents (call_refund_api, refund_amount)"
+    ))
+
+
+def _jira_outbox_idempotency_key(conn: Connection) -> None:
+    """idempotency_key column so a repeated ticket request returns the existing outbox entry"""
+    if not _column_type(conn, 'jira_outbox', 'idempotency_key'):
+        conn.execute(text("ALTER TABLE jira_outbox ADD COLUMN idempotency_key VARCHAR(100)"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_jira_outbox_idempotency_key "
+        "ON jira_outbox (idempotency_key)"
+    ))
+
+
+def _ingestion_file_signature(conn: Connection) -> None:
+    """file_signature column so a resumed job can tell whether the file changed since its checkpoint"""
+    if not _column_type(conn, 'ingestion_job_files', 'file_signature'):
+        conn.execute(text("ALTER TABLE ingestion_job_files ADD COLUMN file_signature VARCHAR(100)"))
+
+
+# (version, description, migration) in application order; never reorder or edit applied entries
+MIGRATIONS: List[Tuple[str, str, Callable[[Connection], None]]] = [
+    ("0001", "incident created_at/updated_at as DATETIME", _incident_datetime_columns),
+    ("0002", "composite indexes on incidents (tenant_id, status, created_at / created_at / intent)",
+     _incident_composite_indexes),
+    ("0003", "incidents.idempotency_key with unique index", _incident_idempotency_key),
+    ("0004", "incidents JSON/JSONB decision columns with generated create_ticket/refund columns",
+     _incident_json_columns),
+    ("0005", "jira_outbox.idempotency_key with unique index", _jira_outbox_idempotency_key),
+    ("0006", "ingestion_job_files.file_signature", _ingestion_file_signature),
+]
+
+
+# ========== RUNNER ==========
+
+def run_migrations(bind: Optional[Engine] = None) -> List[str]:
+    """
+    Apply every migration not yet recorded in schema_migrations, each in its own transaction
+
+    Args:
+        bind: Engine to migrate (default: the application engine)
+
+    Returns:
+        Versions applied by this call
+    """
+    if bind is None:
+        from .database import engine as bind
+
+    _ensure_migrations_table(bind)
+    applied = get_applied_versions(bind)
+
+    newly_applied = []
+    for version, description, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        with bind.begin() as conn:
+            migration(conn)
+            conn.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {"version": version, "description": description, "applied_at": datetime.now().isoformat()}
+            )
+        newly_applied.append(version)
+        logger.info(f"Applied schema migration {version}: {description}")
+
+    return newly_applied
+
+
+def get_applied_versions(bind: Engine) -> set:
+    """Versions already recorded in schema_migrations"""
+    _ensure_migrations_table(bind)
+    with bind.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))}
+
+
+def _ensure_migrations_table(bind: Engine) -> None:
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version VARCHAR(20) PRIMARY KEY, "
+            "description VARCHAR(500) NOT NULL, "
+            "applied_at VARCHAR(50) NOT NULL)"
+        ))
+
+
+def _column_type(conn: Connection, table: str, column: str) -> str:
+    for info in inspect(conn).get_columns(table):
+        if info['name'] == column:
+            return str(info['type']).upper()
+    return ""
+
+
+if __name__ == "__main__":
+    import sys
+    from .database import Base, engine
+
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        applied = get_applied_versions(engine)
+        for version, description, _ in MIGRATIONS:
+            print(f"{version}  {'applied' if version in applied else 'pending':8}  {description}")
+    else:
+        Base.metadata.create_all(bind=engine)
+        versions = run_migrations(engine)
+        print(f"Applied {len(versions)} migration(s)" + (f": {', '.join(versions)}" if versions else ""))
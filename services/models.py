@@ -135,8 +135,14 @@ class IncidentUpdate(BaseModel):
 class IncidentInDB(IncidentBase):
     """Incident model as stored in database"""
     incident_id: str
-    created_at: str
-    updated_at: str
+    policy_refs: Optional[List[str]] = None
+    decision_json: Optional[Dict[str, Any]] = None
+    # Generated from decision_json.action_plan
+    create_ticket: Optional[bool] = None
+    call_refund_api: Optional[bool] = None
+    refund_amount: Optional[float] = None
+    created_at: datetime
+    updated_at: datetime
     
     class Config:
         from_attributes = True
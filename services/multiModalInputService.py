@@ -1,14 +1,103 @@
 from .data_ingestion import extract_pdf, extract_txt, extract_docx 
+from .config_loader import get_config
+from .attachment_cache import attachment_cache, hash_bytes, hash_file
 import re
+import atexit
 import base64
+import io
+import math
 import os
 import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-# Image processing helper function
-def process_image_to_base64(image_path: str) -> str:
+from PIL import Image, ImageOps
+
+config = get_config()
+multimodal_config = config.get_section('multimodal')
+image_config = multimodal_config.get('image', {}) or {}
+
+# Dedicated directory for upload temp files, so leftovers can be swept safely
+UPLOAD_TEMP_DIR = Path(tempfile.gettempdir()) / "echopilot_uploads"
+_temp_files = set()
+_temp_files_lock = threading.Lock()
+
+IMAGE_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+# Image.info keys holding EXIF/XMP metadata (ICC colour profiles are not personal data)
+_METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+
+def preprocess_image(image_bytes, mime_type: str, keep_format: bool = False) -> tuple:
     """
-    Convert image file to base64 string for Gemini multi-modal input
+    Downscale and re-encode an image before it is sent to the multimodal LLM
+    Caps the longest side at multimodal.image.max_dimension, re-encodes to
+    multimodal.image.format (or the input's own format if keep_format) at the configured
+    quality and drops EXIF/metadata.
+    Returns: (image bytes as memoryview/bytes, mime type). The original bytes are
+    returned unchanged if preprocessing is disabled or fails, or if the re-encode wouldn't
+    save space and the original carries no EXIF/XMP metadata; otherwise the metadata-stripped
+    re-encode is sent even when it is larger.
+    """
+    if not image_config.get('enabled', True):
+        return image_bytes, mime_type
+    
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # Re-encoding would drop animation frames - keep animated images as they are
+            if getattr(img, 'is_animated', False):
+                return image_bytes, mime_type
+            
+            has_metadata = bool(img.getexif()) or any(key in img.info for key in _METADATA_KEYS)
+            
+            # Apply the EXIF orientation before the EXIF block is discarded
+            img = ImageOps.exif_transpose(img)
+            max_dimension = image_config.get('max_dimension', 1600)
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            
+            output_format = _output_format(mime_type, keep_format)
+            if output_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            
+            # Saving without exif=... strips EXIF and other metadata
+            buffer = io.BytesIO()
+            img.save(buffer, format=output_format, quality=image_config.get('quality', 85), optimize=True)
+    except Exception as e:
+        print(f"Image preprocessing failed, sending original: {str(e)}")
+        return image_bytes, mime_type
+    
+    processed = buffer.getbuffer()
+    original_size = len(image_bytes)
+    if len(processed) >= original_size:
+        if not has_metadata:
+            return image_bytes, mime_type
+        # Larger, but the original would leak EXIF (GPS, device data) to the LLM provider
+        print(f"Image re-encoded to strip metadata: {original_size} -> {len(processed)} bytes")
+        return processed, f"image/{output_format.lower()}"
+    
+    print(f"Image preprocessed: {original_size} -> {len(processed)} bytes "
+          f"(saved {original_size - len(processed)} bytes, {100 * (1 - len(processed) / original_size):.0f}%)")
+    return processed, f"image/{output_format.lower()}"
+
+def _output_format(mime_type: str, keep_format: bool) -> str:
+    """PIL format name to re-encode to: the configured format, or the input's own format"""
+    if keep_format:
+        return mime_type.split('/', 1)[1].upper()
+    return image_config.get('format', 'JPEG').upper()
+
+def process_image_for_llm(image_path: str, keep_format: bool = False) -> tuple:
+    """
+    Preprocess and base64-encode an image for Gemini multi-modal input
+    keep_format re-encodes in the file's own format, so the mime type still matches its extension
     Supports: PNG, JPG, JPEG, GIF, WEBP formats
+    Returns: (base64 string, mime type), or (None, None) on failure
     """
     try:
         image_path = Path(image_path)
@@ -18,20 +107,49 @@ def process_image_to_base64(image_path: str) -> str:
             raise FileNotFoundError(f"Image file not found: {image_path}")
         
         # Check supported formats
-        supported_formats = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
-        if image_path.suffix.lower() not in supported_formats:
+        if image_path.suffix.lower() not in IMAGE_MIME_TYPES:
             raise ValueError(f"Unsupported image format: {image_path.suffix}")
         
-        # Read and encode image
+        # Read once: the same bytes are hashed for the cache key and encoded on a miss
         with open(image_path, 'rb') as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+            image_bytes = image_file.read()
+        
+        # Preprocessing settings are part of the key so config changes don't serve stale encodings
+        source_mime_type = IMAGE_MIME_TYPES[image_path.suffix.lower()]
+        settings_tag = f"{image_config.get('enabled', True)}-{image_config.get('max_dimension', 1600)}-" \
+                       f"{_output_format(source_mime_type, keep_format)}-{image_config.get('quality', 85)}"
+        digest = f"{hash_bytes(image_bytes)}-{settings_tag}"
+        if attachment_cache:
+            cached = attachment_cache.get('image', digest)
+            if cached is not None:
+                mime_type, encoded_string = cached.split(';base64,', 1)
+                print(f"Using cached encoding for image: {image_path.name}")
+                return encoded_string, mime_type[len('data:'):]
+        
+        processed, mime_type = preprocess_image(image_bytes, source_mime_type, keep_format=keep_format)
+        # b64encode reads the memoryview directly, without another copy of the image
+        encoded_string = base64.b64encode(processed).decode('ascii')
+        if attachment_cache:
+            attachment_cache.put('image', digest, f"data:{mime_type};base64,{encoded_string}")
             
         print(f"Successfully processed image: {image_path.name}")
-        return encoded_string
+        return encoded_string, mime_type
         
     except Exception as e:
         print(f"Error processing image {image_path}: {str(e)}")
-        return None
+        return None, None
+
+# Image processing helper function
+def process_image_to_base64(image_path: str) -> str:
+    """
+    Convert image file to base64 string for Gemini multi-modal input
+    The image is downscaled but kept in its original format, so callers can keep deriving the
+    mime type from the file extension; use process_image_for_llm to get the (smaller) configured
+    format together with its mime type
+    Supports: PNG, JPG, JPEG, GIF, WEBP formats
+    """
+    encoded_string, _ = process_image_for_llm(image_path, keep_format=True)
+    return encoded_string
 
 def process_document_to_text(file_path: str) -> str:
     """
@@ -57,6 +175,14 @@ def process_document_to_text(file_path: str) -> str:
         if file_extension not in processor_map:
             raise ValueError(f"Unsupported document format: {file_extension}")
         
+        # Repeat attachments cost a hash instead of a full parse
+        digest = hash_file(file_path) if attachment_cache else None
+        if digest:
+            cached = attachment_cache.get('text', digest)
+            if cached is not None:
+                print(f"Using cached text for document: {file_path.name}")
+                return cached
+        
         # Process file and extract text
         processor = processor_map[file_extension]
         documents = processor(str(file_path))
@@ -65,17 +191,76 @@ def process_document_to_text(file_path: str) -> str:
             raise ValueError(f"No content extracted from: {file_path}")
         
         # Combine all document pages/content into single text
-        combined_text = ""
-        for doc in documents:
-            combined_text += doc.page_content + "\n\n"
+        combined_text = "\n\n".join(doc.page_content for doc in documents).strip()
+        if digest:
+            attachment_cache.put('text', digest, combined_text)
         
         print(f"Successfully processed document: {file_path.name}")
-        return combined_text.strip()
+        return combined_text
         
     except Exception as e:
         print(f"Error processing document {file_path}: {str(e)}")
         return None
 
+def process_documents_to_text(file_paths: list, max_workers: int = None, timeout_per_file: float = None) -> dict:
+    """
+    Extract text from several documents concurrently on a bounded worker pool
+    Each file gets its own time budget, counted from when it starts; a document that
+    exceeds it is reported as None instead of holding up the others. The whole batch is also
+    bounded by timeout_per_file * ceil(files / workers), so files still queued behind stalled
+    workers are given up on too.
+    Note: Python threads can't be killed - an abandoned extraction keeps its worker thread busy
+    until the parser returns; the pool is shut down without waiting for it.
+    Returns: dict mapping file path -> extracted text (None if failed or timed out)
+    """
+    if not file_paths:
+        return {}
+    
+    max_workers = max_workers or multimodal_config.get('extraction_workers', 4)
+    timeout_per_file = timeout_per_file or multimodal_config.get('extraction_timeout_seconds', 30)
+    workers = min(max_workers, len(file_paths))
+    
+    results = {path: None for path in file_paths}
+    started_at = {}
+    
+    def _extract(path):
+        started_at[path] = time.monotonic()
+        return process_document_to_text(path)
+    
+    deadline = time.monotonic() + timeout_per_file * math.ceil(len(file_paths) / workers)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-extract")
+    try:
+        futures = {executor.submit(_extract, path): path for path in file_paths}
+        pending = set(futures)
+        
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    print(f"Error processing document {path}: {str(e)}")
+            
+            # Give up on documents that have been running longer than their budget
+            now = time.monotonic()
+            for future in list(pending):
+                path = futures[future]
+                if path in started_at and now - started_at[path] > timeout_per_file:
+                    pending.discard(future)
+                    print(f"Skipping document {Path(path).name}: extraction exceeded {timeout_per_file}s")
+            
+            # Workers stalled on earlier files: give up on everything still outstanding
+            if pending and now >= deadline:
+                for future in pending:
+                    print(f"Skipping document {Path(futures[future]).name}: batch extraction deadline exceeded")
+                pending = set()
+    finally:
+        # Don't block the conversation on extractions we already gave up on
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return results
+
 def parse_multimodal_input(user_input: str) -> tuple:
     """
     Parse user input to extract text and file paths (images and documents)
@@ -100,10 +285,59 @@ def parse_multimodal_input(user_input: str) -> tuple:
     
     return clean_text, image_matches, doc_matches
 
+def _write_upload_to_temp(buffer, suffix: str) -> str:
+    """Write an upload's buffer to a tracked temp file and return its path"""
+    UPLOAD_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file_path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TEMP_DIR)
+    with os.fdopen(fd, 'wb') as tmp_file:
+        tmp_file.write(buffer)
+    with _temp_files_lock:
+        _temp_files.add(tmp_file_path)
+    return tmp_file_path
+
+def cleanup_temp_files(paths: list = None) -> int:
+    """
+    Delete temp files created for uploads
+    Pass the paths from process_uploaded_files()['temp_files'], or None to remove every
+    temp file this process created.
+    Returns: number of files removed
+    """
+    with _temp_files_lock:
+        targets = set(paths) if paths is not None else set(_temp_files)
+        _temp_files.difference_update(targets)
+    
+    removed = 0
+    for path in targets:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not remove temp file {path}: {str(e)}")
+    return removed
+
+def _sweep_stale_temp_files() -> None:
+    """Remove upload temp files left behind by earlier processes that didn't exit cleanly"""
+    if not UPLOAD_TEMP_DIR.exists():
+        return
+    max_age_seconds = multimodal_config.get('temp_file_max_age_hours', 24) * 3600
+    now = time.time()
+    for path in UPLOAD_TEMP_DIR.iterdir():
+        try:
+            if now - path.stat().st_mtime > max_age_seconds:
+                path.unlink()
+        except OSError:
+            continue
+
 def process_uploaded_files(uploaded_files):
     """
     Process uploaded files from Streamlit and categorize them into images and documents
-    Returns dictionary with temporary file paths and attachment info
+    Each upload is read through a single buffer (no duplicate copies of its bytes) and
+    written to a tracked temp file; call cleanup_temp_files(result['temp_files']) when done,
+    or use managed_uploads() to have that done automatically.
+    Document text is extracted in parallel (see process_documents_to_text)
+    Returns dictionary with temporary file paths, extracted document text and attachment info
     """
     image_files = []
     doc_files = []
@@ -116,44 +350,63 @@ def process_uploaded_files(uploaded_files):
     for uploaded_file in uploaded_files:
         file_extension = Path(uploaded_file.name).suffix.lower()
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
-            
-        # TODO: what does getvalue() do here? in image_file isn't there data duplication?
-        # TODO: are we storing these uploaded temp files? if not, do it.
-
-        if file_extension in image_extensions:
-            # Image file
-            image_files.append(tmp_file_path)
-            attachments.append({
-                "type": "image",
-                "name": uploaded_file.name,
-                "data": uploaded_file.getvalue()
-            })
-            print(f"Processed image file: {uploaded_file.name}")
-            
-        elif file_extension in doc_extensions:
-            # Document file
-            doc_files.append(tmp_file_path)
-            attachments.append({
-                "type": "document", 
-                "name": uploaded_file.name,
-                "data": None
-            })
-            print(f"Processed document file: {uploaded_file.name}")
-            
-        else:
-            # Unsupported file type - clean up temp file
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
+        if file_extension not in image_extensions and file_extension not in doc_extensions:
             print(f"Skipping unsupported file type: {uploaded_file.name}")
+            continue
+        
+        # UploadedFile is a BytesIO: getbuffer() is a zero-copy view, getvalue() would copy
+        buffer = uploaded_file.getbuffer() if hasattr(uploaded_file, 'getbuffer') else memoryview(uploaded_file.getvalue())
+        try:
+            tmp_file_path = _write_upload_to_temp(buffer, file_extension)
+            
+            if file_extension in image_extensions:
+                # Image file - the UI needs the bytes for preview; this is the only copy made
+                image_files.append(tmp_file_path)
+                attachments.append({
+                    "type": "image",
+                    "name": uploaded_file.name,
+                    "data": bytes(buffer)
+                })
+                print(f"Processed image file: {uploaded_file.name}")
+                
+            else:
+                # Document file
+                doc_files.append(tmp_file_path)
+                attachments.append({
+                    "type": "document", 
+                    "name": uploaded_file.name,
+                    "data": None
+                })
+                print(f"Processed document file: {uploaded_file.name}")
+        finally:
+            # Release the export so the upload's BytesIO can be resized/closed again
+            buffer.release()
+    
+    # Extract all attached documents concurrently instead of one after another
+    doc_texts = process_documents_to_text(doc_files)
     
     return {
         "image_files": image_files,
         "doc_files": doc_files,
-        "attachments": attachments
-    }
\ No newline at end of file
+        "doc_texts": doc_texts,
+        "attachments": attachments,
+        "temp_files": image_files + doc_files
+    }
+
+@contextmanager
+def managed_uploads(uploaded_files):
+    """
+    Context manager around process_uploaded_files that deletes the temp files on exit
+    Usage:
+        with managed_uploads(files) as processed:
+            images = [process_image_to_base64(p) for p in processed["image_files"]]
+    """
+    processed = process_uploaded_files(uploaded_files)
+    try:
+        yield processed
+    finally:
+        cleanup_temp_files(processed["temp_files"])
+
+# Temp files from a crashed earlier run are swept on import; this run's are removed at exit
+_sweep_stale_temp_files()
+atexit.register(cleanup_temp_files)
@@ -10,6 +10,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from .config_loader import get_config
 from .agent_schemas import KBDocument
+from .kb_files import get_file_records, expand_chunk_metadata
 from .logger_setup import setup_logger
 logger = setup_logger()
 
@@ -136,20 +137,39 @@ class RAGScoringService:
             logger.error(f"Error computing keyword scores: {e}")
             return [0.0] * len(documents)
 
-    def compute_quality_scores(self, documents: List[Document]) -> List[float]:
+    def expand_metadata(self, documents: List[Document]) -> List[Dict]:
+        """
+        Resolve compact chunk metadata against the KB file records (one lookup for all documents)
+
+        Args:
+            documents: List of retrieved documents
+
+        Returns:
+            List of expanded metadata dicts, aligned with documents
+        """
+        file_records = get_file_records(doc.metadata.get('file_id') for doc in documents)
+        return [
+            expand_chunk_metadata(doc.metadata, file_records.get(doc.metadata.get('file_id')))
+            for doc in documents
+        ]
+
+    def compute_quality_scores(self, documents: List[Document], expanded_metadata: Optional[List[Dict]] = None) -> List[float]:
         """
         Compute document quality scores based on metadata
 
         Args:
             documents: List of retrieved documents
+            expanded_metadata: Pre-resolved metadata from expand_metadata (None to resolve here)
 
         Returns:
             List of quality scores (0-1 range)
         """
+        if expanded_metadata is None:
+            expanded_metadata = self.expand_metadata(documents)
+
         quality_scores = []
 
-        for doc in documents:
-            metadata = doc.metadata
+        for metadata in expanded_metadata:
             score = 0.0
 
             # Document type quality (formatted documents score higher)
@@ -195,21 +215,24 @@ class RAGScoringService:
         logger.debug(f"Quality scores computed: avg={np.mean(quality_scores):.3f}")
         return quality_scores
 
-    def compute_recency_scores(self, documents: List[Document]) -> List[float]:
+    def compute_recency_scores(self, documents: List[Document], expanded_metadata: Optional[List[Dict]] = None) -> List[float]:
         """
         Compute recency scores based on file modification and ingestion timestamps
 
         Args:
             documents: List of retrieved documents
+            expanded_metadata: Pre-resolved metadata from expand_metadata (None to resolve here)
 
         Returns:
             List of recency scores (0-1 range)
         """
+        if expanded_metadata is None:
+            expanded_metadata = self.expand_metadata(documents)
+
         recency_scores = []
         current_time = datetime.now()
 
-        for doc in documents:
-            metadata = doc.metadata
+        for metadata in expanded_metadata:
             score = 0.0
 
             # File modification recency (primary factor)
@@ -281,8 +304,9 @@ class RAGScoringService:
         # Compute individual scores
         semantic_scores = self.compute_semantic_scores(documents, similarity_scores)
         keyword_scores = self.compute_keyword_scores(query, documents)
-        quality_scores = self.compute_quality_scores(documents)
-        recency_scores = self.compute_recency_scores(documents)
+        expanded_metadata = self.expand_metadata(documents)
+        quality_scores = self.compute_quality_scores(documents, expanded_metadata)
+        recency_scores = self.compute_recency_scores(documents, expanded_metadata)
 
         # Combine scores with weights
         combined_scores = []
@@ -2,10 +2,13 @@
 Tools Service
 Centralized tool definitions for use across agents
 """
-from langchain_core.tools import tool
+from typing import Annotated, Optional
+from langchain_core.tools import tool, InjectedToolArg
 from services.config_loader import get_config
 from services.logger_setup import setup_logger
 from services.jira_tool import JiraTool
+from services.jira_outbox import PROVISIONAL_PREFIX, enqueue_ticket, is_outbox_enabled
+from services.idempotency import run_once
 import services.services as services
 
 logger = setup_logger()
@@ -53,28 +56,64 @@ def get_retriever_tool(tenant_id: str, user_role: str):
     
     return retriever_tool
 
-@tool
-def create_jira_ticket(summary: str, description: str, issue_type: str, urgency: str = "medium", sentiment: str = "neutral") -> str:
+def get_jira_ticket_tool(tenant_id: str):
     """
-    Creates a JIRA ticket for service requests, complaints, and feature requests.
+    Create tenant-aware Jira ticket tool
     
     Args:
-        summary: Short, self-defining subject of the ticket (max 100 chars)
-        description: Detailed description with all necessary information to help resolve the issue
-        issue_type: Type of issue - one of: 'service_request', 'complaint', 'feature_request'
-        urgency: Priority level - 'high' (critical/urgent), 'medium' (default), 'low'
-        sentiment: User sentiment - 'positive', 'neutral' (default), 'negative'
+        tenant_id: Tenant identifier
         
     Returns:
-        Ticket ID as string if success, error message if failed
+        create_jira_ticket tool instance. Its idempotency_key argument is hidden from the LLM;
+        the caller injects the run's key (see ClaimVerifierAgent.ticket_idempotency_key)
     """
-    try:
-        jira_tool = JiraTool()
-        ticket_key = jira_tool.create_ticket(summary, description, issue_type, urgency, sentiment)
-        return f"Successfully created JIRA ticket: {ticket_key}"
-    except Exception as e:
-        logger.error(f"JIRA ticket creation failed: {e}")
-        return f"Failed to create JIRA ticket: {str(e)}"
+    @tool
+    def create_jira_ticket(summary: str, description: str, issue_type: str, urgency: str = "medium", sentiment: str = "neutral",
+                           idempotency_key: Annotated[Optional[str], InjectedToolArg] = None) -> str:
+        """
+        Creates a JIRA ticket for service requests, complaints, and feature requests.
+        
+        Args:
+            summary: Short, self-defining subject of the ticket (max 100 chars)
+            description: Detailed description with all necessary information to help resolve the issue
+            issue_type: Type of issue - one of: 'service_request', 'complaint', 'feature_request'
+            urgency: Priority level - 'high' (critical/urgent), 'medium' (default), 'low'
+            sentiment: User sentiment - 'positive', 'neutral' (default), 'negative'
+            
+        Returns:
+            Ticket ID (or provisional reference when queued) as string if success, error message if failed
+        """
+        # A retried run for the same issue gets the original ticket back; without a key, no dedupe
+        if is_outbox_enabled():
+            try:
+                ticket_ref = run_once(
+                    idempotency_key,
+                    lambda: enqueue_ticket(summary, description, issue_type, urgency, sentiment,
+                                           idempotency_key=idempotency_key),
+                    action="jira_ticket"
+                )
+                return f"JIRA ticket request queued with reference {ticket_ref}; the ticket will be created shortly"
+            except Exception as e:
+                logger.error(f"Failed to queue JIRA ticket, creating inline: {e}")
+        
+        def create_inline() -> str:
+            ticket_key = JiraTool().create_ticket(summary, description, issue_type, urgency, sentiment,
+                                                  idempotency_key=idempotency_key)
+            if ticket_key.startswith("Failed"):
+                raise RuntimeError(ticket_key)  # Don't store failures; a retry should try again
+            return ticket_key
+        
+        try:
+            ticket_key = run_once(idempotency_key, create_inline, action="jira_ticket")
+            if ticket_key.startswith(PROVISIONAL_PREFIX):
+                # Jira was unavailable and the ticket was failed over to the outbox
+                return f"JIRA ticket request queued with reference {ticket_key}; the ticket will be created shortly"
+            return f"Successfully created JIRA ticket: {ticket_key}"
+        except Exception as e:
+            logger.error(f"JIRA ticket creation failed: {e}")
+            return f"Failed to create JIRA ticket: {str(e)}"
+    
+    return create_jira_ticket
 
 def get_all_tools(tenant_id: str, user_role: str):
     """
@@ -93,7 +132,7 @@ def get_all_tools(tenant_id: str, user_role: str):
     
     return [
         retriever,
-        create_jira_ticket,
+        get_jira_ticket_tool(tenant_id),
         get_user_data,
         list_user_policies
     ]
@@ -0,0 +1,190 @@
+"""
+TTL Cache
+Thread-safe, size-bounded LRU cache with per-entry expiry and tag-based invalidation,
+used as a read-through cache in front of user and policy lookups.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from .config_loader import get_config
+from .logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU cache bounded by entry count, where each entry expires ttl_seconds after it was stored.
+
+    Entries can carry tags (e.g. a user_id) so a write can invalidate every cached
+    value derived from that record, whatever key it was looked up by.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300, name: str = "cache"):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept (least recently used evicted first)
+            ttl_seconds: Seconds an entry stays valid after being stored
+            name: Name used in log messages
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tag_index: Dict[Any, Set[Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "puts": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            A copy of the cached value, or default if missing or expired
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= now:
+                self._remove(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        # Callers get their own copy so mutating a result can't corrupt the cache
+        return copy.deepcopy(value)
+
+    def set(self, key: Any, value: Any, tags: Iterable[Any] = ()) -> None:
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to cache (copied)
+            tags: Tags that invalidate this entry
+        """
+        tags = frozenset(tag for tag in tags if tag is not None)
+        expires_at = time.monotonic() + self.ttl_seconds
+        value = copy.deepcopy(value)
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            self._stats["puts"] += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any], tags: Callable[[Any], Iterable[Any]] = None) -> Any:
+        """
+        Read-through lookup: return the cached value or load, cache and return it
+
+        Args:
+            key: Cache key
+            loader: Zero-argument function producing the value on a miss
+            tags: Function mapping the loaded value to its invalidation tags
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        self.set(key, value, tags(value) if tags else ())
+        return value
+
+    def invalidate(self, key: Any) -> None:
+        """Drop a single key"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._stats["invalidations"] += 1
+
+    def invalidate_tags(self, *tags: Any) -> int:
+        """
+        Drop every entry carrying any of the given tags
+
+        Returns:
+            Number of entries dropped
+        """
+        dropped = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+                    dropped += 1
+            self._stats["invalidations"] += dropped
+        if dropped:
+            logger.debug(f"{self.name} cache: invalidated {dropped} entries for tags {tags}")
+        return dropped
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics
+
+        Returns:
+            Dictionary with hit/miss/eviction counters, hit_rate and current size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key: Any) -> None:
+        """Remove an entry and its tag index references (lock held)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+
+def _build_user_data_cache() -> Optional[TTLCache]:
+    cache_config = config.get_section('user_data_cache')
+    if not cache_config.get('enabled', True):
+        return None
+    return TTLCache(
+        max_entries=int(cache_config.get('max_entries', 10000)),
+        ttl_seconds=float(cache_config.get('ttl_seconds', 300)),
+        name="user_data"
+    )
+
+
+# Shared cache for get_user_data / list_user_policies (None when disabled in config)
+user_data_cache = _build_user_data_cache()
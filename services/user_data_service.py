@@ -4,15 +4,27 @@ Manages user data, policies, and incidents for claim verification
 Using SQLAlchemy ORM and Pydantic for best practices
 """
 
+import base64
 import json
+import time
 import uuid
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Type
 from langchain_core.tools import tool
-from pydantic import ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import select, and_, or_
+from sqlalchemy.exc import IntegrityError
 
 # Import database models and session management
-from services.database import get_db_session, User, Policy, Incident
+from services.database import get_db_session, get_async_db_session, User, Policy, Incident
+from services.ttl_cache import user_data_cache
+from services.config_loader import get_config
+from services.logger_setup import setup_logger
+
+logger = setup_logger()
+config = get_config()
 from services.models import (
     UserCreate, UserInDB,
     PolicyCreate, PolicyInDB,
@@ -20,6 +32,46 @@ from services.models import (
 )
 
 
+# ========== USER DATA CACHE ==========
+# get_user_data / list_user_policies results are cached per user and tagged with the
+# user id and email, so any user or policy write drops every lookup derived from it
+
+def _user_cache_key(user_id: Optional[str], email: Optional[str]) -> tuple:
+    return ("user", user_id) if user_id else ("user_email", email)
+
+
+def _user_cache_tags(user_id: Optional[str], email: Optional[str], user: dict) -> list:
+    user_id = user_id or user.get('user_id')
+    email = email or user.get('email')
+    return [f"user:{user_id}" if user_id else None, f"email:{email}" if email else None]
+
+
+def _invalidate_user_cache(user_id: Optional[str] = None, email: Optional[str] = None) -> None:
+    if user_data_cache is None:
+        return
+    user_data_cache.invalidate_tags(
+        *[tag for tag in (f"user:{user_id}" if user_id else None, f"email:{email}" if email else None) if tag]
+    )
+
+
+def _load_user(user_id: Optional[str], email: Optional[str]) -> dict:
+    with get_db_session() as session:
+        if user_id:
+            user = session.query(User).filter(User.user_id == user_id).first()
+        else:
+            user = session.query(User).filter(User.email == email).first()
+        
+        if user:
+            return UserInDB.from_orm(user).dict()
+        return {}
+
+
+def _load_user_policies(user_id: str) -> list:
+    with get_db_session() as session:
+        policies = session.query(Policy).filter(Policy.user_id == user_id).all()
+        return [PolicyInDB.from_orm(policy).dict() for policy in policies]
+
+
 # ========== TOOL FUNCTIONS (LangChain decorated) ==========
 
 @tool
@@ -38,15 +90,14 @@ def get_user_data(user_id: Optional[str] = None, email: Optional[str] = None) ->
     if not user_id and not email:
         return {"error": "Must provide either user_id or email"}
     
-    with get_db_session() as session:
-        if user_id:
-            user = session.query(User).filter(User.user_id == user_id).first()
-        else:
-            user = session.query(User).filter(User.email == email).first()
-        
-        if user:
-            return UserInDB.from_orm(user).dict()
-        return {}
+    if user_data_cache is None:
+        return _load_user(user_id, email)
+    
+    return user_data_cache.get_or_load(
+        _user_cache_key(user_id, email),
+        lambda: _load_user(user_id, email),
+        tags=lambda user: _user_cache_tags(user_id, email, user)
+    )
 
 
 @tool
@@ -62,9 +113,14 @@ def list_user_policies(user_id: str) -> list:
         policy_number, user_id, policy_name, item_insured, start_date, end_date,
         billing_duration, last_payment_date, last_payment_amount
     """
-    with get_db_session() as session:
-        policies = session.query(Policy).filter(Policy.user_id == user_id).all()
-        return [PolicyInDB.from_orm(policy).dict() for policy in policies]
+    if user_data_cache is None:
+        return _load_user_policies(user_id)
+    
+    return user_data_cache.get_or_load(
+        ("policies", user_id),
+        lambda: _load_user_policies(user_id),
+        tags=lambda _: [f"user:{user_id}"]
+    )
 
 
 @tool
@@ -97,7 +153,7 @@ def create_incident_record(incident_data: dict) -> str:
         raise ValueError(f"Invalid incident data: {e}")
     
     incident_id = str(uuid.uuid4())
-    timestamp = datetime.now().isoformat()
+    timestamp = datetime.now()
     
     with get_db_session() as session:
         # Create new incident
@@ -113,8 +169,8 @@ def create_incident_record(incident_data: dict) -> str:
             resolution=incident_create.resolution,
             confidence=incident_create.confidence,
             status=incident_create.status,
-            policy_refs=json.dumps(incident_create.policy_refs),
-            decision_json=json.dumps(incident_create.decision_json),
+            policy_refs=incident_create.policy_refs,
+            decision_json=incident_create.decision_json,
             created_at=timestamp,
             updated_at=timestamp
         )
@@ -151,7 +207,7 @@ def update_incident_status(
     except ValidationError as e:
         raise ValueError(f"Invalid update data: {e}")
     
-    timestamp = datetime.now().isoformat()
+    timestamp = datetime.now()
     
     with get_db_session() as session:
         incident = session.query(Incident).filter(Incident.incident_id == incident_id).first()
@@ -169,6 +225,117 @@ def update_incident_status(
     return True
 
 
+# ========== ASYNC TOOL IMPLEMENTATIONS ==========
+# Registered as the coroutine of each tool above, so tool.ainvoke() awaits the DB
+# instead of running the sync version in a thread
+
+async def aget_user_data(user_id: Optional[str] = None, email: Optional[str] = None) -> dict:
+    """Async version of get_user_data"""
+    if not user_id and not email:
+        return {"error": "Must provide either user_id or email"}
+
+    cache_key = _user_cache_key(user_id, email)
+    if user_data_cache is not None:
+        cached = user_data_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    async with get_async_db_session() as session:
+        if user_id:
+            stmt = select(User).where(User.user_id == user_id)
+        else:
+            stmt = select(User).where(User.email == email)
+        user = (await session.execute(stmt)).scalars().first()
+        user_dict = UserInDB.from_orm(user).dict() if user else {}
+
+    if user_data_cache is not None:
+        user_data_cache.set(cache_key, user_dict, _user_cache_tags(user_id, email, user_dict))
+    return user_dict
+
+
+async def alist_user_policies(user_id: str) -> list:
+    """Async version of list_user_policies"""
+    if user_data_cache is not None:
+        cached = user_data_cache.get(("policies", user_id))
+        if cached is not None:
+            return cached
+
+    async with get_async_db_session() as session:
+        result = await session.execute(select(Policy).where(Policy.user_id == user_id))
+        policies = [PolicyInDB.from_orm(policy).dict() for policy in result.scalars().all()]
+
+    if user_data_cache is not None:
+        user_data_cache.set(("policies", user_id), policies, [f"user:{user_id}"])
+    return policies
+
+
+async def acreate_incident_record(incident_data: dict) -> str:
+    """Async version of create_incident_record"""
+    try:
+        incident_create = IncidentCreate(**incident_data)
+    except ValidationError as e:
+        raise ValueError(f"Invalid incident data: {e}")
+
+    incident_id = str(uuid.uuid4())
+    timestamp = datetime.now()
+
+    async with get_async_db_session() as session:
+        session.add(Incident(
+            incident_id=incident_id,
+            user_id=incident_create.user_id,
+            tenant_id=incident_create.tenant_id,
+            intent=incident_create.intent,
+            summary=incident_create.summary,
+            issue=incident_create.issue,
+            user_demand=incident_create.user_demand,
+            is_valid=incident_create.is_valid,
+            resolution=incident_create.resolution,
+            confidence=incident_create.confidence,
+            status=incident_create.status,
+            policy_refs=incident_create.policy_refs,
+            decision_json=incident_create.decision_json,
+            created_at=timestamp,
+            updated_at=timestamp
+        ))
+
+    return incident_id
+
+
+async def aupdate_incident_status(
+    incident_id: str,
+    status: str,
+    resolution: Optional[str] = None
+) -> bool:
+    """Async version of update_incident_status"""
+    try:
+        update_data = {"status": status}
+        if resolution:
+            update_data["resolution"] = resolution
+        IncidentUpdate(**update_data)
+    except ValidationError as e:
+        raise ValueError(f"Invalid update data: {e}")
+
+    async with get_async_db_session() as session:
+        result = await session.execute(select(Incident).where(Incident.incident_id == incident_id))
+        incident = result.scalars().first()
+
+        if not incident:
+            return False
+
+        incident.status = status
+        if resolution:
+            incident.resolution = resolution
+        incident.updated_at = datetime.now()
+
+    return True
+
+
+get_user_data.coroutine = aget_user_data
+list_user_policies.coroutine = alist_user_policies
+create_incident_record.coroutine = acreate_incident_record
+update_incident_status.coroutine = aupdate_incident_status
+
+
 # ========== CRUD HELPER FUNCTIONS (Non-tool) ==========
 
 def insert_user(user_data: Dict[str, Any]) -> str:
@@ -204,6 +371,7 @@ def insert_user(user_data: Dict[str, Any]) -> str:
         session.add(new_user)
         # Session commits automatically via context manager
     
+    _invalidate_user_cache(user_create.user_id, user_create.email)
     return user_create.user_id
 
 
@@ -240,9 +408,27 @@ def insert_policy(policy_data: Dict[str, Any]) -> str:
         session.add(new_policy)
         # Session commits automatically via context manager
     
+    _invalidate_user_cache(policy_create.user_id)
     return policy_create.policy_number
 
 
+def _incident_to_dict(incident: Incident) -> Dict[str, Any]:
+    """Convert an Incident row to a dict, with empty JSON columns as []/{} and ISO timestamps"""
+    incident_dict = IncidentInDB.from_orm(incident).dict()
+    for name, empty in INCIDENT_JSON_COLUMNS.items():
+        if incident_dict.get(name) is None:
+            incident_dict[name] = empty()
+    return _isoformat_timestamps(incident_dict)
+
+
+def _isoformat_timestamps(incident_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Timestamps are stored as DATETIME but returned as ISO strings, as before the column change"""
+    for name in INCIDENT_TIMESTAMP_COLUMNS:
+        if isinstance(incident_dict.get(name), datetime):
+            incident_dict[name] = incident_dict[name].isoformat()
+    return incident_dict
+
+
 def get_incident_by_id(incident_id: str) -> Optional[Dict[str, Any]]:
     """
     Retrieve a specific incident by ID.
@@ -257,11 +443,7 @@ def get_incident_by_id(incident_id: str) -> Optional[Dict[str, Any]]:
         incident = session.query(Incident).filter(Incident.incident_id == incident_id).first()
         
         if incident:
-            incident_dict = IncidentInDB.from_orm(incident).dict()
-            # Parse JSON fields back to objects
-            incident_dict['policy_refs'] = json.loads(incident.policy_refs) if incident.policy_refs else []
-            incident_dict['decision_json'] = json.loads(incident.decision_json) if incident.decision_json else {}
-            return incident_dict
+            return _incident_to_dict(incident)
         
         return None
 
@@ -289,15 +471,130 @@ def list_incidents(user_id: Optional[str] = None, status: Optional[str] = None)
         query = query.order_by(Incident.created_at.desc())
         incidents = query.all()
         
-        result = []
-        for incident in incidents:
-            incident_dict = IncidentInDB.from_orm(incident).dict()
-            # Parse JSON fields
-            incident_dict['policy_refs'] = json.loads(incident.policy_refs) if incident.policy_refs else []
-            incident_dict['decision_json'] = json.loads(incident.decision_json) if incident.decision_json else {}
-            result.append(incident_dict)
+        return [_incident_to_dict(incident) for incident in incidents]
+
+
+async def alist_incidents(user_id: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Async version of list_incidents.
+    
+    Args:
+        user_id: Filter by user_id (optional)
+        status: Filter by status (optional)
+    
+    Returns:
+        List of incident dictionaries
+    """
+    async with get_async_db_session() as session:
+        stmt = select(Incident)
+        
+        if user_id:
+            stmt = stmt.where(Incident.user_id == user_id)
         
-        return result
+        if status:
+            stmt = stmt.where(Incident.status == status)
+        
+        stmt = stmt.order_by(Incident.created_at.desc())
+        incidents = (await session.execute(stmt)).scalars().all()
+        
+        return [_incident_to_dict(incident) for incident in incidents]
+
+
+# JSON columns and the value returned when they are empty; the JSON column type
+# decodes them, and only when they are projected
+INCIDENT_JSON_COLUMNS = {'policy_refs': list, 'decision_json': dict}
+INCIDENT_TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+# Light list-view projection used by list_incidents_page when no columns are requested
+INCIDENT_LIST_COLUMNS = ['incident_id', 'user_id', 'tenant_id', 'intent', 'summary', 'status', 'confidence', 'created_at', 'updated_at']
+
+
+def list_incidents_page(
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    tenant_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    List one page of incidents, newest first, using keyset pagination.
+    
+    Pages are addressed by a cursor on (created_at, incident_id) rather than an offset,
+    so fetching any page is an index range scan regardless of how deep it is.
+    
+    Args:
+        user_id: Filter by user_id (optional)
+        status: Filter by status (optional)
+        tenant_id: Filter by tenant_id (optional)
+        limit: Maximum number of incidents in the page
+        cursor: next_cursor from the previous page (None for the first page)
+        columns: Incident columns to return (default: INCIDENT_LIST_COLUMNS)
+    
+    Returns:
+        Dictionary with 'items' (list of incident dicts with only the projected columns,
+        timestamps as ISO strings)
+        and 'next_cursor' (None when there are no more pages)
+    """
+    columns = list(columns or INCIDENT_LIST_COLUMNS)
+    unknown = [name for name in columns if name not in Incident.__table__.columns]
+    if unknown:
+        raise ValueError(f"Unknown incident columns: {unknown}")
+    
+    # The cursor needs the sort key even when it isn't projected
+    selected = columns + [name for name in ('created_at', 'incident_id') if name not in columns]
+    stmt = select(*[Incident.__table__.columns[name] for name in selected])
+    
+    if user_id:
+        stmt = stmt.where(Incident.user_id == user_id)
+    if status:
+        stmt = stmt.where(Incident.status == status)
+    if tenant_id:
+        stmt = stmt.where(Incident.tenant_id == tenant_id)
+    
+    if cursor:
+        cursor_created_at, cursor_incident_id = _decode_incident_cursor(cursor)
+        stmt = stmt.where(or_(
+            Incident.created_at < cursor_created_at,
+            and_(Incident.created_at == cursor_created_at, Incident.incident_id < cursor_incident_id)
+        ))
+    
+    limit = max(int(limit), 1)
+    stmt = stmt.order_by(Incident.created_at.desc(), Incident.incident_id.desc()).limit(limit + 1)
+    
+    with get_db_session() as session:
+        rows = session.execute(stmt).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    items = []
+    for row in rows:
+        mapping = row._mapping
+        item = {name: mapping[name] for name in columns}
+        for name, empty in INCIDENT_JSON_COLUMNS.items():
+            if name in item and item[name] is None:
+                item[name] = empty()
+        items.append(_isoformat_timestamps(item))
+    
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]._mapping
+        next_cursor = _encode_incident_cursor(last['created_at'], last['incident_id'])
+    
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _encode_incident_cursor(created_at: datetime, incident_id: str) -> str:
+    payload = json.dumps([created_at.isoformat(), incident_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def _decode_incident_cursor(cursor: str) -> tuple:
+    try:
+        created_at, incident_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), incident_id
+    except Exception:
+        raise ValueError("Invalid incident cursor")
 
 
 def delete_user(user_id: str) -> bool:
@@ -317,9 +614,11 @@ def delete_user(user_id: str) -> bool:
         if not user:
             return False
         
+        email = user.email
         session.delete(user)
         # Session commits automatically via context manager
     
+    _invalidate_user_cache(user_id, email)
     return True
 
 
@@ -339,7 +638,217 @@ def delete_policy(policy_number: str) -> bool:
         if not policy:
             return False
         
+        owner_id = policy.user_id
         session.delete(policy)
         # Session commits automatically via context manager
     
+    _invalidate_user_cache(owner_id)
     return True
+
+
+# ========== BULK IMPORT ==========
+# Rows are validated and written chunk by chunk, one transaction and one multi-row
+# INSERT ... ON CONFLICT statement per chunk; rows that fail validation or the write are
+# quarantined with their error instead of aborting the import
+
+def bulk_insert_users(rows: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None, upsert: bool = True) -> Dict[str, Any]:
+    """
+    Insert (or update) many users in chunked transactions.
+    
+    Args:
+        rows: Iterable of user dicts (same keys as insert_user)
+        chunk_size: Rows per transaction (default: database.bulk_chunk_size)
+        upsert: Update existing users on user_id conflict; if False, existing users are left untouched
+    
+    Returns:
+        Dictionary with total_rows, written, quarantined (list of {row_number, row, error}),
+        elapsed_seconds and rows_per_second
+    """
+    def prepare_chunk(numbered_rows):
+        valid, quarantined = _validate_chunk(numbered_rows, UserCreate, defaults={
+            'date_registered': datetime.now().strftime('%Y-%m-%d')
+        })
+        # Same email on two different user_ids in one chunk would fail the whole statement
+        seen_emails = {}
+        for row_number, row in valid:
+            seen_emails.setdefault(row['email'], row['user_id'])
+        deduped = []
+        for row_number, row in valid:
+            if seen_emails[row['email']] != row['user_id']:
+                quarantined.append(_quarantine_entry(row_number, row, f"Duplicate email in batch: {row['email']}"))
+            else:
+                deduped.append((row_number, row))
+        return deduped, quarantined
+    
+    def invalidate(rows_written):
+        for row in rows_written:
+            _invalidate_user_cache(row['user_id'], row['email'])
+    
+    return _bulk_write(rows, User, 'user_id', prepare_chunk, invalidate, chunk_size, upsert)
+
+
+def bulk_insert_policies(rows: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None, upsert: bool = True) -> Dict[str, Any]:
+    """
+    Insert (or update) many policies in chunked transactions.
+    Policies whose user_id does not exist are quarantined.
+    
+    Args:
+        rows: Iterable of policy dicts (same keys as insert_policy)
+        chunk_size: Rows per transaction (default: database.bulk_chunk_size)
+        upsert: Update existing policies on policy_number conflict; if False, existing policies are left untouched
+    
+    Returns:
+        Dictionary with total_rows, written, quarantined (list of {row_number, row, error}),
+        elapsed_seconds and rows_per_second
+    """
+    def prepare_chunk(numbered_rows):
+        valid, quarantined = _validate_chunk(numbered_rows, PolicyCreate)
+        # One query per chunk to check every referenced user exists
+        user_ids = {row['user_id'] for _, row in valid}
+        with get_db_session() as session:
+            existing = {
+                user_id for (user_id,) in
+                session.query(User.user_id).filter(User.user_id.in_(user_ids)).all()
+            } if user_ids else set()
+        known = []
+        for row_number, row in valid:
+            if row['user_id'] in existing:
+                known.append((row_number, row))
+            else:
+                quarantined.append(_quarantine_entry(row_number, row, f"Unknown user_id: {row['user_id']}"))
+        return known, quarantined
+    
+    def invalidate(rows_written):
+        for user_id in {row['user_id'] for row in rows_written}:
+            _invalidate_user_cache(user_id)
+    
+    return _bulk_write(rows, Policy, 'policy_number', prepare_chunk, invalidate, chunk_size, upsert)
+
+
+def _bulk_write(rows, model, key_column: str, prepare_chunk, invalidate, chunk_size: Optional[int], upsert: bool) -> Dict[str, Any]:
+    """Drive a chunked bulk import and collect throughput stats"""
+    chunk_size = max(int(chunk_size or config.get('database.bulk_chunk_size', 500)), 1)
+    table_name = model.__tablename__
+    started = time.perf_counter()
+    total_rows = 0
+    written = 0
+    quarantined = []
+    
+    numbered = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        total_rows += len(chunk)
+        
+        valid, rejected = prepare_chunk(chunk)
+        quarantined.extend(rejected)
+        if not valid:
+            continue
+        
+        try:
+            with get_db_session() as session:
+                _upsert_rows(session, model, key_column, [row for _, row in valid], upsert)
+            chunk_written = [row for _, row in valid]
+        except IntegrityError:
+            # Isolate the offending rows: retry the chunk one row per transaction
+            chunk_written = []
+            for row_number, row in valid:
+                try:
+                    with get_db_session() as session:
+                        _upsert_rows(session, model, key_column, [row], upsert)
+                    chunk_written.append(row)
+                except IntegrityError as e:
+                    quarantined.append(_quarantine_entry(row_number, row, str(e.orig)))
+        
+        written += len(chunk_written)
+        invalidate(chunk_written)
+        logger.debug(f"Bulk import into {table_name}: {total_rows} rows processed")
+    
+    elapsed = time.perf_counter() - started
+    rows_per_second = total_rows / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Bulk import into {table_name}: {written}/{total_rows} rows written, "
+                f"{len(quarantined)} quarantined in {elapsed:.2f}s ({rows_per_second:.0f} rows/s)")
+    
+    return {
+        "table": table_name,
+        "total_rows": total_rows,
+        "written": written,
+        "quarantined": quarantined,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": rows_per_second
+    }
+
+
+def _validate_chunk(numbered_rows, schema: Type[BaseModel], defaults: Optional[Dict[str, Any]] = None):
+    """
+    Validate a chunk of (row_number, row) pairs with one list validation, returning (valid, quarantined)
+
+    Rows named in a ValidationError are quarantined and the rest of the chunk is validated again.
+    """
+    quarantined = []
+    prepared = []
+    for row_number, row in numbered_rows:
+        try:
+            data = {key: value for key, value in dict(row).items() if value not in ("", None)}
+        except (TypeError, ValueError) as e:
+            quarantined.append(_quarantine_entry(row_number, row, str(e)))
+            continue
+        for key, value in (defaults or {}).items():
+            data.setdefault(key, value)
+        prepared.append((row_number, row, data))
+
+    adapter = _chunk_adapter(schema)
+    models = []
+    while prepared:
+        try:
+            models = adapter.validate_python([data for _, _, data in prepared])
+            break
+        except ValidationError as e:
+            errors_by_index = {}
+            for error in e.errors():
+                index, field = error['loc'][0], ".".join(str(part) for part in error['loc'][1:])
+                errors_by_index.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error['msg'])
+            for index in sorted(errors_by_index):
+                row_number, row, _ = prepared[index]
+                quarantined.append(_quarantine_entry(row_number, row, "; ".join(errors_by_index[index])))
+            prepared = [entry for index, entry in enumerate(prepared) if index not in errors_by_index]
+
+    valid = [(row_number, model.dict()) for (row_number, _, _), model in zip(prepared, models)]
+    return valid, quarantined
+
+
+@lru_cache(maxsize=None)
+def _chunk_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """List validator for a row schema, built once per schema"""
+    return TypeAdapter(List[schema])
+
+
+def _upsert_rows(session, model, key_column: str, rows: List[Dict[str, Any]], upsert: bool) -> None:
+    """Write rows with one multi-row INSERT ... ON CONFLICT statement (merge on other dialects)"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        for row in rows:
+            if upsert or session.get(model, row[key_column]) is None:
+                session.merge(model(**row))
+        return
+    
+    # Last occurrence of a key within the chunk wins, as it would with row-by-row upserts
+    rows = list({row[key_column]: row for row in rows}.values())
+    stmt = insert(model.__table__).values(rows)
+    if upsert:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != key_column}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[key_column])
+    session.execute(stmt)
+
+
+def _quarantine_entry(row_number: int, row: Dict[str, Any], error: str) -> Dict[str, Any]:
+    return {"row_number": row_number, "row": dict(row), "error": error}
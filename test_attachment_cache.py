@@ -0,0 +1,61 @@
+"""
+Tests for the attachment cache
+Covers the LRU bounds, TTL expiry and the incrementally tracked disk tier.
+"""
+
+from services.attachment_cache import AttachmentCache, hash_bytes
+
+
+def test_memory_only_by_default(tmp_path):
+    cache = AttachmentCache(disk_dir=None)
+    cache.put('text', hash_bytes(b'a'), 'alpha')
+    assert cache.get('text', hash_bytes(b'a')) == 'alpha'
+    assert cache.stats()['disk_entries'] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_entries_expire_in_both_tiers(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('services.attachment_cache.time.time', lambda: clock[0])
+    cache = AttachmentCache(disk_dir=str(tmp_path), ttl_seconds=60)
+    cache.put('text', 'd1', 'secret')
+    path = tmp_path / 'text' / 'd1'[:2] / 'd1.txt'
+    assert path.exists()
+
+    clock[0] += 30
+    assert cache.get('text', 'd1') == 'secret'
+
+    clock[0] += 31
+    assert cache.get('text', 'd1') is None
+    assert not path.exists()
+
+
+def test_sweep_removes_expired_disk_entries(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('services.attachment_cache.time.time', lambda: clock[0])
+    cache = AttachmentCache(disk_dir=str(tmp_path), ttl_seconds=60, sweep_interval_seconds=10)
+    cache.put('text', 'aa1', 'old')
+
+    clock[0] += 61
+    cache.put('text', 'bb2', 'new')  # Triggers the sweep
+    assert not (tmp_path / 'text' / 'aa' / 'aa1.txt').exists()
+    assert cache.stats()['disk_entries'] == 1
+
+
+def test_disk_bound_evicts_least_recently_used(tmp_path):
+    cache = AttachmentCache(max_memory_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=10, ttl_seconds=None)
+    cache.put('text', 'aa1', '12345')
+    cache.put('text', 'bb2', '12345')
+    assert cache.get('text', 'aa1') == '12345'  # aa1 is now the most recently used
+    cache.put('text', 'cc3', '12345')
+
+    assert cache.get('text', 'bb2') is None
+    assert cache.get('text', 'aa1') == '12345'
+    assert cache.stats()['disk_bytes'] == 10
+
+
+def test_disk_index_survives_restart(tmp_path):
+    AttachmentCache(disk_dir=str(tmp_path)).put('image', 'ab1', 'data')
+    reopened = AttachmentCache(disk_dir=str(tmp_path))
+    assert reopened.stats()['disk_entries'] == 1
+    assert reopened.get('image', 'ab1') == 'data'
@@ -0,0 +1,67 @@
+"""
+Tests for chunked bulk user/policy import
+Run against a scratch SQLite database.
+"""
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base, User, create_db_engine, get_db_session, use_session_factory
+from services.user_data_service import bulk_insert_users, bulk_insert_policies
+
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    Base.metadata.create_all(bind=engine)
+    with use_session_factory(sessionmaker(autocommit=False, autoflush=False, bind=engine)):
+        yield
+    engine.dispose()
+
+
+def make_user(i: int, **overrides) -> dict:
+    return {"user_id": f"U{i:03d}", "name": f"User {i}", "email": f"user{i}@example.com", **overrides}
+
+
+def test_bulk_insert_quarantines_invalid_rows():
+    rows = [make_user(1), make_user(2, email="not-an-email"), make_user(3), make_user(4, name="")]
+    result = bulk_insert_users(rows, chunk_size=2)
+
+    assert result["total_rows"] == 4
+    assert result["written"] == 2
+    assert sorted(entry["row_number"] for entry in result["quarantined"]) == [2, 4]
+    errors = {entry["row_number"]: entry["error"] for entry in result["quarantined"]}
+    assert errors[2].startswith("email:") and errors[4].startswith("name:")
+    with get_db_session() as session:
+        assert sorted(user_id for (user_id,) in session.query(User.user_id).all()) == ["U001", "U003"]
+
+
+def test_conflicting_row_is_isolated_from_its_chunk():
+    bulk_insert_users([make_user(1)])
+    # U002 reuses U001's email: the unique index rejects it, the rest of the chunk is still written
+    rows = [make_user(2, email="user1@example.com"), make_user(3), make_user(4)]
+    result = bulk_insert_users(rows, chunk_size=10)
+
+    assert result["written"] == 2
+    assert [entry["row"]["user_id"] for entry in result["quarantined"]] == ["U002"]
+
+
+def test_upsert_updates_existing_rows():
+    bulk_insert_users([make_user(1)])
+    result = bulk_insert_users([make_user(1, name="Renamed")])
+
+    assert result["written"] == 1
+    with get_db_session() as session:
+        assert session.get(User, "U001").name == "Renamed"
+
+
+def test_policies_for_unknown_users_are_quarantined():
+    bulk_insert_users([make_user(1)])
+    policy = {"policy_name": "Gadget cover", "start_date": "2024-01-01", "end_date": "2025-01-01"}
+    result = bulk_insert_policies([
+        {**policy, "policy_number": "P1", "user_id": "U001"},
+        {**policy, "policy_number": "P2", "user_id": "U999"},
+    ])
+
+    assert result["written"] == 1
+    assert result["quarantined"][0]["error"] == "Unknown user_id: U999"
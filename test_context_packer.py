@@ -0,0 +1,93 @@
+"""
+Tests for KB context packing
+Chunks are produced with a known overlap, so merged passages can be compared to the source text.
+"""
+
+import services.context_packer as context_packer
+from services.agent_schemas import KBDocument
+from services.context_packer import pack_context, merge_adjacent_chunks, strip_overlap, estimate_tokens
+
+SOURCE_TEXT = " ".join(f"Clause {i}: refunds are processed within seven working days." for i in range(12))
+
+
+def split_with_overlap(text: str, size: int, overlap: int) -> list:
+    """Fixed-size chunks that repeat the last `overlap` characters of the previous chunk"""
+    chunks, start = [], 0
+    while start < len(text):
+        chunks.append(text[start:start + size])
+        start += size - overlap
+    return chunks
+
+
+def squash(text: str) -> str:
+    """Text without whitespace: merging joins passages with a space, even mid-word for these fixed-size chunks"""
+    return "".join(text.split())
+
+
+def make_docs(chunks: list, source: str = "policy.pdf", scores: list = None) -> list:
+    scores = scores or [0.5] * len(chunks)
+    return [
+        KBDocument(content=chunk, score=score, source=source, metadata={"chunk_index": index})
+        for index, (chunk, score) in enumerate(zip(chunks, scores))
+    ]
+
+
+def test_strip_overlap_removes_repeated_prefix():
+    previous = "The claim must be filed within thirty days of the incident."
+    current = "within thirty days of the incident. Late claims are rejected."
+    assert strip_overlap(previous, current, max_overlap=100) == "Late claims are rejected."
+
+
+def test_short_coincidental_match_is_kept():
+    assert strip_overlap("ends with the", "the start", max_overlap=100) == "the start"
+
+
+def test_adjacent_chunks_merge_back_to_source():
+    chunks = split_with_overlap(SOURCE_TEXT, size=120, overlap=30)
+    merged = merge_adjacent_chunks(make_docs(chunks), max_overlap=30)
+
+    assert len(merged) == 1
+    assert merged[0].metadata["chunk_indices"] == list(range(len(chunks)))
+    assert squash(merged[0].content) == squash(SOURCE_TEXT)
+
+
+def test_default_overlap_comes_from_document_processing_config(monkeypatch):
+    real_get = context_packer.config.get
+    overrides = {'document_processing.chunking.chunk_overlap': 300}
+    monkeypatch.setattr(context_packer.config, 'get', lambda key, default=None: overrides.get(key, real_get(key, default)))
+
+    # Longer than the 200-char fallback, so it is only stripped if the configured value is used
+    chunks = split_with_overlap(SOURCE_TEXT, size=450, overlap=300)
+    merged = merge_adjacent_chunks(make_docs(chunks))
+    assert squash(merged[0].content) == squash(SOURCE_TEXT)
+
+
+def test_gaps_and_sources_are_not_merged():
+    chunks = split_with_overlap(SOURCE_TEXT, size=120, overlap=30)
+    docs = make_docs(chunks)
+    selected = [docs[0], docs[1], docs[3]] + make_docs(["Unrelated FAQ entry."], source="faq.md")
+    merged = merge_adjacent_chunks(selected, max_overlap=30)
+
+    assert sorted(doc.metadata.get("chunk_indices", [doc.metadata["chunk_index"]]) for doc in merged) == [
+        [0], [0, 1], [3]
+    ]
+
+
+def test_pack_context_respects_budget_and_score_order():
+    chunks = ["alpha " * 40, "beta " * 40, "gamma " * 40]
+    docs = [
+        KBDocument(content=chunk, score=score, source=f"doc{i}.md")
+        for i, (chunk, score) in enumerate(zip(chunks, [0.2, 0.9, 0.5]))
+    ]
+    budget = estimate_tokens(chunks[1]) + estimate_tokens(chunks[2])
+    packed = pack_context(docs, token_budget=budget)
+
+    assert [doc.source for doc in packed] == ["doc1.md", "doc2.md"]
+
+
+def test_pack_context_truncates_an_oversized_best_passage():
+    doc = KBDocument(content="x" * 1000, score=0.9, source="big.md")
+    packed = pack_context([doc], token_budget=10, max_overlap=0)
+
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0].content) <= 10
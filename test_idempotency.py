@@ -0,0 +1,89 @@
+"""
+Tests for idempotency keys and the run_once key store
+Run against a scratch SQLite database.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base, IdempotencyKey, create_db_engine, get_db_session, use_session_factory
+from services.idempotency import make_idempotency_key, run_once, get_stored_result
+
+WINDOW_SECONDS = 24 * 3600  # idempotency.window_hours in config/base.yaml
+
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    Base.metadata.create_all(bind=engine)
+    with use_session_factory(sessionmaker(autocommit=False, autoflush=False, bind=engine)):
+        yield
+    engine.dispose()
+
+
+def last_window_start() -> float:
+    return (time.time() // WINDOW_SECONDS) * WINDOW_SECONDS
+
+
+def test_key_ignores_case_and_punctuation():
+    now = time.time()
+    first = make_idempotency_key("t1", "U1", "Refund my premium!", "resolution", now=now)
+    again = make_idempotency_key("t1", "U1", "  refund my PREMIUM ", "resolution", now=now)
+    other_action = make_idempotency_key("t1", "U1", "Refund my premium!", "jira_ticket", now=now)
+
+    assert first == again
+    assert first != other_action
+    assert first.startswith("resolution:")
+
+
+def test_retry_across_window_boundary_keeps_key():
+    boundary = last_window_start()
+    key = make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary - 1)
+    run_once(key, lambda: "incident-1", action="resolution")
+
+    retry_key = make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary + 1)
+    assert retry_key == key
+    assert run_once(retry_key, lambda: "incident-2") == "incident-1"
+
+
+def test_unclaimed_key_rolls_over_at_boundary():
+    boundary = last_window_start()
+    before = make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary - 1)
+    after = make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary + 1)
+    assert before != after
+
+
+def test_expired_key_is_not_reused():
+    boundary = last_window_start()
+    key = make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary - 1)
+    run_once(key, lambda: "incident-1")
+    with get_db_session() as session:
+        session.get(IdempotencyKey, key).expires_at = datetime.now() - timedelta(seconds=1)
+
+    assert make_idempotency_key("t1", "U1", "Double debit", "resolution", now=boundary + 1) != key
+    assert get_stored_result(key) is None
+    assert run_once(key, lambda: "incident-2") == "incident-2"
+
+
+def test_run_once_replays_stored_result():
+    calls = []
+
+    def action():
+        calls.append(1)
+        return {"ticket": "ECHO-1"}
+
+    assert run_once("jira_ticket:abc", action) == {"ticket": "ECHO-1"}
+    assert run_once("jira_ticket:abc", action) == {"ticket": "ECHO-1"}
+    assert len(calls) == 1
+
+
+def test_failed_action_releases_key():
+    def failing():
+        raise RuntimeError("Jira down")
+
+    with pytest.raises(RuntimeError):
+        run_once("jira_ticket:retry", failing)
+    assert run_once("jira_ticket:retry", lambda: "ECHO-2") == "ECHO-2"
@@ -0,0 +1,74 @@
+"""
+Tests for keyset-paginated incident listing
+Run against a scratch SQLite database.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base, Incident, create_db_engine, get_db_session, use_session_factory
+from services.user_data_service import get_incident_by_id, list_incidents, list_incidents_page
+
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'paging.db'}")
+    Base.metadata.create_all(bind=engine)
+    with use_session_factory(sessionmaker(autocommit=False, autoflush=False, bind=engine)):
+        yield
+    engine.dispose()
+
+
+def add_incidents(count: int) -> list:
+    base = datetime(2024, 1, 1)
+    with get_db_session() as session:
+        session.add_all([
+            # Pairs share a created_at, so the incident_id tiebreak is exercised
+            Incident(
+                incident_id=f"inc-{i:03d}",
+                status="open",
+                created_at=base + timedelta(minutes=i // 2),
+                updated_at=base + timedelta(minutes=i // 2)
+            )
+            for i in range(count)
+        ])
+    return [f"inc-{i:03d}" for i in range(count)]
+
+
+def test_pages_cover_every_incident_once_newest_first():
+    ids = add_incidents(7)
+    seen, cursor = [], None
+    while True:
+        page = list_incidents_page(limit=3, cursor=cursor, columns=["incident_id"])
+        seen.extend(item["incident_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_page_only_returns_projected_columns():
+    add_incidents(2)
+    page = list_incidents_page(limit=5, columns=["incident_id", "status"])
+
+    assert set(page["items"][0]) == {"incident_id", "status"}
+    assert page["next_cursor"] is None
+
+
+def test_unknown_column_and_bad_cursor_are_rejected():
+    with pytest.raises(ValueError):
+        list_incidents_page(columns=["incident_id", "password"])
+    with pytest.raises(ValueError):
+        list_incidents_page(cursor="not-a-cursor")
+
+
+def test_timestamps_are_returned_as_iso_strings():
+    add_incidents(1)
+    incident = get_incident_by_id("inc-000")
+
+    assert incident["created_at"] == "2024-01-01T00:00:00"
+    assert list_incidents()[0]["updated_at"] == "2024-01-01T00:00:00"
+    assert list_incidents_page(columns=["created_at"])["items"][0]["created_at"] == "2024-01-01T00:00:00"
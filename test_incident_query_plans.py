@@ -0,0 +1,87 @@
+"""
+Query plan tests for incident analytics
+Checks with SQLite's EXPLAIN QUERY PLAN that tenant-scoped incident queries are served
+by the composite indexes instead of full table scans.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.database import Base, create_db_engine
+from services.migrations import run_migrations, get_applied_versions, MIGRATIONS
+from services.incident_analytics import (
+    _recent_incidents_stmt, _counts_by_status_stmt, _counts_by_intent_stmt, _confidence_histogram_stmt,
+    _refund_incidents_stmt
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    test_engine = create_db_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=test_engine)
+    run_migrations(test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+def explain(engine, stmt) -> str:
+    """Return the EXPLAIN QUERY PLAN details for a statement, one step per line"""
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = tuple(
+        value.isoformat(' ') if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_no_full_scan(plan: str):
+    for step in plan.splitlines():
+        assert not (step.startswith("SCAN incidents") and "INDEX" not in step), plan
+
+
+def test_migrations_recorded(engine):
+    assert get_applied_versions(engine) == {version for version, _, _ in MIGRATIONS}
+    # Re-running is a no-op
+    assert run_migrations(engine) == []
+
+
+def test_open_incidents_last_day_uses_tenant_status_created_index(engine):
+    since = datetime.now() - timedelta(days=1)
+    plan = explain(engine, _recent_incidents_stmt("rentomojo", "open", since, 50))
+    assert "ix_incidents_tenant_status_created" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+    assert_no_full_scan(plan)
+
+
+def test_recent_incidents_any_status_uses_tenant_created_index(engine):
+    since = datetime.now() - timedelta(days=1)
+    plan = explain(engine, _recent_incidents_stmt("rentomojo", None, since, 50))
+    assert "ix_incidents_tenant_created" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+def test_counts_by_status_use_index(engine):
+    plan = explain(engine, _counts_by_status_stmt("rentomojo", None))
+    assert "ix_incidents_tenant_status_created" in plan, plan
+    assert_no_full_scan(plan)
+
+
+def test_counts_by_intent_use_index(engine):
+    plan = explain(engine, _counts_by_intent_stmt("rentomojo", None))
+    assert "ix_incidents_tenant_intent" in plan, plan
+    assert_no_full_scan(plan)
+
+
+def test_confidence_histogram_searches_by_tenant(engine):
+    plan = explain(engine, _confidence_histogram_stmt("rentomojo", 10, None))
+    assert "USING INDEX ix_incidents_tenant" in plan, plan
+    assert_no_full_scan(plan)
+
+
+def test_refund_incidents_use_generated_column_index(engine):
+    plan = explain(engine, _refund_incidents_stmt(1000.0, None, 50))
+    assert "ix_incidents_refund" in plan, plan
+    assert_no_full_scan(plan)
@@ -0,0 +1,185 @@
+"""
+Tests for the incident write-behind queue
+Runs the writer against a scratch SQLite database and checks commit, retry and journal truncation.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import services.incident_writer as incident_writer
+from services.database import Base, Incident, create_db_engine
+from services.incident_writer import IncidentWriter
+
+INCIDENT = {"user_id": "U001", "tenant_id": "t1", "intent": "complaint", "issue": "Double debit", "confidence": 0.9}
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'incidents.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @contextmanager
+    def session_scope():
+        session = factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # The writer commits from its own thread, so patch the module's session helper
+    monkeypatch.setattr(incident_writer, "get_db_session", session_scope)
+    yield session_scope
+    engine.dispose()
+
+
+def make_writer(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval_seconds", 0.01)
+    kwargs.setdefault("fsync", False)
+    return IncidentWriter(journal_path=str(tmp_path / "journal.jsonl"), **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def count_incidents(sessions):
+    with sessions() as session:
+        return session.query(Incident).count()
+
+
+def test_commit_truncates_journal(tmp_path, sessions):
+    writer = make_writer(tmp_path)
+    incident_id = writer.submit(INCIDENT, idempotency_key="k1")
+    assert writer.flush()
+    writer.close()
+
+    with sessions() as session:
+        assert session.get(Incident, incident_id).idempotency_key == "k1"
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+
+
+def test_resubmitted_key_is_written_once(tmp_path, sessions):
+    writer = make_writer(tmp_path)
+    first = writer.submit(INCIDENT, idempotency_key="same")
+    second = writer.submit(INCIDENT, idempotency_key="same")
+    assert writer.flush()
+    writer.close()
+
+    assert first == second
+    assert count_incidents(sessions) == 1
+
+
+def test_failed_batch_is_retried_and_journal_truncated(tmp_path, sessions, monkeypatch):
+    real_insert = IncidentWriter._insert
+    calls = {"count": 0}
+
+    def flaky_insert(self, records):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise RuntimeError("database is locked")
+        return real_insert(self, records)
+
+    monkeypatch.setattr(IncidentWriter, "_insert", flaky_insert)
+    writer = make_writer(tmp_path, retry_backoff_seconds=0.01)
+    writer.submit(INCIDENT, idempotency_key="retry-me")
+
+    assert wait_for(lambda: writer.stats()["written"] == 1)
+    assert wait_for(lambda: (tmp_path / "journal.jsonl").read_text() == "")
+    stats = writer.stats()
+    writer.close()
+
+    assert stats["failed"] == 1
+    assert stats["retrying"] == 0
+    assert count_incidents(sessions) == 1
+
+
+def test_unacknowledged_records_are_replayed(tmp_path, sessions):
+    record = {
+        **INCIDENT,
+        "incident_id": "inc-1",
+        "idempotency_key": "replayed",
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00"
+    }
+    acked = {**record, "incident_id": "inc-2", "idempotency_key": "acked"}
+    with open(tmp_path / "journal.jsonl", "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": "put", "record": record}) + "\n")
+        f.write(json.dumps({"op": "put", "record": acked}) + "\n")
+        f.write(json.dumps({"op": "ack", "keys": ["acked"]}) + "\n")
+
+    writer = make_writer(tmp_path)
+    assert writer.flush()
+    stats = writer.stats()
+    writer.close()
+
+    assert stats["replayed"] == 1
+    with sessions() as session:
+        assert [row.incident_id for row in session.query(Incident).all()] == ["inc-1"]
+
+
+def test_poison_record_is_dead_lettered(tmp_path, sessions, monkeypatch):
+    real_insert = IncidentWriter._insert
+
+    def reject_poison(self, records):
+        if any(record["idempotency_key"] == "poison" for record in records):
+            raise RuntimeError("value too long for column")
+        return real_insert(self, records)
+
+    monkeypatch.setattr(IncidentWriter, "_insert", reject_poison)
+    writer = make_writer(tmp_path, retry_backoff_seconds=0.01, max_attempts=3)
+    writer.submit(INCIDENT, idempotency_key="poison")
+
+    assert wait_for(lambda: writer.stats()["dead_lettered"] == 1)
+    writer.submit(INCIDENT, idempotency_key="healthy")
+    assert writer.flush()
+    stats = writer.stats()
+    writer.close()
+
+    assert stats["failed"] == 3
+    assert stats["retrying"] == 0
+    assert count_incidents(sessions) == 1
+    dead = [json.loads(line) for line in (tmp_path / "journal.jsonl.failed").read_text().splitlines()]
+    assert [entry["record"]["idempotency_key"] for entry in dead] == ["poison"]
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+
+    # A restart doesn't replay the dead-lettered record
+    restarted = make_writer(tmp_path)
+    assert restarted.stats()["replayed"] == 0
+    restarted.close()
+
+
+def test_journal_is_compacted_while_a_record_is_retrying(tmp_path, sessions, monkeypatch):
+    real_insert = IncidentWriter._insert
+
+    def reject_stuck(self, records):
+        if any(record["idempotency_key"] == "stuck" for record in records):
+            raise RuntimeError("database is locked")
+        return real_insert(self, records)
+
+    monkeypatch.setattr(IncidentWriter, "_insert", reject_stuck)
+    writer = make_writer(tmp_path, retry_backoff_seconds=60, compact_after_records=5)
+    writer.submit(INCIDENT, idempotency_key="stuck")
+    assert wait_for(lambda: writer.stats()["retrying"] == 1)
+    for i in range(5):
+        writer.submit(INCIDENT, idempotency_key=f"ok-{i}")
+    assert writer.flush()
+    stats = writer.stats()
+
+    journal = [json.loads(line) for line in (tmp_path / "journal.jsonl").read_text().splitlines()]
+    assert stats["compactions"] == 1
+    assert [entry["record"]["idempotency_key"] for entry in journal] == ["stuck"]
+    writer.close()
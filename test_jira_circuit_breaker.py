@@ -0,0 +1,66 @@
+"""
+Tests for the Jira circuit breaker
+The breaker's clock is time.monotonic, patched here so the reset timeout elapses instantly.
+"""
+
+import pytest
+
+import services.jira_tool as jira_tool
+from services.jira_tool import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": 1000.0}
+    monkeypatch.setattr(jira_tool.time, "monotonic", lambda: now["value"])
+    return now
+
+
+def test_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_seconds=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_seconds=30)
+    breaker.record_failure()
+    clock["value"] += 30
+
+    assert breaker.is_call_permitted()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    assert not breaker.is_call_permitted()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock["value"] += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock["value"] += 29
+    assert not breaker.is_call_permitted()
@@ -0,0 +1,168 @@
+"""
+Tests for the Jira outbox dispatcher
+Claims, lease reclaims and reconciles run against a scratch SQLite database; Jira itself is
+replaced by patching JiraTool's bulk create and label search.
+"""
+
+import contextvars
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base, JiraOutbox, create_db_engine, get_db_session, use_session_factory
+from services.jira_outbox import OutboxDispatcher, outbox_label
+from services.jira_tool import JiraTool
+
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    with use_session_factory(sessionmaker(autocommit=False, autoflush=False, bind=engine)):
+        yield
+    engine.dispose()
+
+
+def add_entries(count: int, status: str = 'pending', updated_at: datetime = None, prefix: str = "PENDING-") -> list:
+    now = datetime.now()
+    ids = [f"{prefix}{i:04d}" for i in range(count)]
+    with get_db_session() as session:
+        session.add_all([
+            JiraOutbox(
+                outbox_id=outbox_id,
+                fields={"summary": outbox_id},
+                status=status,
+                attempts=0,
+                next_attempt_at=now - timedelta(seconds=count - i),  # Due in id order
+                created_at=now,
+                updated_at=updated_at or now
+            )
+            for i, outbox_id in enumerate(ids)
+        ])
+    return ids
+
+
+def statuses() -> dict:
+    with get_db_session() as session:
+        return {entry.outbox_id: entry.status for entry in session.query(JiraOutbox).all()}
+
+
+def test_claim_marks_entries_sending():
+    ids = add_entries(3)
+    batch = OutboxDispatcher(batch_size=2)._claim_batch()
+
+    assert [outbox_id for outbox_id, _, _ in batch] == ids[:2]
+    assert [status for _, status in sorted(statuses().items())] == ['sending', 'sending', 'pending']
+
+
+def test_claimed_entries_are_not_claimed_again():
+    add_entries(3)
+    first = OutboxDispatcher(batch_size=10)._claim_batch()
+    second = OutboxDispatcher(batch_size=10)._claim_batch()
+
+    assert len(first) == 3
+    assert second == []
+
+
+def test_concurrent_claims_never_overlap():
+    add_entries(40)
+    claimed, lock = [], threading.Lock()
+
+    def claim():
+        dispatcher = OutboxDispatcher(batch_size=10)
+        for _ in range(3):
+            try:
+                batch = dispatcher._claim_batch()
+            except Exception:
+                continue  # Lock contention: this round claims nothing
+            with lock:
+                claimed.extend(outbox_id for outbox_id, _, _ in batch)
+
+    # Threads don't inherit the scratch-DB context, so run each in a copy of it
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(claim,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == len(set(claimed))
+    assert sum(status == 'sending' for status in statuses().values()) == len(claimed)
+
+
+def test_reclaim_marks_only_expired_leases_ambiguous():
+    stale = add_entries(2, status='sending', updated_at=datetime.now() - timedelta(minutes=10), prefix="PENDING-STALE")
+    live = add_entries(2, status='sending', prefix="PENDING-LIVE")
+
+    OutboxDispatcher(lease_seconds=300)._reclaim_interrupted()
+
+    current = statuses()
+    assert [current[outbox_id] for outbox_id in stale] == ['ambiguous', 'ambiguous']
+    assert [current[outbox_id] for outbox_id in live] == ['sending', 'sending']
+
+
+@pytest.fixture
+def fake_jira(monkeypatch):
+    """Issues by label; create_tickets_bulk can be told to time out after (or before) creating them"""
+    jira = {"issues": {}, "bulk_calls": 0, "timeout": None}
+
+    def create_tickets_bulk(self, issue_fields):
+        jira["bulk_calls"] += 1
+        if jira["timeout"] == "before_create":
+            raise TimeoutError("connect timed out")
+        results = []
+        for fields in issue_fields:
+            key = f"ECHO-{len(jira['issues']) + 1}"
+            for label in fields["labels"]:
+                jira["issues"].setdefault(label, key)
+            results.append({"key": key, "error": None})
+        if jira["timeout"] == "after_create":
+            raise TimeoutError("read timed out")
+        return results
+
+    def find_issues_by_labels(self, labels):
+        return {label: jira["issues"][label] for label in labels if label in jira["issues"]}
+
+    monkeypatch.setattr(JiraTool, "create_tickets_bulk", create_tickets_bulk)
+    monkeypatch.setattr(JiraTool, "find_issues_by_labels", find_issues_by_labels)
+    return jira
+
+
+def make_due():
+    with get_db_session() as session:
+        for entry in session.query(JiraOutbox).all():
+            entry.next_attempt_at = datetime.now() - timedelta(seconds=1)
+
+
+def test_timed_out_batch_is_reconciled_instead_of_resent(fake_jira):
+    ids = add_entries(3)
+    dispatcher = OutboxDispatcher(batch_size=10)
+    fake_jira["timeout"] = "after_create"
+    dispatcher.dispatch_once()
+    assert set(statuses().values()) == {'ambiguous'}
+
+    fake_jira["timeout"] = None
+    make_due()
+    dispatcher.dispatch_once()
+
+    assert fake_jira["bulk_calls"] == 1
+    with get_db_session() as session:
+        keys = {entry.outbox_id: entry.issue_key for entry in session.query(JiraOutbox).all()}
+    assert set(statuses().values()) == {'created'}
+    assert keys == {outbox_id: fake_jira["issues"][outbox_label(outbox_id)] for outbox_id in ids}
+
+
+def test_reconcile_requeues_tickets_jira_never_created(fake_jira):
+    add_entries(2)
+    dispatcher = OutboxDispatcher(batch_size=10)
+    fake_jira["timeout"] = "before_create"
+    dispatcher.dispatch_once()
+
+    fake_jira["timeout"] = None
+    make_due()
+    dispatcher.dispatch_once()
+
+    assert fake_jira["bulk_calls"] == 2
+    assert set(statuses().values()) == {'created'}
+    assert dispatcher.stats()["reconciled"] == 2
@@ -0,0 +1,116 @@
+"""
+Tests for the KB folder watcher
+Ingestion calls are replaced with recorders, so only the scan/queue/backoff logic is exercised.
+"""
+
+import pytest
+
+import services.kb_watcher as kb_watcher
+from services.kb_watcher import KBWatcher, WatchedFolder
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    recorded = {"upsert": [], "delete": [], "fail": False}
+
+    def fake_replace(path, **kwargs):
+        recorded["upsert"].append(path)
+        if recorded["fail"]:
+            return {"success": False, "message": "extraction failed"}
+        return {"success": True, "message": "ok"}
+
+    def fake_delete(path, **kwargs):
+        recorded["delete"].append(path)
+
+    monkeypatch.setattr(kb_watcher, "replace_document_by_source", fake_replace)
+    monkeypatch.setattr(kb_watcher, "delete_document_by_source", fake_delete)
+    return recorded
+
+
+def make_watcher(tmp_path, folder_path):
+    watcher = KBWatcher(
+        [WatchedFolder(str(folder_path), tenant_id="t1")],
+        poll_interval=0,
+        debounce_seconds=0,
+        state_file=str(tmp_path / "state.json")
+    )
+    watcher.retry_backoff_seconds = 3600
+    return watcher
+
+
+def drain(watcher):
+    """Run queued jobs on the calling thread"""
+    watcher._queue.put(kb_watcher._STOP)
+    watcher._worker_loop()
+
+
+def ingest(watcher):
+    watcher.scan_once()  # starts the debounce window
+    watcher.scan_once()
+    drain(watcher)
+
+
+def test_new_file_is_ingested_once(tmp_path, calls):
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    (folder / "a.txt").write_text("hello")
+    watcher = make_watcher(tmp_path, folder)
+
+    ingest(watcher)
+    assert calls["upsert"] == [str(folder / "a.txt")]
+
+    ingest(watcher)
+    assert calls["upsert"] == [str(folder / "a.txt")]
+
+
+def test_unavailable_folder_does_not_delete_its_files(tmp_path, calls):
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    (folder / "a.txt").write_text("hello")
+    watcher = make_watcher(tmp_path, folder)
+    ingest(watcher)
+
+    # Simulate an unmounted volume
+    folder.rename(tmp_path / "kb_offline")
+    assert watcher.scan_once() == 0
+    drain(watcher)
+    assert calls["delete"] == []
+    assert str(folder / "a.txt") in watcher._ingested
+
+
+def test_removed_file_is_deleted(tmp_path, calls):
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    (folder / "a.txt").write_text("hello")
+    (folder / "b.txt").write_text("world")
+    watcher = make_watcher(tmp_path, folder)
+    ingest(watcher)
+
+    (folder / "a.txt").unlink()
+    watcher.scan_once()
+    drain(watcher)
+    assert calls["delete"] == [str(folder / "a.txt")]
+    assert str(folder / "a.txt") not in watcher._ingested
+
+
+def test_failed_upsert_backs_off_until_file_changes(tmp_path, calls):
+    folder = tmp_path / "kb"
+    folder.mkdir()
+    target = folder / "a.txt"
+    target.write_text("hello")
+    watcher = make_watcher(tmp_path, folder)
+    calls["fail"] = True
+
+    ingest(watcher)
+    assert len(calls["upsert"]) == 1
+
+    # Still inside the backoff window: not retried
+    ingest(watcher)
+    assert len(calls["upsert"]) == 1
+
+    # A new version of the file is tried right away
+    calls["fail"] = False
+    target.write_text("hello again")
+    ingest(watcher)
+    assert len(calls["upsert"]) == 2
+    assert str(target) not in watcher._failures
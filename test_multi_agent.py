@@ -91,6 +91,7 @@ def test_claim_with_tool_calls():
     messages = result.get('messages', [])
     tool_messages = [m for m in messages if m.__class__.__name__ == 'ToolMessage']
     print(f"\nTotal Tool Calls: {len(tool_messages)}")
+    print(f"Tool Calls Saved: {result.get('tool_calls_saved', 0)}, Budget Exhausted: {result.get('budget_exhausted')}")
     for i, tm in enumerate(tool_messages, 1):
         tool_name = getattr(tm, 'name', 'Unknown')
         content_preview = str(tm.content)[:100]